@@ -0,0 +1,294 @@
+import numpy as np
+
+from betspread import BetSpread
+from compiledstrategy import CompiledStrategy, DOUBLE, HIT, SPLIT, STAND, SURRENDER
+from simulationstats import BLACKJACK, DOUBLED, SPLIT_HAND
+
+
+class BatchBlackJackSimulator:
+    """Represents a blackjack simulator that plays one hand in each of many independent shoes at once. Every shoe is a
+    row of a 2-D array of card values, and each step of the game is applied to all shoes together with array operations
+    and masks. Given the same card sequences, every shoe produces the same results as a BlackJackSimulator would.
+    """
+
+    def __init__(self, num_decks, penetration, bet_spread, strategy_table, num_shoes, bankroll=0,
+                 counts={2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1, 1: -1}, seed=None):
+        """Initializes a BatchBlackJackSimulator object.
+
+        Args:
+            num_decks (Int): The number of decks in each shoe
+            penetration (Float): The penetration of each shoe, represented as a decimal between 0 and 1
+            bet_spread (dict(int: int)): The bet spread, see BetSpread
+            strategy_table (dict or CompiledStrategy): The strategy table, in the form produced by
+            parse_strategy_table, or already compiled
+            num_shoes (Int): The number of independent shoes to play in lockstep
+            bankroll (Int, optional): The starting bankroll of each shoe's player. Defaults to 0.
+            counts (dict, optional): What count value each card has.
+            seed (Int, optional): Seed for the shuffles. Defaults to None.
+        """
+        self._rng = np.random.default_rng(seed)
+        self._num_shoes = num_shoes
+        self._rows = np.arange(num_shoes)
+
+        single_suit = list(range(1, 11)) + [10, 10, 10]
+        deck = np.array(single_suit * 4 * num_decks, dtype=np.int8)
+        self.cards = self._rng.permuted(np.tile(deck, (num_shoes, 1)), axis=1)
+        self._shoe_size = len(deck)
+        self._cut_card = self._shoe_size * penetration
+        self._index = np.zeros(num_shoes, dtype=np.int64)
+        self._count = np.zeros(num_shoes, dtype=np.int64)
+        self._count_values = np.zeros(11, dtype=np.int64)
+        for card, value in counts.items():
+            self._count_values[card] = value
+
+        spread = BetSpread(bet_spread)
+        self._min_count = min(bet_spread.keys())
+        self._max_count = max(bet_spread.keys())
+        self._bets = np.array([spread.get_bet(tc) for tc in range(self._min_count, self._max_count + 1)],
+                              dtype=np.float64)
+
+        if not isinstance(strategy_table, CompiledStrategy):
+            strategy_table = CompiledStrategy(strategy_table)
+        self._hard = np.array(strategy_table.hard, dtype=np.int8)
+        self._soft = np.array(strategy_table.soft, dtype=np.int8)
+        self._pairs = np.array(strategy_table.pairs, dtype=np.int8)
+        self._player_cash = np.full(num_shoes, bankroll, dtype=np.float64)
+        self._player_spending = np.zeros(num_shoes, dtype=np.float64)
+        self._hand_wager = np.zeros(num_shoes, dtype=np.float64)
+        self._hand_flags = np.zeros(num_shoes, dtype=np.int8)
+
+    def play_hand(self):
+        """Plays one hand in every shoe.
+
+        Returns:
+            ndarray[Float]: The result of the hand for each shoe
+
+        Raises:
+            ValueError: If the strategy calls for an action the simulator does not play.
+        """
+        self._start_hand()
+        true_count = self.get_true_count()
+        player_bet = self._bets[np.clip(true_count, self._min_count, self._max_count) - self._min_count]
+
+        rows = self._rows
+        player_first = self._draw(rows)
+        dealer_upcard = self._draw(rows)
+        player_second = self._draw(rows)
+        dealer_hole = self._draw_face_down(rows)
+
+        dealer_blackjack = self._is_blackjack(dealer_upcard, dealer_hole)
+        player_blackjack = self._is_blackjack(player_first, player_second)
+
+        results = np.zeros(self._num_shoes, dtype=np.float64)
+        spending = player_bet.copy()
+        flags = np.where(player_blackjack, BLACKJACK, 0).astype(np.int8)
+        results[dealer_blackjack & ~player_blackjack] = -player_bet[dealer_blackjack & ~player_blackjack]
+        results[player_blackjack & ~dealer_blackjack] = 1.5 * player_bet[player_blackjack & ~dealer_blackjack]
+
+        live = np.flatnonzero(~(dealer_blackjack | player_blackjack))
+        if len(live):
+            totals, multipliers = self._play_player_hands(live, dealer_upcard[live], player_first[live],
+                                                          player_second[live])
+            dealer_outcome = self._play_dealer_hands(live, dealer_upcard[live], dealer_hole[live])
+            dealer_outcome[dealer_outcome > 21] = 0
+
+            outcome = np.zeros(totals.shape, dtype=np.float64)
+            outcome[totals > dealer_outcome[:, None]] = 1
+            outcome[(totals > 21) | (totals < dealer_outcome[:, None])] = -1
+            results[live] = player_bet[live] * (outcome * multipliers).sum(axis=1)
+            spending[live] = player_bet[live] * multipliers.sum(axis=1)
+            flags[live] = np.where((multipliers == 2).any(axis=1), DOUBLED, 0) | \
+                np.where(multipliers[:, 1] > 0, SPLIT_HAND, 0)
+
+        self._count += self._count_values[dealer_hole]
+        self._player_cash += results
+        self._player_spending += spending
+        self._hand_wager = spending
+        self._hand_flags = flags
+        return results
+
+    def get_true_count(self):
+        """Returns the true count of every shoe, which is calculated by dividing the running count by the number of
+        decks remaining in the shoe.
+
+        Returns:
+            ndarray[Int]: The true count of each shoe
+        """
+        return (self._count / ((self._shoe_size - self._index) / 52)).astype(np.int64)
+
+    def _start_hand(self):
+        """Reshuffles every shoe whose cut card has been dealt, resetting its index and count to 0.
+        """
+        shuffled = np.flatnonzero(self._index > self._cut_card)
+        if len(shuffled):
+            self.cards[shuffled] = self._rng.permuted(self.cards[shuffled], axis=1)
+            self._index[shuffled] = 0
+            self._count[shuffled] = 0
+
+    def _draw(self, rows):
+        """Draws a card from each of the given shoes and updates their counts.
+
+        Args:
+            rows (ndarray[Int]): The shoes to draw from
+
+        Returns:
+            ndarray[Int]: The cards that were drawn
+        """
+        cards = self._draw_face_down(rows)
+        self._count[rows] += self._count_values[cards]
+        return cards
+
+    def _draw_face_down(self, rows):
+        """Draws a card from each of the given shoes without updating their counts.
+
+        Args:
+            rows (ndarray[Int]): The shoes to draw from
+
+        Returns:
+            ndarray[Int]: The cards that were drawn
+        """
+        index = self._index[rows]
+        self._index[rows] = index + 1
+        return self.cards.ravel()[rows * self._shoe_size + index]
+
+    def _play_player_hands(self, rows, dealer_upcard, first, second):
+        """Plays the player's hand in each of the given shoes, splitting into further hands as the strategy requires.
+        Split hands are played depth first, in the same order as BlackJackSimulator, so that each shoe deals the same
+        cards to the same hands.
+
+        Args:
+            rows (ndarray[Int]): The shoes to play
+            dealer_upcard (ndarray[Int]): The dealer's upcard in each shoe
+            first (ndarray[Int]): The player's first card in each shoe
+            second (ndarray[Int]): The player's second card in each shoe
+
+        Returns:
+            Tuple[ndarray[Int], ndarray[Int]]: The final total and bet multiplier of every hand played in each shoe,
+            one row per shoe, with a multiplier of 0 for unused slots
+
+        Raises:
+            ValueError: If the strategy calls for an action the simulator does not play.
+        """
+        num_rows = len(rows)
+        hard_total = first.astype(np.int64) + second
+        has_ace = (first == 1) | (second == 1)
+        num_cards = np.full(num_rows, 2, dtype=np.int64)
+        card_one = first.copy()
+        card_two = second.copy()
+
+        # hands waiting to be played after a split, used as a stack of their two cards
+        pending_one = np.zeros((num_rows, 2), dtype=first.dtype)
+        pending_two = np.zeros((num_rows, 2), dtype=first.dtype)
+        num_pending = np.zeros(num_rows, dtype=np.int64)
+
+        totals = np.zeros((num_rows, 4), dtype=np.int64)
+        multipliers = np.zeros((num_rows, 4), dtype=np.int64)
+        num_finished = np.zeros(num_rows, dtype=np.int64)
+
+        active = np.arange(num_rows)
+        while len(active):
+            soft = has_ace[active] & (hard_total[active] <= 11)
+            total = hard_total[active] + 10 * soft
+            pair = (num_cards[active] == 2) & (card_one[active] == card_two[active])
+            upcard = dealer_upcard[active]
+            lookup_total = np.minimum(total, 21)
+            action = np.where(pair, self._pairs[upcard, card_one[active]],
+                              np.where(soft, self._soft[upcard, lookup_total], self._hard[upcard, lookup_total]))
+            action[total >= 21] = STAND
+            action[(action == DOUBLE) & (num_cards[active] > 2)] = HIT
+            # the batch simulator plays the default rules, which do not allow surrender, so it is played as a hit
+            action[action == SURRENDER] = HIT
+            unplayable = (action != STAND) & (action != HIT) & (action != DOUBLE) & (action != SPLIT)
+            if unplayable.any():
+                raise ValueError(f"The simulator cannot play action {action[unplayable][0]}.")
+
+            hit = active[action == HIT]
+            if len(hit):
+                self._add_card(hit, self._draw(rows[hit]), hard_total, has_ace, num_cards)
+
+            doubled = active[action == DOUBLE]
+            if len(doubled):
+                self._add_card(doubled, self._draw(rows[doubled]), hard_total, has_ace, num_cards)
+
+            split = active[action == SPLIT]
+            if len(split):
+                split_rows = rows[split]
+                first_draw = self._draw(split_rows)
+                second_draw = self._draw(split_rows)
+                if num_pending[split].max() == pending_one.shape[1]:
+                    pending_one = np.pad(pending_one, ((0, 0), (0, pending_one.shape[1])))
+                    pending_two = np.pad(pending_two, ((0, 0), (0, pending_two.shape[1])))
+                pending_one[split, num_pending[split]] = card_two[split]
+                pending_two[split, num_pending[split]] = second_draw
+                num_pending[split] += 1
+                self._set_hand(split, card_one[split], first_draw, hard_total, has_ace, num_cards, card_one, card_two)
+
+            stood = active[action == STAND]
+            finished = np.concatenate((stood, doubled))
+            if len(finished):
+                finished_soft = has_ace[finished] & (hard_total[finished] <= 11)
+                if num_finished[finished].max() == totals.shape[1]:
+                    totals = np.pad(totals, ((0, 0), (0, totals.shape[1])))
+                    multipliers = np.pad(multipliers, ((0, 0), (0, multipliers.shape[1])))
+                totals[finished, num_finished[finished]] = hard_total[finished] + 10 * finished_soft
+                multipliers[finished, num_finished[finished]] = np.repeat((1, 2), (len(stood), len(doubled)))
+                num_finished[finished] += 1
+
+                resumed = finished[num_pending[finished] > 0]
+                active = active[~(((action == STAND) | (action == DOUBLE)) & (num_pending[active] == 0))]
+                num_pending[resumed] -= 1
+                self._set_hand(resumed, pending_one[resumed, num_pending[resumed]],
+                               pending_two[resumed, num_pending[resumed]], hard_total, has_ace, num_cards, card_one,
+                               card_two)
+        return totals, multipliers
+
+    def _play_dealer_hands(self, rows, upcard, hole):
+        """Plays the dealer's hand in each of the given shoes.
+
+        Args:
+            rows (ndarray[Int]): The shoes to play
+            upcard (ndarray[Int]): The dealer's upcard in each shoe
+            hole (ndarray[Int]): The dealer's hole card in each shoe
+
+        Returns:
+            ndarray[Int]: The dealer's total in each shoe
+        """
+        hard_total = upcard.astype(np.int64) + hole
+        has_ace = (upcard == 1) | (hole == 1)
+        while True:
+            soft = has_ace & (hard_total <= 11)
+            total = hard_total + 10 * soft
+            drawing = np.flatnonzero(~(((total == 17) & ~soft) | (total > 17)))
+            if len(drawing) == 0:
+                return total
+            card = self._draw(rows[drawing])
+            hard_total[drawing] += card
+            has_ace[drawing] |= card == 1
+
+    def _add_card(self, hands, card, hard_total, has_ace, num_cards):
+        """Adds a drawn card to each of the given hands.
+        """
+        hard_total[hands] += card
+        has_ace[hands] |= card == 1
+        num_cards[hands] += 1
+
+    def _set_hand(self, hands, first, second, hard_total, has_ace, num_cards, card_one, card_two):
+        """Replaces each of the given hands with a fresh two card hand.
+        """
+        hard_total[hands] = first.astype(np.int64) + second
+        has_ace[hands] = (first == 1) | (second == 1)
+        num_cards[hands] = 2
+        card_one[hands] = first
+        card_two[hands] = second
+
+    def _is_blackjack(self, first, second):
+        """Determines which two card hands are blackjacks.
+
+        Args:
+            first (ndarray[Int]): The first card of each hand
+            second (ndarray[Int]): The second card of each hand
+
+        Returns:
+            ndarray[Boolean]: True for each hand that is a blackjack
+        """
+        return ((first == 1) & (second == 10)) | ((first == 10) & (second == 1))
@@ -0,0 +1,290 @@
+import argparse
+import json
+import multiprocessing
+import platform
+import random
+import sys
+import time
+
+import numpy as np
+
+from betspread import BetSpread
+from blackjack import BlackJackSimulator
+from defaultstrategy import strategy as default_strategy
+from parsestrategy import parse_strategy_table
+from scheduler import ConvergenceScheduler, SimulationJob
+from shoecorpus import CorpusShoe
+from shoemodels import ContinuousShuffleShoe
+from simplifiedshoe import SimplifiedShoe
+
+# the cards of one hand for each scenario, in the order they are dealt: player, dealer upcard, player, dealer hole
+# card, then the player's and dealer's draws
+SCENARIOS = {
+    # hard 16 against a ten hits to 18, the dealer stands on 17
+    'hard': [10, 10, 6, 7, 2],
+    # soft 17 against a ten hits to hard 17, the dealer stands on 18
+    'soft': [1, 10, 6, 8, 10],
+    # 8,8 against a 6 splits, the first hand doubles 11 to 21, the second stands on 18, the dealer busts
+    'split': [8, 6, 8, 10, 3, 10, 10, 10],
+    # 11 against a 6 doubles to 21, the dealer busts
+    'double': [6, 6, 5, 10, 10, 10],
+}
+
+
+def bench_shoe_draw(scale):
+    """Returns a run of SimplifiedShoe.draw and the number of calls it makes.
+    """
+    draws = int(100_000 * scale)
+    shoe = SimplifiedShoe(draws // 52 + 1, 1.0, rng=random.Random(0))
+
+    def run():
+        for _ in range(draws):
+            shoe.draw()
+    return run, draws
+
+
+def bench_csm_draw(scale):
+    """Returns a run of ContinuousShuffleShoe.draw, returning the cards to the machine every ten cards, and the number
+    of calls it makes.
+    """
+    draws = int(100_000 * scale) // 10 * 10
+    shoe = ContinuousShuffleShoe(8, rng=random.Random(0))
+
+    def run():
+        for _ in range(draws // 10):
+            shoe.start_hand()
+            for _ in range(10):
+                shoe.draw()
+    return run, draws
+
+
+def bench_shoe_start_hand(scale):
+    """Returns a run of SimplifiedShoe.start_hand between shuffles and the number of calls it makes.
+    """
+    calls = int(100_000 * scale)
+    shoe = SimplifiedShoe(8, 1.0, rng=random.Random(0))
+
+    def run():
+        for _ in range(calls):
+            shoe.start_hand()
+    return run, calls
+
+
+def bench_shoe_shuffle(scale):
+    """Returns a run of SimplifiedShoe._shuffle on an 8 deck shoe and the number of calls it makes.
+    """
+    calls = int(1_000 * scale)
+    shoe = SimplifiedShoe(8, 0.75, rng=random.Random(0))
+
+    def run():
+        for _ in range(calls):
+            shoe._shuffle()
+    return run, calls
+
+
+def bench_bet_spread(scale):
+    """Returns a run of BetSpread.get_bet over true counts inside and outside the spread and the number of calls it
+    makes.
+    """
+    calls = int(100_000 * scale)
+    spread = BetSpread({-1: 0, 0: 1, 1: 2, 2: 4, 3: 6, 4: 8, 5: 10})
+    true_counts = [tc % 15 - 7 for tc in range(calls)]
+
+    def run():
+        for true_count in true_counts:
+            spread.get_bet(true_count)
+    return run, calls
+
+
+def bench_parse_strategy_table(scale):
+    """Returns a run of parse_strategy_table on the default strategy and the number of calls it makes.
+    """
+    calls = max(int(200 * scale), 1)
+
+    def run():
+        for _ in range(calls):
+            parse_strategy_table('defaultstrategy.csv', {})
+    return run, calls
+
+
+def bench_play_hand(scenario):
+    """Returns a benchmark of BlackJackSimulator.play_hand that plays the same stacked hand over and over.
+
+    Args:
+        scenario (str): The scenario to play, one of SCENARIOS
+
+    Returns:
+        function: The benchmark
+    """
+    def bench(scale):
+        hands = int(20_000 * scale)
+        cards = SCENARIOS[scenario] * hands
+        shoe = CorpusShoe(np.array([cards], dtype=np.uint8), 1.0)
+        sim = BlackJackSimulator(1, 1.0, {0: 1}, default_strategy, shoe=shoe)
+
+        def run():
+            for _ in range(hands):
+                sim.play_hand()
+        return run, hands
+    return bench
+
+
+def bench_end_to_end(processes):
+    """Returns a benchmark of a whole run through ConvergenceScheduler, including starting the worker pool.
+
+    Args:
+        processes (Int): The number of worker processes
+
+    Returns:
+        function: The benchmark
+    """
+    def bench(scale):
+        hands = int(200_000 * scale)
+        job = SimulationJob(8, 0.75, {0: 1}, default_strategy, seed=0)
+        scheduler = ConvergenceScheduler(job, target_half_width=0, chunk_size=10_000, max_hands=hands,
+                                         processes=processes, progress=None)
+        return scheduler.run, hands
+    return bench
+
+
+def get_benchmarks():
+    """Returns every benchmark by name, each a function of a scale that returns a run and the number of operations the
+    run performs.
+
+    Returns:
+        dict(str: function): The benchmarks
+    """
+    benchmarks = {
+        'shoe_draw': bench_shoe_draw,
+        'csm_draw': bench_csm_draw,
+        'shoe_start_hand': bench_shoe_start_hand,
+        'shoe_shuffle': bench_shoe_shuffle,
+        'bet_spread_get_bet': bench_bet_spread,
+        'parse_strategy_table': bench_parse_strategy_table,
+    }
+    for scenario in SCENARIOS:
+        benchmarks['play_hand_' + scenario] = bench_play_hand(scenario)
+    for processes in sorted({1, 2, multiprocessing.cpu_count()}):
+        benchmarks[f'end_to_end_{processes}_processes'] = bench_end_to_end(processes)
+    return benchmarks
+
+
+def measure(benchmark, scale=1.0, repeat=5):
+    """Measures a benchmark, setting it up afresh for each repeat and keeping the fastest, which is the one least
+    disturbed by the rest of the machine.
+
+    Args:
+        benchmark (function): The benchmark
+        scale (Float, optional): Scales the number of operations. Defaults to 1.
+        repeat (Int, optional): The number of times to run it. Defaults to 5.
+
+    Returns:
+        Float: The operations per second
+    """
+    best = 0.0
+    for _ in range(repeat):
+        run, operations = benchmark(scale)
+        start = time.perf_counter()
+        run()
+        best = max(best, operations / (time.perf_counter() - start))
+    return best
+
+
+def run_benchmarks(names=None, scale=1.0, repeat=5):
+    """Runs benchmarks and prints each result as it finishes. The end to end benchmarks are run once, as each takes
+    far longer than the others.
+
+    Args:
+        names (List[str], optional): The benchmarks to run. Defaults to all of them.
+        scale (Float, optional): Scales the number of operations. Defaults to 1.
+        repeat (Int, optional): The number of times to run each benchmark. Defaults to 5.
+
+    Returns:
+        dict(str: float): The operations per second of each benchmark
+
+    Raises:
+        ValueError: If a benchmark does not exist.
+    """
+    benchmarks = get_benchmarks()
+    for name in names or []:
+        if name not in benchmarks:
+            raise ValueError(f"Invalid benchmark '{name}', expected one of {list(benchmarks)}.")
+    results = {}
+    for name in names or benchmarks:
+        results[name] = measure(benchmarks[name], scale, 1 if name.startswith('end_to_end') else repeat)
+        print('%-32s %14.1f ops/s' % (name, results[name]))
+    return results
+
+
+def save_baseline(results, filename):
+    """Writes benchmark results to a JSON baseline file, along with the machine they were measured on.
+
+    Args:
+        results (dict(str: float)): The operations per second of each benchmark
+        filename (str): The file to write
+    """
+    baseline = {
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': multiprocessing.cpu_count(),
+        'python': platform.python_version(),
+        'benchmarks': results,
+    }
+    with open(filename, 'w') as file:
+        json.dump(baseline, file, indent=4)
+
+
+def load_baseline(filename):
+    """Reads the benchmark results from a JSON baseline file.
+
+    Args:
+        filename (str): The file to read
+
+    Returns:
+        dict(str: float): The operations per second of each benchmark
+
+    Raises:
+        Exception: If the file cannot be found.
+    """
+    try:
+        with open(filename, 'r') as file:
+            return json.load(file)['benchmarks']
+    except FileNotFoundError:
+        raise Exception(f"File '{filename}' not found.")
+
+
+def find_regressions(results, baseline, threshold=0.1):
+    """Compares benchmark results against a baseline.
+
+    Args:
+        results (dict(str: float)): The operations per second of each benchmark
+        baseline (dict(str: float)): The baseline operations per second of each benchmark
+        threshold (Float, optional): The largest slowdown allowed, as a fraction of the baseline. Defaults to 0.1.
+
+    Returns:
+        List[(str, float, float)]: The name, baseline and result of each benchmark slower than allowed
+    """
+    return [(name, baseline[name], result) for name, result in results.items()
+            if name in baseline and result < baseline[name] * (1 - threshold)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the simulator. Run from the repository root.')
+    parser.add_argument('names', nargs='*', help='the benchmarks to run, all of them by default')
+    parser.add_argument('--baseline', help='a JSON baseline to compare against')
+    parser.add_argument('--save', help='write the results to this JSON baseline')
+    parser.add_argument('--threshold', type=float, default=0.1, help='the slowdown that counts as a regression')
+    parser.add_argument('--scale', type=float, default=1.0, help='scales the work done by each benchmark')
+    parser.add_argument('--repeat', type=int, default=5, help='the number of times to run each benchmark')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.names, args.scale, args.repeat)
+    if args.save:
+        save_baseline(results, args.save)
+    if args.baseline:
+        regressions = find_regressions(results, load_baseline(args.baseline), args.threshold)
+        for name, expected, result in regressions:
+            print('Regression in %s: %.1f ops/s against a baseline of %.1f (%+.1f%%)'
+                  % (name, result, expected, 100 * (result / expected - 1)))
+        if regressions:
+            sys.exit(1)
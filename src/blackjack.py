@@ -1,154 +1,331 @@
 from betspread import BetSpread
-from defaultstrategy import strategy as strategy_table
+from compiledstrategy import CompiledStrategy, DOUBLE, HIT, MISSING, SPLIT, STAND, SURRENDER
+from deviations import CompiledDeviations
 from simplifiedshoe import SimplifiedShoe
+from rules import Rules
+from simulationstats import BLACKJACK, DOUBLED, INSURED, SPLIT_HAND, SURRENDERED
 
 class BlackJackSimulator:
     """
     Represents a blackjack simulator.
     """
 
-    def __init__(self, num_decks, penetration, bet_spread, strategy_table, bankroll=0):
+    def __init__(self, num_decks, penetration, bet_spread, strategy_table, bankroll=0, rng=None, shoe=None,
+                 deviations=None, rules=None, insurance_index=None):
         self._bet_spread = BetSpread(bet_spread)
         self._strategy_table = strategy_table
-        self._shoe = SimplifiedShoe(num_decks, penetration)
+        if isinstance(strategy_table, CompiledStrategy):
+            self._strategy = strategy_table
+        else:
+            self._strategy = CompiledStrategy(strategy_table)
+        if deviations is not None and not isinstance(deviations, CompiledDeviations):
+            deviations = CompiledDeviations(self._strategy, deviations)
+        self._deviations = deviations
+        if shoe is None:
+            shoe = SimplifiedShoe(num_decks, penetration, rng=rng)
+        self._shoe = shoe
         self._player_cash = bankroll
         self._player_spending = 0
+        self._hand_bet = 0
+        self._hand_wager = 0
+        self._hand_flags = 0
+        # reused by every hand: the total and bet multiplier of each hand the player ends with, and the split hands
+        # still to be played as pairs of cards
+        self._totals = [0] * 8
+        self._multipliers = [0] * 8
+        self._pending = []
+        # each rule is only checked in the branch of play it changes, so a rule costs nothing on the hands it cannot
+        # affect and the common hands play as fast under any rules
+        if rules is None:
+            rules = Rules()
+        self._rules = rules
+        # the dealer stands on soft hands whose total with aces counted as 1 is at least this
+        self._dealer_soft_stand = 8 if rules.dealer_hits_soft_17 else 7
+        self._dealer_peeks = rules.dealer_peeks
+        self._blackjack_payout = rules.blackjack_payout
+        self._insurance_index = insurance_index if rules.insurance else None
+        # the rows that split aces are played with when they cannot be hit
+        self._stand_row = [STAND] * 22
 
     def play_hand(self):
-        self._shoe.start_hand()
-        player_bet = self._bet_spread.get_bet(self._shoe.get_true_count())
-        self._deal()
+        shoe = self._shoe
+        shoe.start_hand()
+        player_bet = self._bet_spread.get_bet(shoe.get_true_count())
+        self._hand_bet = player_bet
+        player_first, dealer_upcard, player_second, dealer_hole = self._deal()
 
-        dealer_total = self._calculate_total(self._dealer_hand)
-        player_total = self._calculate_total(self._player_hand)
+        dealer_total = dealer_upcard + dealer_hole
+        if (dealer_upcard == 1 or dealer_hole == 1) and dealer_total < 12:
+            dealer_total += 10
+        player_total = player_first + player_second
+        if (player_first == 1 or player_second == 1) and player_total < 12:
+            player_total += 10
 
-        if dealer_total == 21 and player_total == 21:
-            # blackjack push
-            self._player_spending += player_bet
-            self._shoe.card_revealed(self._dealer_hand[1])
-            return 0
-        elif dealer_total == 21 and player_total != 21:
+        # only an ace up can be insured, so the other hands check nothing more
+        insured = dealer_upcard == 1 and self._insurance_index is not None and \
+            shoe.get_true_count() >= self._insurance_index
+        if player_total == 21 or (dealer_total == 21 and self._dealer_peeks):
+            result = self._settle_blackjack(player_bet, player_total, dealer_total)
+            shoe.card_revealed(dealer_hole)
+        else:
+            hard, soft, pairs = self._get_rows(dealer_upcard)
+            num_hands = self._play_player_hands(hard, soft, pairs, player_first, player_second, shoe)
+            dealer_outcome = self._play_dealer_hand(dealer_upcard, dealer_hole, shoe)
+            shoe.card_revealed(dealer_hole)
+            result = self._settle(player_bet, num_hands, dealer_outcome, dealer_total == 21)
+        if insured:
+            result += self._insure(player_bet, dealer_total == 21)
+        return result
+
+    def _get_rows(self, dealer_upcard):
+        """Returns the strategy rows to play a hand against the dealer's upcard with.
+
+        Args:
+            dealer_upcard (Int): The dealer's upcard
+
+        Returns:
+            (List[Int], List[Int], List[Int]): The hard, soft and pairs rows
+        """
+        if self._deviations is None:
+            return self._strategy.hard[dealer_upcard], self._strategy.soft[dealer_upcard], \
+                self._strategy.pairs[dealer_upcard]
+        # the count of every card the player can see, taken once for all of the hand's decisions
+        return self._deviations.get_rows(dealer_upcard, self._shoe.get_true_count())
+
+    def _settle_blackjack(self, player_bet, player_total, dealer_total):
+        """Settles a hand that ends before the player plays, as the player or the dealer has blackjack.
+
+        Args:
+            player_bet (Float): The player's initial bet
+            player_total (Int): The player's two card total
+            dealer_total (Int): The dealer's two card total
+
+        Returns:
+            Float: The amount won or lost
+        """
+        self._player_spending += player_bet
+        self._hand_wager = player_bet
+        if player_total != 21:
             # dealer blackjack
-            self._player_spending += player_bet
-            self._player_cash -= player_bet
-            self._shoe.card_revealed(self._dealer_hand[1])
-            return -player_bet
-        elif player_total == 21:
+            self._hand_flags = 0
+            result = -player_bet
+        elif dealer_total == 21:
+            # blackjack push
+            self._hand_flags = BLACKJACK
+            result = 0
+        else:
             # blackjack
-            self._player_spending += player_bet
-            self._player_cash += 1.5 * player_bet
-            self._shoe.card_revealed(self._dealer_hand[1])
-            return 1.5 * player_bet
+            self._hand_flags = BLACKJACK
+            result = self._blackjack_payout * player_bet
+        self._player_cash += result
+        return result
+
+    def _settle(self, player_bet, num_hands, dealer_total, dealer_blackjack=False):
+        """Settles the player's hands in the result buffers against the dealer's total.
 
-        player_outcomes = self._play_player_hand(self._dealer_hand[0], self._player_hand, self._shoe)
-        dealer_outcome = self._play_dealer_hand(self._dealer_hand, self._shoe)
-        dealer_outcome = dealer_outcome if dealer_outcome <= 21 else 0
-        self._shoe.card_revealed(self._dealer_hand[1])
+        Args:
+            player_bet (Float): The player's initial bet
+            num_hands (Int): The number of hands in the result buffers, or 0 if the player surrendered
+            dealer_total (Int): The dealer's total
+            dealer_blackjack (Boolean, optional): The dealer has a blackjack they did not peek for, which takes every
+            bet. Defaults to False.
 
+        Returns:
+            Float: The amount won or lost
+        """
+        if num_hands == 0:
+            # surrender only saves half the bet once the dealer is known not to have blackjack
+            result = -player_bet if dealer_blackjack else -0.5 * player_bet
+            self._player_cash += result
+            self._player_spending += player_bet
+            self._hand_wager = player_bet
+            self._hand_flags = SURRENDERED
+            return result
+        if dealer_blackjack:
+            # beats every total
+            dealer_outcome = 22
+        else:
+            dealer_outcome = dealer_total if dealer_total <= 21 else 0
+        totals = self._totals
+        multipliers = self._multipliers
         sum = 0
-        for outcome in player_outcomes:
-            self._player_spending += player_bet * outcome[1]
-            if outcome[0] > 21 or outcome[0] < dealer_outcome:
-                self._player_cash -= player_bet * outcome[1]
-                sum -= player_bet * outcome[1]
-            elif outcome[0] > dealer_outcome:
-                self._player_cash += player_bet * outcome[1]
-                sum += player_bet * outcome[1]
+        wager = 0
+        flags = SPLIT_HAND if num_hands > 1 else 0
+        for hand in range(num_hands):
+            total = totals[hand]
+            multiplier = multipliers[hand]
+            wager += player_bet * multiplier
+            if multiplier == 2:
+                flags |= DOUBLED
+            if total > 21 or total < dealer_outcome:
+                self._player_cash -= player_bet * multiplier
+                sum -= player_bet * multiplier
+            elif total > dealer_outcome:
+                self._player_cash += player_bet * multiplier
+                sum += player_bet * multiplier
+        self._player_spending += wager
+        self._hand_wager = wager
+        self._hand_flags = flags
         return sum
 
-    def _play_player_hand(self, dealer_upcard, player_hand, shoe):
-        dealer_upcard = self._card_representative(dealer_upcard)
-        player_total = self._calculate_total(player_hand)
-        if (player_total >= 21):
-            return [(player_total, 1)]
-        
-        if len(player_hand) == 2 and player_hand[0] == player_hand[1]:
-            strategy = strategy_table['pairs'][(dealer_upcard, self._card_representative(player_hand[0]) + self._card_representative(player_hand[1]))]
-        elif self._is_soft(player_hand):
-            strategy = strategy_table['soft'][(dealer_upcard, str(player_total))]
-        else:
-            strategy = strategy_table['hard'][(dealer_upcard, str(player_total))]
-        
-        if strategy == 'P':
-            hand1 = [player_hand[0]]
-            hand1.append(shoe.draw())
-            hand2 = [player_hand[1]]
-            hand2.append(shoe.draw())
-            results1 = self._play_player_hand(dealer_upcard, hand1, shoe)
-            results2 = self._play_player_hand(dealer_upcard, hand2, shoe)
-            results1.extend(results2)
-            return results1
-        elif strategy == 'S':
-            return [(player_total, 1)]
-        elif strategy == 'H' or (strategy == 'D' and len(player_hand) > 2):
-            player_hand.append(shoe.draw())
-            return self._play_player_hand(dealer_upcard, player_hand, shoe)
-        elif strategy == 'D':
-            player_hand.append(shoe.draw())
-            return [(self._calculate_total(player_hand), 2)]
-        
-    def _play_dealer_hand(self, dealer_hand, shoe):
-        """Plays the dealer's hand.
+    def _insure(self, player_bet, dealer_blackjack):
+        """Settles an insurance bet of half the player's initial bet, which pays 2:1 against a dealer blackjack.
 
         Args:
-            dealer_hand (List[Int]): The dealer's hand
-            shoe (SimplifiedShoe): The shoe
+            player_bet (Float): The player's initial bet
+            dealer_blackjack (Boolean): The dealer has blackjack
 
         Returns:
-            Int: The dealer's total
+            Float: The amount won or lost on the insurance
         """
-        total = self._calculate_total(dealer_hand)
-        if (total == 17 and not self._is_soft(dealer_hand)) or total > 17:
-            return total
-        dealer_hand.append(shoe.draw())
-        return self._play_dealer_hand(dealer_hand, shoe)
+        insurance_bet = 0.5 * player_bet
+        result = 2 * insurance_bet if dealer_blackjack else -insurance_bet
+        self._player_cash += result
+        self._player_spending += insurance_bet
+        self._hand_wager += insurance_bet
+        self._hand_flags |= INSURED
+        return result
 
-    def _deal(self):
-        """Deals a hand of blackjack.
-        """
-        self._player_hand = []
-        self._dealer_hand = []
-        self._player_hand.append(self._shoe.draw())
-        self._dealer_hand.append(self._shoe.draw())
-        self._player_hand.append(self._shoe.draw())
-        self._dealer_hand.append(self._shoe.draw_face_down())
-
-    def _card_representative(self, card_value):
-        if card_value == 10:
-            return 'T'
-        elif card_value == 1:
-            return 'A'
-        else:
-            return str(card_value)
-    
-    def _is_soft(self, hand):
-        """Determines if a hand is soft.
+    def _can_split(self, card, split, hands):
+        """Checks whether the rules allow a pair to be split.
 
         Args:
-            hand (List[Int]): The hand to check
+            card (Int): The card of the pair
+            split (Boolean): The player has already split this hand
+            hands (Int): The number of hands the player has
 
         Returns:
-            Boolean: True if the hand is soft, False otherwise
+            Boolean: Whether the pair can be split
         """
-        total = sum(hand)
-        if hand.count(1) == 0:
+        rules = self._rules
+        if rules.max_hands is not None and hands >= rules.max_hands:
             return False
-        else:
-            return total <= 11
-        
-    def _calculate_total(self, hand):
-        """Calculates the total value of a hand.
+        return card != 1 or not split or rules.resplit_aces
+
+    def _play_player_hands(self, hard, soft, pairs, first, second, shoe):
+        """Plays the player's hand, and every hand split from it, as a loop over the cards drawn. Each hand is kept as
+        its total with aces counted as 1 and whether it holds an ace, so each card updates it in constant time. When a
+        hand splits, both new hands get their second card, the second is put aside and the first is played on, so the
+        hands are played and the cards drawn in the same order as playing each split hand through in turn. The total
+        and bet multiplier of each finished hand are left in the result buffers. The split, double after split and
+        surrender rules are only checked when the strategy calls for those actions.
 
         Args:
-            hand (List[Int]): The hand to calculate the total of
+            hard (List[Int]): The compiled hard table for the dealer's upcard, indexed by player total
+            soft (List[Int]): The compiled soft table for the dealer's upcard, indexed by player total
+            pairs (List[Int]): The compiled pairs table for the dealer's upcard, indexed by pair card
+            first (Int): The player's first card
+            second (Int): The player's second card
+            shoe (SimplifiedShoe): The shoe
 
         Returns:
-            Int: The total value of the hand
+            Int: The number of hands played, or 0 if the player surrendered
+
+        Raises:
+            ValueError: If the strategy calls for an action the simulator does not play.
         """
-        num_aces = hand.count(1)
-        total = sum(hand)
-        if num_aces == 0 or total >= 12:
-            return total 
-        else:
-            return total + 10
-        
\ No newline at end of file
+        totals = self._totals
+        multipliers = self._multipliers
+        pending = self._pending
+        num_hands = 0
+        split = False
+        while True:
+            hard_total = first + second
+            has_ace = first == 1 or second == 1
+            num_cards = 2
+            while True:
+                is_soft = has_ace and hard_total < 12
+                total = hard_total + 10 if is_soft else hard_total
+                if total >= 21:
+                    multiplier = 1
+                    break
+
+                if num_cards == 2 and first == second:
+                    action = pairs[first]
+                    if action == SPLIT and not self._can_split(first, split, num_hands + 1 + len(pending) // 2):
+                        # played as its total, hard 4 and soft 12 are left out of the tables as they are always split
+                        action = soft[total] if is_soft else hard[total]
+                        if action == MISSING:
+                            action = HIT
+                elif is_soft:
+                    action = soft[total]
+                else:
+                    action = hard[total]
+
+                if action == SPLIT:
+                    if first == 1 and not self._rules.hit_split_aces:
+                        # every hand from this split is an ace, so stand on each unless it can be split again
+                        hard = soft = self._stand_row
+                    split = True
+                    second = shoe.draw()
+                    pending.append(first)
+                    pending.append(shoe.draw())
+                    hard_total = first + second
+                    has_ace = first == 1 or second == 1
+                elif action == STAND:
+                    multiplier = 1
+                    break
+                elif action == HIT or (action == DOUBLE and (num_cards > 2 or
+                                                            (split and not self._rules.double_after_split))) or \
+                        (action == SURRENDER and (num_cards > 2 or split or not self._rules.late_surrender)):
+                    card = shoe.draw()
+                    hard_total += card
+                    has_ace = has_ace or card == 1
+                    num_cards += 1
+                elif action == DOUBLE:
+                    card = shoe.draw()
+                    hard_total += card
+                    has_ace = has_ace or card == 1
+                    total = hard_total + 10 if has_ace and hard_total < 12 else hard_total
+                    multiplier = 2
+                    break
+                elif action == SURRENDER:
+                    return 0
+                else:
+                    raise ValueError(f"The simulator cannot play action {action}.")
+
+            if num_hands == len(totals):
+                totals.append(total)
+                multipliers.append(multiplier)
+            else:
+                totals[num_hands] = total
+                multipliers[num_hands] = multiplier
+            num_hands += 1
+            if not pending:
+                return num_hands
+            second = pending.pop()
+            first = pending.pop()
+
+    def _play_dealer_hand(self, upcard, hole, shoe):
+        """Plays the dealer's hand, hitting or standing on soft 17 as the rules say.
+
+        Args:
+            upcard (Int): The dealer's upcard
+            hole (Int): The dealer's hole card
+            shoe (SimplifiedShoe): The shoe
+
+        Returns:
+            Int: The dealer's total
+        """
+        soft_stand = self._dealer_soft_stand
+        hard_total = upcard + hole
+        has_ace = upcard == 1 or hole == 1
+        while True:
+            if has_ace and hard_total < 12:
+                if hard_total >= soft_stand:
+                    return hard_total + 10
+            elif hard_total >= 17:
+                return hard_total
+            card = shoe.draw()
+            hard_total += card
+            has_ace = has_ace or card == 1
+
+    def _deal(self):
+        """Deals a hand of blackjack.
+
+        Returns:
+            (Int, Int, Int, Int): The player's first card, the dealer's upcard, the player's second card and the
+            dealer's hole card
+        """
+        shoe = self._shoe
+        return shoe.draw(), shoe.draw(), shoe.draw(), shoe.draw_face_down()
@@ -1,66 +1,64 @@
-import multiprocessing
 import time
 
 from matplotlib import pyplot as plt
 from betspread import BetSpread
+from batchsimulator import BatchBlackJackSimulator
 from blackjack import BlackJackSimulator
 from parsestrategy import parse_strategy_table
+from scheduler import ConvergenceScheduler, SimulationJob
 from defaultstrategy import strategy as strategy_table
+from handlog import HandLog
+from handplot import plot_bankroll
+from simulationstats import SimulationStats
 
 
-def run_sim(runs, bank_values):
+def run_sim(runs):
     spread = {0:1}
     # spread = BetSpread(spread)
     # spread = {0:0, 1:1, 2:3, 3:5, 4:7, 5:9}
     sim = BlackJackSimulator(8, 0.75, spread, strategy_table, 0)
+    stats = SimulationStats()
     for _ in range(runs):
         value = sim.play_hand()
-        bank_values.append(value)
-    return sim._player_cash, sim._player_spending, bank_values
+        stats.update(value, sim._hand_wager, sim._hand_flags)
+    return stats
+
+def run_batch_sim(runs, num_shoes=10_000):
+    spread = {0:1}
+    sim = BatchBlackJackSimulator(8, 0.75, spread, strategy_table, num_shoes, 0)
+    stats = SimulationStats()
+    # the last batch is trimmed so that exactly runs hands are counted
+    for start in range(0, runs, num_shoes):
+        values = sim.play_hand()
+        hands = min(num_shoes, runs - start)
+        stats.update_many(values[:hands], sim._hand_wager[:hands], sim._hand_flags[:hands])
+    return stats
 
 if __name__ == '__main__':
     start_time = time.time()
 
     # parse_strategy_table('basicstrategy.csv', strategy_table)
 
-    num_processes = multiprocessing.cpu_count()
-    pool = multiprocessing.Pool(processes=num_processes)
-
-    num_runs = 1_000_000
-    runs = [int(num_runs / num_processes)] * num_processes
-    process_args = [(run, []) for run in runs]
-    results = pool.starmap(run_sim, process_args)
-    # results = [run_sim(num_runs)]
-
-
-    pool.close()
-    pool.join()
+    job = SimulationJob(8, 0.75, {0:1}, strategy_table, seed=0, log_directory='handlog',
+                        variance_reduction=True)
+    stats = ConvergenceScheduler(job, target_half_width=0.002, max_hands=1_000_000).run()
     print('Sim completed in %s seconds.' % (time.time() - start_time))
 
-    banks = [result[2] for result in results]
-    l=[]
-    # for i in range(int(num_runs/8)):
-    #     l.append(sum([bank[i] for bank in banks]))
-
-    l = []
-    for bank in banks:
-        l.extend(bank)
-    l.insert(0, 0)
-    for i in range(1, len(l)):
-        l[i] += l[i-1]
+    plot_bankroll(HandLog('handlog'))
+    plt.show()
 
-    plt.plot(l, marker='o')
-    # plt.plot(banks[1], marker='o')
-    # plt.plot(banks[2], marker='o')
-    # plt.plot(banks[3], marker='o')
-    # plt.plot(banks[4], marker='o')
-    # plt.plot(banks[5], marker='o')
-    # plt.plot(banks[6], marker='o')
-    # plt.plot(banks[7], marker='o')
-    plt.xlabel('Number of Hands')
-    plt.ylabel('Bank Value')
+    histogram = stats.get_histogram()
+    plt.bar(list(histogram.keys()), list(histogram.values()), width=0.4)
+    plt.xlabel('Hand Result')
+    plt.ylabel('Number of Hands')
     plt.show()
 
-    print('Total runs:', sum(runs))
-    print('House edge:', (sum([result[0] for result in results])) / sum([result[1] for result in results]))
+    print('Total runs:', stats.count)
+    print('House edge:', stats.get_house_edge())
+    print('95%% confidence interval: (%s, %s)' % stats.get_confidence_interval())
+    print('Variance per hand:', stats.get_variance())
+    print('Wins: %s Pushes: %s Losses: %s' % (stats.wins, stats.pushes, stats.losses))
+    print('Blackjacks: %s Doubles: %s Splits: %s' % (stats.blackjacks, stats.doubles, stats.splits))
+    print('Max drawdown:', stats.max_drawdown)
+    stats.controls.print_report()
     print('Process finished in %s seconds.' % (time.time() - start_time))
@@ -0,0 +1,112 @@
+from parsestrategy import parse_strategy_table
+
+# integer action codes, MISSING marks situations the table does not cover
+MISSING = -1
+STAND = 0
+HIT = 1
+DOUBLE = 2
+SPLIT = 3
+SURRENDER = 4
+
+ACTIONS = {'S': STAND, 'H': HIT, 'D': DOUBLE, 'P': SPLIT, 'R': SURRENDER}
+CARDS = {'A': 1, '2': 2, '3': 3, '4': 4, '5': 5, '6': 6, '7': 7, '8': 8, '9': 9, 'T': 10}
+
+# the player situations that can come up in play and so must be in the table, hard 4 and soft 12 only occur as pairs
+HARD_TOTALS = range(5, 21)
+SOFT_TOTALS = range(13, 21)
+PAIR_CARDS = range(1, 11)
+
+
+def pair_card(pair):
+    """Returns the card value of a pair key such as 'AA' or '88'.
+
+    Args:
+        pair (str): The pair key
+
+    Returns:
+        Int: The card value of the pair, with 1 for an ace
+
+    Raises:
+        ValueError: If the key is not a pair.
+    """
+    if len(pair) != 2 or pair[0] != pair[1] or pair[0] not in CARDS:
+        raise ValueError(f"Invalid pair '{pair}' found in strategy table.")
+    return CARDS[pair[0]]
+
+
+class CompiledStrategy:
+    """Represents a strategy table compiled into dense integer lookup tables, so that each decision is a list index
+    rather than building string keys for a dictionary lookup.
+    """
+
+    def __init__(self, strategy_table):
+        """Initializes a CompiledStrategy object from a strategy table of the form produced by parse_strategy_table.
+        Each of the hard, soft and pairs tables is compiled into a list per dealer upcard, indexed by the player's
+        total for the hard and soft tables and by the card value of the pair for the pairs table. Upcards and pair
+        cards use their blackjack value, with 1 for an ace. Every situation that can come up in play must be covered by
+        the table.
+
+        Args:
+            strategy_table (dict): The strategy table, with 'hard', 'soft' and 'pairs' tables keyed by
+            (dealer card, player hand) strings.
+
+        Raises:
+            ValueError: If the table contains an invalid entry or does not cover every situation.
+        """
+        self.hard = self._compile(strategy_table['hard'], 22, int)
+        self.soft = self._compile(strategy_table['soft'], 22, int)
+        self.pairs = self._compile(strategy_table['pairs'], 11, pair_card)
+        self._check_complete('hard', self.hard, HARD_TOTALS)
+        self._check_complete('soft', self.soft, SOFT_TOTALS)
+        self._check_complete('pairs', self.pairs, PAIR_CARDS)
+        for row in self.hard + self.soft:
+            if SPLIT in row:
+                raise ValueError("Split is only a valid option in the pairs table.")
+
+    def _compile(self, table, size, player_index):
+        """Compiles one table into a list of lists indexed by dealer upcard and then player index.
+
+        Args:
+            table (dict((str, str): str)): The table to compile
+            size (Int): The number of player indexes
+            player_index (function): Converts the player part of a key to its index
+
+        Returns:
+            List[List[Int]]: The compiled table
+        """
+        compiled = [[MISSING] * size for _ in range(11)]
+        for (dealer_card, player), action in table.items():
+            if dealer_card not in CARDS:
+                raise ValueError(f"Invalid dealer card '{dealer_card}' found in strategy table.")
+            if action not in ACTIONS:
+                raise ValueError(f"Invalid option '{action}' found in strategy table.")
+            index = player_index(player)
+            if not 0 <= index < size:
+                raise ValueError(f"Invalid player hand '{player}' found in strategy table.")
+            compiled[CARDS[dealer_card]][index] = ACTIONS[action]
+        return compiled
+
+    def _check_complete(self, name, compiled, player_indexes):
+        """Checks that a compiled table has an action for every dealer upcard and player index.
+
+        Raises:
+            ValueError: If any entry is missing.
+        """
+        missing = [(dealer_card, index) for dealer_card in CARDS for index in player_indexes
+                   if compiled[CARDS[dealer_card]][index] == MISSING]
+        if missing:
+            raise ValueError(f"Strategy table '{name}' is missing entries for {missing}.")
+
+
+def load_strategy(filename):
+    """Parses a strategy csv from the files directory and compiles it.
+
+    Args:
+        filename (str): The name of the strategy file
+
+    Returns:
+        CompiledStrategy: The compiled strategy
+    """
+    strategy_table = {}
+    parse_strategy_table(filename, strategy_table)
+    return CompiledStrategy(strategy_table)
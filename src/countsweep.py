@@ -0,0 +1,150 @@
+import math
+
+import numpy as np
+
+from betspread import BetSpread
+from blackjack import BlackJackSimulator
+from simplifiedshoe import SimplifiedShoe
+from simulationstats import SimulationStats
+
+
+class CountSweep:
+    """Represents a sweep over counting systems and bet spreads. Playing decisions never depend on the count, so every
+    hand is played once at a flat bet of 1 and its unit outcome is scaled by the bet each combination of counting
+    system and bet spread would have placed. Every combination sees exactly the same hands, so the differences between
+    them carry far less noise than separate runs would.
+    """
+
+    def __init__(self, num_decks, penetration, strategy_table, count_systems, bet_spreads, rng=None,
+                 chunk_size=10_000):
+        """Initializes a CountSweep object.
+
+        Args:
+            num_decks (Int): The number of decks in the shoe
+            penetration (Float): The penetration of the shoe, represented as a decimal between 0 and 1
+            strategy_table (dict or CompiledStrategy): The strategy table
+            count_systems (dict(str: dict)): The counting systems to compare by name, each given as the count value of
+            each card as in SimplifiedShoe
+            bet_spreads (dict(str: dict)): The bet spreads to compare by name, see BetSpread
+            rng (random.Random, optional): The random number generator for the shuffles. Defaults to the random
+            module.
+            chunk_size (Int, optional): The number of hands buffered before they are folded into the statistics.
+            Defaults to 10,000.
+        """
+        self._shoe = SimplifiedShoe(num_decks, penetration, rng=rng)
+        self._sim = BlackJackSimulator(num_decks, penetration, {0: 1}, strategy_table, shoe=self._shoe)
+        self._chunk_size = chunk_size
+
+        self._system_names = list(count_systems)
+        self._tags = []
+        for counts in count_systems.values():
+            tags = [0] * 11
+            for card, value in counts.items():
+                tags[card] = value
+            self._tags.append(tags)
+        self._running_counts = [0] * len(self._tags)
+
+        # each spread becomes a table of bets over the true counts it covers, clipped at both ends
+        self._spread_names = list(bet_spreads)
+        self._spreads = []
+        for bet_spread in bet_spreads.values():
+            spread = BetSpread(bet_spread)
+            min_count = min(bet_spread.keys())
+            max_count = max(bet_spread.keys())
+            bets = np.array([spread.get_bet(tc) for tc in range(min_count, max_count + 1)], dtype=np.float64)
+            self._spreads.append((min_count, max_count, bets))
+
+        self.results = {(system, spread): SimulationStats()
+                        for system in self._system_names for spread in self._spread_names}
+
+    def run(self, hands):
+        """Plays hands and folds them into the results of every combination.
+
+        Args:
+            hands (Int): The number of hands to play
+
+        Returns:
+            dict((str, str): SimulationStats): The statistics of each counting system and bet spread
+        """
+        for start in range(0, hands, self._chunk_size):
+            self._run_chunk(min(self._chunk_size, hands - start))
+        return self.results
+
+    def _run_chunk(self, hands):
+        """Plays a chunk of hands, recording each true count before the hand, then applies every bet spread to the
+        chunk at once.
+
+        Args:
+            hands (Int): The number of hands to play
+        """
+        shoe = self._shoe
+        sim = self._sim
+        shoe_size = len(shoe.cards)
+        running_counts = self._running_counts
+        true_counts = [[0] * hands for _ in self._tags]
+        outcomes = [0.0] * hands
+        wagers = [0.0] * hands
+        flags = [0] * hands
+
+        for hand in range(hands):
+            # shuffling here means the simulator's own start_hand will not shuffle again
+            if shoe.start_hand():
+                running_counts = [0] * len(self._tags)
+            start = shoe.get_cards_dealt()
+            decks_remaining = (shoe_size - start) / 52
+            for system, running_count in enumerate(running_counts):
+                true_counts[system][hand] = int(running_count / decks_remaining)
+
+            outcomes[hand] = sim.play_hand()
+            wagers[hand] = sim._hand_wager
+            flags[hand] = sim._hand_flags
+
+            dealt = shoe.cards[start:shoe.get_cards_dealt()]
+            for system, tags in enumerate(self._tags):
+                running_counts[system] += sum(tags[card] for card in dealt)
+        self._running_counts = running_counts
+
+        outcomes = np.array(outcomes)
+        wagers = np.array(wagers)
+        flags = np.array(flags, dtype=np.int8)
+        for system_name, system_counts in zip(self._system_names, true_counts):
+            system_counts = np.array(system_counts)
+            for spread_name, (min_count, max_count, bets) in zip(self._spread_names, self._spreads):
+                bet = bets[np.clip(system_counts, min_count, max_count) - min_count]
+                self.results[system_name, spread_name].update_many(bet * outcomes, bet * wagers, flags)
+
+    def get_table(self):
+        """Returns the metrics of every counting system and bet spread, with the mean and variance per hand in units of
+        the spread's bets. SCORE is the win per 100 hands of a player betting the spread at the Kelly optimal scale with
+        a bankroll of 10,000 units, and the desirability index is the square root of SCORE. Both keep the sign of the
+        win rate.
+
+        Returns:
+            List[dict]: One row per combination, with its system, spread, edge, win rate, variance, score and di
+        """
+        table = []
+        for (system, spread), stats in self.results.items():
+            mean = stats.get_mean()
+            variance = stats.get_variance()
+            table.append({
+                'system': system,
+                'spread': spread,
+                'edge': stats.get_house_edge(),
+                'win rate': mean,
+                'variance': variance,
+                'score': 1e6 * mean * abs(mean) / variance if variance > 0 else 0.0,
+                'di': 1000 * mean / math.sqrt(variance) if variance > 0 else 0.0,
+            })
+        return table
+
+
+def print_table(table):
+    """Prints the rows returned by CountSweep.get_table.
+
+    Args:
+        table (List[dict]): The rows to print
+    """
+    print('%-12s %-12s %9s %9s %9s %8s %8s' % ('System', 'Spread', 'Edge', 'Win rate', 'Variance', 'SCORE', 'DI'))
+    for row in table:
+        print('%-12s %-12s %9.5f %9.5f %9.3f %8.2f %8.3f' % (row['system'], row['spread'], row['edge'],
+                                                            row['win rate'], row['variance'], row['score'], row['di']))
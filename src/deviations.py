@@ -0,0 +1,141 @@
+from compiledstrategy import ACTIONS, CARDS, SPLIT, CompiledStrategy, pair_card
+
+# the tables a deviation can change, with the number of player indexes in each
+TABLES = {'hard': 22, 'soft': 22, 'pairs': 11}
+COMPARISONS = ['>=', '<']
+
+
+def parse_deviations(filename):
+    """Parses a csv of strategy deviations from the files directory. The file starts with a ---DEVIATIONS line and a
+    header, and each following line gives the table, player hand and dealer card of a situation in the same form as a
+    strategy csv, then whether the deviation applies at true counts >= or < its index, the index and the action.
+
+    Args:
+        filename (str): The name of the deviations file
+
+    Returns:
+        List[(str, str, str, str, Int, str)]: The deviations
+
+    Raises:
+        Exception: If the file cannot be found or read.
+        ValueError: If a line does not have six fields.
+    """
+    lines = []
+    try:
+        with open('files/' + filename, 'r') as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    lines.append(line)
+    except FileNotFoundError:
+        raise Exception(f"File '{filename}' not found.")
+    except IOError:
+        raise Exception(f"Error reading file '{filename}'.")
+
+    deviations = []
+    for line in lines[lines.index('---DEVIATIONS') + 2:]:
+        if line.startswith('---'):
+            break
+        values = line.split(',')
+        if len(values) != 6:
+            raise ValueError(f"Invalid deviation '{line}' found in deviations file.")
+        table, hand, dealer_card, comparison, index, action = values
+        deviations.append((table, hand, dealer_card, comparison, int(index), action))
+    return deviations
+
+
+class CompiledDeviations:
+    """Represents strategy deviations compiled against a strategy. The true count is fixed for the whole of a hand, so
+    rather than checking each deviation at each decision, every true count at which the deviations for an upcard
+    differ gets its own copy of the compiled rows with those deviations applied. Looking up the rows once per hand then
+    leaves each decision the same single list index as playing without deviations.
+    """
+
+    def __init__(self, strategy, deviations):
+        """Initializes a CompiledDeviations object.
+
+        Args:
+            strategy (CompiledStrategy): The strategy the deviations change
+            deviations (List[(str, str, str, str, Int, str)]): The deviations, in the form produced by
+            parse_deviations. Later deviations for the same situation take precedence.
+
+        Raises:
+            ValueError: If a deviation is invalid.
+        """
+        self.strategy = strategy
+        by_upcard = [[] for _ in range(11)]
+        for deviation in deviations:
+            self._check(deviation)
+            by_upcard[CARDS[deviation[2]]].append(deviation)
+
+        self._rows = []
+        for upcard, upcard_deviations in enumerate(by_upcard):
+            if not upcard_deviations:
+                self._rows.append((0, [self._apply(upcard, [], 0)]))
+                continue
+            # below the lowest index every deviation is settled, as it is from the highest index up
+            low = min(deviation[4] for deviation in upcard_deviations) - 1
+            high = max(deviation[4] for deviation in upcard_deviations)
+            self._rows.append((low, [self._apply(upcard, upcard_deviations, true_count)
+                                     for true_count in range(low, high + 1)]))
+
+    def get_rows(self, upcard, true_count):
+        """Returns the compiled rows to play a hand with.
+
+        Args:
+            upcard (Int): The dealer's upcard, with 1 for an ace
+            true_count (Int): The true count
+
+        Returns:
+            (List[Int], List[Int], List[Int]): The hard, soft and pairs rows for the upcard at the true count
+        """
+        low, rows = self._rows[upcard]
+        return rows[min(max(true_count - low, 0), len(rows) - 1)]
+
+    def _apply(self, upcard, deviations, true_count):
+        """Returns copies of the strategy's rows for an upcard with the deviations that apply at a true count.
+        """
+        rows = {'hard': list(self.strategy.hard[upcard]), 'soft': list(self.strategy.soft[upcard]),
+                'pairs': list(self.strategy.pairs[upcard])}
+        for table, hand, _, comparison, index, action in deviations:
+            if (true_count >= index) == (comparison == '>='):
+                player_index = pair_card(hand) if table == 'pairs' else int(hand)
+                rows[table][player_index] = ACTIONS[action]
+        return rows['hard'], rows['soft'], rows['pairs']
+
+    def _check(self, deviation):
+        """Checks that a deviation names a real situation and an action the simulator can play.
+
+        Raises:
+            ValueError: If the deviation is invalid.
+        """
+        table, hand, dealer_card, comparison, _, action = deviation
+        if table not in TABLES:
+            raise ValueError(f"Invalid table '{table}' found in deviation {deviation}.")
+        if dealer_card not in CARDS:
+            raise ValueError(f"Invalid dealer card '{dealer_card}' found in deviation {deviation}.")
+        if comparison not in COMPARISONS:
+            raise ValueError(f"Invalid comparison '{comparison}' found in deviation {deviation}.")
+        if action not in ACTIONS:
+            raise ValueError(f"Invalid option '{action}' found in deviation {deviation}.")
+        if ACTIONS[action] == SPLIT and table != 'pairs':
+            raise ValueError("Split is only a valid option in the pairs table.")
+        if table == 'pairs':
+            pair_card(hand)
+        elif not hand.isdigit() or not 0 <= int(hand) < TABLES[table]:
+            raise ValueError(f"Invalid player hand '{hand}' found in deviation {deviation}.")
+
+
+def load_deviations(filename, strategy):
+    """Parses a deviations csv from the files directory and compiles it against a strategy.
+
+    Args:
+        filename (str): The name of the deviations file
+        strategy (dict or CompiledStrategy): The strategy the deviations change
+
+    Returns:
+        CompiledDeviations: The compiled deviations
+    """
+    if not isinstance(strategy, CompiledStrategy):
+        strategy = CompiledStrategy(strategy)
+    return CompiledDeviations(strategy, parse_deviations(filename))
@@ -0,0 +1,229 @@
+import argparse
+import json
+import queue
+import socket
+import struct
+import threading
+
+from parsestrategy import parse_strategy_table
+from scheduler import SimulationJob
+from simulationstats import SimulationStats
+
+# every message is a 4 byte big endian length followed by that many bytes of utf-8 JSON
+HEADER = struct.Struct('>I')
+
+
+def send_message(connection, message):
+    """Sends one message over a socket.
+
+    Args:
+        connection (socket.socket): The socket
+        message (dict): The message, which must be JSON serializable
+    """
+    body = json.dumps(message).encode('utf-8')
+    connection.sendall(HEADER.pack(len(body)) + body)
+
+
+def receive_message(connection):
+    """Receives one message from a socket.
+
+    Args:
+        connection (socket.socket): The socket
+
+    Returns:
+        dict: The message
+
+    Raises:
+        ConnectionError: If the socket closes before the whole message arrives.
+    """
+    length, = HEADER.unpack(_receive_exactly(connection, HEADER.size))
+    return json.loads(_receive_exactly(connection, length).decode('utf-8'))
+
+
+def _receive_exactly(connection, size):
+    """Receives exactly size bytes from a socket.
+
+    Raises:
+        ConnectionError: If the socket closes first.
+    """
+    data = bytearray()
+    while len(data) < size:
+        received = connection.recv(size - len(data))
+        if not received:
+            raise ConnectionError("The connection closed in the middle of a message.")
+        data += received
+    return bytes(data)
+
+
+class Coordinator:
+    """Represents the coordinator of a simulation spread over worker processes on any number of machines. The job is
+    split into seeded chunks that workers ask for one at a time over TCP, so a chunk's results do not depend on which
+    worker plays it. A chunk whose worker disconnects or stops answering goes back on the queue for another worker.
+    """
+
+    def __init__(self, job, hands, chunk_size=10_000, host='localhost', port=0, chunk_timeout=600):
+        """Initializes a Coordinator object and starts listening for workers.
+
+        Args:
+            job (SimulationJob): The job to run
+            hands (Int): The number of hands to play
+            chunk_size (Int, optional): The number of hands in each chunk. Defaults to 10,000.
+            host (str, optional): The address to listen on. Defaults to 'localhost'.
+            port (Int, optional): The port to listen on, 0 picks a free port. Defaults to 0.
+            chunk_timeout (Float, optional): Seconds to wait for a worker to finish a chunk before giving the chunk
+            to another worker. Defaults to 600.
+        """
+        self._job = job
+        self._chunks = [(index, min(chunk_size, hands - start))
+                        for index, start in enumerate(range(0, hands, chunk_size))]
+        self._chunk_timeout = chunk_timeout
+        self._pending = queue.Queue()
+        for chunk in self._chunks:
+            self._pending.put(chunk)
+        self._results = {}
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        self._workers = []
+        self._server = socket.create_server((host, port))
+        self.address = self._server.getsockname()[:2]
+
+    def run(self):
+        """Serves chunks to workers until every chunk has been played.
+
+        Returns:
+            SimulationStats: The statistics of every hand, merged in chunk order
+        """
+        if not self._chunks:
+            self._finished.set()
+        accept_thread = threading.Thread(target=self._accept, daemon=True)
+        accept_thread.start()
+        self._finished.wait()
+        accept_thread.join()
+        self._server.close()
+        # let every connected worker be told there is nothing left before returning
+        for worker in self._workers:
+            worker.join()
+
+        stats = SimulationStats()
+        for index, _ in self._chunks:
+            stats.merge(self._results[index])
+        return stats
+
+    def _accept(self):
+        """Accepts workers until the run finishes, serving each on its own thread.
+        """
+        # closing the socket does not wake a blocked accept, so wake up regularly to check for the end of the run
+        self._server.settimeout(0.1)
+        while not self._finished.is_set():
+            try:
+                connection, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            worker = threading.Thread(target=self._serve, args=(connection,), daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def _serve(self, connection):
+        """Sends chunks to one worker and collects its results, putting its current chunk back on the queue if it
+        fails.
+
+        Args:
+            connection (socket.socket): The worker's connection
+        """
+        job = self._job.to_dict()
+        with connection:
+            try:
+                send_message(connection, {'type': 'job', 'job': job})
+                while True:
+                    chunk = self._next_chunk()
+                    if chunk is None:
+                        send_message(connection, {'type': 'done'})
+                        return
+                    try:
+                        connection.settimeout(self._chunk_timeout)
+                        send_message(connection, {'type': 'chunk', 'index': chunk[0], 'hands': chunk[1]})
+                        message = receive_message(connection)
+                    except (OSError, ValueError):
+                        self._pending.put(chunk)
+                        return
+                    self._add_result(message['index'], SimulationStats.from_dict(message['stats']))
+            except OSError:
+                return
+
+    def _next_chunk(self):
+        """Waits for a chunk to play, returning None once every chunk has a result.
+
+        Returns:
+            (Int, Int): The index and number of hands of the chunk, or None
+        """
+        while not self._finished.is_set():
+            try:
+                return self._pending.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        return None
+
+    def _add_result(self, index, stats):
+        """Records the result of a chunk, finishing the run once every chunk has one.
+        """
+        with self._lock:
+            self._results.setdefault(index, stats)
+            if len(self._results) == len(self._chunks):
+                self._finished.set()
+
+
+def run_worker(host, port):
+    """Connects to a Coordinator and plays the chunks it sends until it has none left.
+
+    Args:
+        host (str): The coordinator's address
+        port (Int): The coordinator's port
+
+    Returns:
+        Int: The number of chunks played
+    """
+    played = 0
+    with socket.create_connection((host, port)) as connection:
+        job = SimulationJob.from_dict(receive_message(connection)['job'])
+        while True:
+            message = receive_message(connection)
+            if message['type'] == 'done':
+                return played
+            stats = job.run_chunk(message['index'], message['hands'])
+            send_message(connection, {'type': 'result', 'index': message['index'], 'stats': stats.to_dict()})
+            played += 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a blackjack simulation across machines.')
+    subparsers = parser.add_subparsers(dest='role', required=True)
+    coordinator_parser = subparsers.add_parser('coordinator', help='split a simulation into chunks for workers')
+    coordinator_parser.add_argument('hands', type=int)
+    coordinator_parser.add_argument('--host', default='0.0.0.0')
+    coordinator_parser.add_argument('--port', type=int, default=5555)
+    coordinator_parser.add_argument('--decks', type=int, default=8)
+    coordinator_parser.add_argument('--penetration', type=float, default=0.75)
+    coordinator_parser.add_argument('--seed', type=int, default=0)
+    coordinator_parser.add_argument('--chunk-size', type=int, default=10_000)
+    coordinator_parser.add_argument('--spread', nargs='+', default=['0:1'],
+                                    help='the bet at each true count, as count:bet pairs')
+    coordinator_parser.add_argument('--strategy', help='a strategy CSV in files/, the default strategy if not given')
+    worker_parser = subparsers.add_parser('worker', help='play chunks for a coordinator')
+    worker_parser.add_argument('host')
+    worker_parser.add_argument('--port', type=int, default=5555)
+    args = parser.parse_args()
+
+    if args.role == 'worker':
+        print('Played %d chunks.' % run_worker(args.host, args.port))
+    else:
+        bet_spread = {int(count): float(bet) for count, bet in (pair.split(':') for pair in args.spread)}
+        job = SimulationJob(args.decks, args.penetration, bet_spread, seed=args.seed)
+        if args.strategy is not None:
+            job.strategy_table = {}
+            parse_strategy_table(args.strategy, job.strategy_table)
+        coordinator = Coordinator(job, args.hands, args.chunk_size, args.host, args.port)
+        print('Waiting for workers on %s:%d' % coordinator.address)
+        stats = coordinator.run()
+        print('Total runs:', stats.count)
+        print('House edge:', stats.get_house_edge())
+        print('95%% confidence interval: (%s, %s)' % stats.get_confidence_interval())
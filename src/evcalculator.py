@@ -0,0 +1,340 @@
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from compiledstrategy import CompiledStrategy, DOUBLE, SPLIT, STAND, SURRENDER
+from rules import Rules
+
+# dealer outcomes are kept as probabilities of finishing on 17, 18, 19, 20, 21, busting and, when the dealer does not
+# peek, blackjack, in that order
+_BUST = 5
+_BLACKJACK = 6
+# stands in for the log of zero remaining cards, so that any draw of a card that has run out gets zero probability
+_NO_CARDS = 1e6
+
+
+class EVCalculator:
+    """Represents an object that computes expected values for a strategy table analytically, from the composition of
+    the shoe rather than by simulating hands.
+    """
+
+    def __init__(self, num_decks, strategy_table, removed=(), cache_size=1_000_000, rules=None):
+        """Initializes an EVCalculator object. Whether the dealer hits soft 17 and peeks for blackjack, the blackjack
+        payout, doubling after a split and late surrender follow the rules. Doubling is allowed on any two cards, and
+        any pair may be resplit without limit, aces included, with split aces hit like any other hand.
+
+        Expected values are computed from the exact composition of the cards left in the shoe, with every draw taken
+        from the cards that remain. Dealer outcome probabilities and hand values are memoized by the remaining
+        composition, keeping at most cache_size entries of each with least recently used eviction. Splits use the
+        usual approximation in which each split hand is played from the composition at the time of the split, without
+        removing the cards drawn to the other split hands.
+
+        Args:
+            num_decks (Int): The number of decks in the shoe
+            strategy_table (dict or CompiledStrategy): The strategy table
+            removed (List[Int], optional): Card values already removed from the shoe, with 1 for an ace. Defaults to
+            none.
+            cache_size (Int, optional): The maximum number of memoized entries of each kind. Defaults to 1,000,000.
+            rules (Rules, optional): The rules of the game. Defaults to the simulator's default rules.
+
+        Raises:
+            ValueError: If the rules limit splitting in a way the calculator does not model.
+        """
+        rules = Rules() if rules is None else rules
+        if rules.max_hands is not None or not rules.resplit_aces or not rules.hit_split_aces:
+            raise ValueError("The EV calculator only models unlimited resplits, aces included, with split aces hit.")
+        self._rules = rules
+        if not isinstance(strategy_table, CompiledStrategy):
+            strategy_table = CompiledStrategy(strategy_table)
+        self._strategy = strategy_table
+        composition = [4 * num_decks] * 9 + [16 * num_decks]
+        for card in removed:
+            if composition[card - 1] == 0:
+                raise ValueError(f"Cannot remove more cards of value {card} than the shoe holds.")
+            composition[card - 1] -= 1
+        self._composition = tuple(composition)
+        # log(n) for n from -largest to largest - 1, offset by largest, and log(n!) for n up to the shoe size
+        largest = max(self._composition) + 12
+        self._log_counts = np.log(np.maximum(np.arange(-largest, largest), 1)) - \
+            _NO_CARDS * (np.arange(-largest, largest) <= 0)
+        self._log_factorials = np.concatenate(([0.0], np.cumsum(np.log(np.arange(1, sum(self._composition) + 1)))))
+        self._dealer_hands = [None] + [self._enumerate_dealer_hands(upcard) for upcard in range(1, 11)]
+        self._stand_values = lru_cache(maxsize=cache_size)(self._compute_stand_values)
+        self._draws = lru_cache(maxsize=cache_size)(self._compute_draws)
+        self._hand_value = lru_cache(maxsize=cache_size)(self._compute_hand_value)
+        self._split_hand_value = lru_cache(maxsize=cache_size)(self._compute_split_hand_value)
+
+    def get_dealer_distribution(self, upcard):
+        """Returns the distribution of the dealer's final total for an upcard, with the upcard removed from the shoe.
+
+        Args:
+            upcard (Int): The dealer's upcard, with 1 for an ace
+
+        Returns:
+            dict(str: float): The probability of each of '17' to '21', 'bust' and 'blackjack'
+        """
+        composition = self._remove(self._composition, upcard)
+        blackjack = self._blackjack_probability(composition, upcard)
+        outcomes = self._compute_dealer_outcomes(composition, upcard).tolist()
+        distribution = {str(total): outcomes[total - 17] for total in range(17, 22)}
+        distribution['bust'] = outcomes[_BUST]
+        distribution['blackjack'] = blackjack
+        return distribution
+
+    def get_decision_evs(self, first, second, upcard):
+        """Returns the expected value of each decision for an initial hand against an upcard, given that the dealer
+        does not have blackjack when the dealer peeks, or counting the bets lost to a dealer blackjack when not.
+        Hitting follows the strategy table afterwards.
+
+        Args:
+            first (Int): The player's first card
+            second (Int): The player's second card
+            upcard (Int): The dealer's upcard
+
+        Returns:
+            dict(str: float): The expected value per unit bet of 'S', 'H', 'D', 'R' when surrender is allowed and, for
+            pairs, 'P'
+        """
+        composition = self._remove(self._remove(self._remove(self._composition, first), second), upcard)
+        no_blackjack = 1 - self._blackjack_probability(composition, upcard) if self._rules.dealer_peeks else 1.0
+        hard_total = first + second
+        has_ace = first == 1 or second == 1
+        evs = {'S': self._stand_value(composition, upcard, self._total(hard_total, has_ace)),
+               'H': self._hit_value(composition, upcard, hard_total, has_ace),
+               'D': self._double_value(composition, upcard, hard_total, has_ace)}
+        if self._rules.late_surrender:
+            evs['R'] = self._surrender_value(composition, upcard)
+        if first == second:
+            evs['P'] = 2 * self._split_hand_value(composition, upcard, first)
+        return {action: value / no_blackjack for action, value in evs.items()}
+
+    def get_strategy_ev(self):
+        """Returns the expected value per initial unit bet of playing the strategy table from the full composition of
+        the shoe, counting blackjacks and dealer blackjacks.
+
+        Returns:
+            Float: The expected value, negative when the house has the edge
+        """
+        composition = self._composition
+        total = 0.0
+        for first in range(1, 11):
+            first_probability, after_first = self._draw(composition, first)
+            for upcard in range(1, 11):
+                upcard_probability, after_upcard = self._draw(after_first, upcard)
+                for second in range(1, 11):
+                    second_probability, remaining = self._draw(after_upcard, second)
+                    probability = first_probability * upcard_probability * second_probability
+                    if probability:
+                        total += probability * self._initial_hand_value(remaining, first, second, upcard)
+        return total
+
+    def get_cache_info(self):
+        """Returns the memoization statistics of the dealer and hand caches.
+
+        Returns:
+            dict(str: CacheInfo): The cache statistics by name
+        """
+        return {'dealer': self._stand_values.cache_info(), 'hands': self._hand_value.cache_info()}
+
+    def _initial_hand_value(self, composition, first, second, upcard):
+        """Returns the expected value of an initial hand, including blackjacks, playing the strategy table.
+        """
+        dealer_blackjack = self._blackjack_probability(composition, upcard)
+        has_ace = first == 1 or second == 1
+        if first + second == 11 and has_ace:
+            return self._rules.blackjack_payout * (1 - dealer_blackjack)
+        # when the dealer does not peek, the hand values already count the bets lost to a dealer blackjack
+        blackjack_loss = -dealer_blackjack if self._rules.dealer_peeks else 0.0
+        if first == second:
+            action = self._strategy.pairs[upcard][first]
+        elif has_ace and first + second <= 11:
+            action = self._strategy.soft[upcard][first + second + 10]
+        else:
+            action = self._strategy.hard[upcard][first + second]
+        if action == SURRENDER and self._rules.late_surrender:
+            return blackjack_loss + self._surrender_value(composition, upcard)
+        if first == second:
+            return blackjack_loss + self._pair_value(composition, upcard, first)
+        return blackjack_loss + self._hand_value(composition, upcard, first + second, has_ace, True)
+
+    def _pair_value(self, composition, upcard, card, split=False):
+        """Returns the value of a pair played by the pairs table.
+        """
+        action = self._strategy.pairs[upcard][card]
+        if action == SPLIT:
+            return 2 * self._split_hand_value(composition, upcard, card)
+        if action == STAND:
+            return self._stand_value(composition, upcard, self._total(2 * card, card == 1))
+        if action == DOUBLE and (self._rules.double_after_split or not split):
+            return self._double_value(composition, upcard, 2 * card, card == 1)
+        return self._hit_value(composition, upcard, 2 * card, card == 1)
+
+    def _surrender_value(self, composition, upcard):
+        """Returns the value of surrendering, half the bet, or all of it to a dealer blackjack the dealer did not peek
+        for.
+        """
+        dealer_blackjack = self._blackjack_probability(composition, upcard)
+        if self._rules.dealer_peeks:
+            return -0.5 * (1 - dealer_blackjack)
+        return -0.5 * (1 - dealer_blackjack) - dealer_blackjack
+
+    def _compute_hand_value(self, composition, upcard, hard_total, has_ace, two_cards):
+        """Returns the value of a non-pair hand played by the strategy table, where two_cards means the hand may still
+        double. When the dealer peeks, like every hand value here it is weighted by the probability that the dealer
+        does not have blackjack, which is the value given no dealer blackjack times that probability. When not, it
+        includes the bets lost to a dealer blackjack. A surrender here is played as a hit, as only an initial hand can
+        surrender.
+        """
+        total = self._total(hard_total, has_ace)
+        if total >= 21:
+            return self._stand_value(composition, upcard, total)
+        if has_ace and hard_total <= 11:
+            action = self._strategy.soft[upcard][total]
+        else:
+            action = self._strategy.hard[upcard][total]
+        if action == STAND:
+            return self._stand_value(composition, upcard, total)
+        if action == DOUBLE and two_cards:
+            return self._double_value(composition, upcard, hard_total, has_ace)
+        return self._hit_value(composition, upcard, hard_total, has_ace)
+
+    def _compute_split_hand_value(self, composition, upcard, card):
+        """Returns the value of one hand split from a pair, drawing its second card from the composition and
+        resplitting whenever the strategy table says to.
+        """
+        value = 0.0
+        for drawn, probability, remaining in self._draws(composition):
+            if drawn == card:
+                value += probability * self._pair_value(remaining, upcard, card, True)
+            else:
+                value += probability * self._hand_value(remaining, upcard, card + drawn, card == 1 or drawn == 1,
+                                                        self._rules.double_after_split)
+        return value
+
+    def _hit_value(self, composition, upcard, hard_total, has_ace):
+        """Returns the value of taking a card and then following the strategy table.
+        """
+        value = 0.0
+        for drawn, probability, remaining in self._draws(composition):
+            value += probability * self._hand_value(remaining, upcard, hard_total + drawn, has_ace or drawn == 1, False)
+        return value
+
+    def _double_value(self, composition, upcard, hard_total, has_ace):
+        """Returns the value of doubling, taking one card for twice the bet.
+        """
+        value = 0.0
+        for drawn, probability, remaining in self._draws(composition):
+            total = self._total(hard_total + drawn, has_ace or drawn == 1)
+            value += probability * 2 * self._stand_value(remaining, upcard, total)
+        return value
+
+    def _stand_value(self, composition, upcard, total):
+        """Returns the value of standing on a total.
+        """
+        if total > 21:
+            return self._blackjack_probability(composition, upcard) - 1 if self._rules.dealer_peeks else -1.0
+        return self._stand_values(composition, upcard)[total]
+
+    def _compute_stand_values(self, composition, upcard):
+        """Returns the value of standing on each total from 0 to 21.
+        """
+        outcomes = self._compute_dealer_outcomes(composition, upcard).tolist()
+        value = outcomes[_BUST] - sum(outcomes[:_BUST]) - outcomes[_BLACKJACK]
+        values = [value] * 17
+        for dealer_total in range(17, 22):
+            # moving up past a dealer total turns its losses into pushes, then its pushes into wins
+            value += outcomes[dealer_total - 17]
+            values.append(value)
+            value += outcomes[dealer_total - 17]
+        return values
+
+    def _compute_dealer_outcomes(self, composition, upcard):
+        """Returns the probabilities of the dealer's final totals. When the dealer peeks they are weighted by the
+        probability that the hole card does not make a blackjack, and when not a blackjack is an outcome. Every way the
+        dealer can draw is a multiset of cards, so the probability of each is a product of falling factorials of the
+        card counts divided by one of the shoe size, which in log space is a single matrix product for all of them at
+        once.
+        """
+        draws_past, column_cards, column_steps, num_drawn, orderings, outcome_matrix = self._dealer_hands[upcard]
+        # log(count - k) for the card and k of each column, very negative once the cards run out
+        log_remaining = self._log_counts[np.array(composition)[column_cards] - column_steps]
+        total = sum(composition)
+        log_total = self._log_factorials[total] - self._log_factorials[total - num_drawn]
+        probability = orderings * np.exp(draws_past @ log_remaining - log_total)
+        return probability @ outcome_matrix
+
+    def _enumerate_dealer_hands(self, upcard):
+        """Enumerates every sequence of cards the dealer can draw to an upcard, starting with a hole card that does not
+        make a blackjack when the dealer peeks, and groups the sequences by the multiset of cards drawn.
+
+        Returns:
+            Tuple[ndarray[Float], ndarray[Int], ndarray[Int], ndarray[Int], ndarray[Float], ndarray[Float]]: A matrix
+            with a row per multiset and a column per card and k flagging whether more than k of that card were drawn,
+            the card index and k of each column, then for each multiset the number of cards drawn, the number of
+            orderings the dealer can draw it in, and a one-hot row of its outcome
+        """
+        multisets = Counter()
+        stack = [((), upcard, upcard == 1)]
+        while stack:
+            drawn, hard_total, has_ace = stack.pop()
+            total = self._total(hard_total, has_ace)
+            blackjack = len(drawn) == 1 and total == 21
+            soft_17 = total == 17 and has_ace and hard_total <= 11 and self._rules.dealer_hits_soft_17
+            if drawn and (total > 17 or (total == 17 and not soft_17)):
+                counts = [0] * 10
+                for card in drawn:
+                    counts[card - 1] += 1
+                outcome = _BLACKJACK if blackjack else _BUST if total > 21 else total - 17
+                multisets[(tuple(counts), outcome)] += 1
+                continue
+            for card in range(1, 11):
+                if not drawn and upcard + card == 11 and (upcard == 1 or card == 1) and self._rules.dealer_peeks:
+                    continue
+                stack.append((drawn + (card,), hard_total + card, has_ace or card == 1))
+        keys = list(multisets)
+        cards_drawn = np.array([counts for counts, _ in keys], dtype=np.int64)
+        most_drawn = cards_drawn.max(axis=0)
+        column_cards = np.repeat(np.arange(10), most_drawn)
+        column_steps = np.concatenate([np.arange(most) for most in most_drawn])
+        draws_past = (cards_drawn[:, column_cards] > column_steps).astype(np.float64)
+        outcome_matrix = np.eye(7)[[outcome for _, outcome in keys]]
+        return (draws_past, column_cards, column_steps + len(self._log_counts) // 2, cards_drawn.sum(axis=1),
+                np.array([multisets[key] for key in keys], dtype=np.float64), outcome_matrix)
+
+    def _blackjack_probability(self, composition, upcard):
+        """Returns the probability that the dealer's hole card makes a blackjack with the upcard.
+        """
+        if upcard == 1:
+            return composition[9] / sum(composition)
+        if upcard == 10:
+            return composition[0] / sum(composition)
+        return 0.0
+
+    def _compute_draws(self, composition):
+        """Returns each card that can be drawn from a composition, with its probability and the composition left
+        after drawing it.
+        """
+        total = sum(composition)
+        return tuple((card, composition[card - 1] / total, self._remove(composition, card))
+                     for card in range(1, 11) if composition[card - 1])
+
+    def _draw(self, composition, card):
+        """Returns the probability of drawing a card and the composition left after drawing it.
+        """
+        remaining = composition[card - 1]
+        if remaining == 0:
+            return 0.0, composition
+        return remaining / sum(composition), self._remove(composition, card)
+
+    def _remove(self, composition, card):
+        """Returns the composition with one card removed.
+        """
+        return composition[:card - 1] + (composition[card - 1] - 1,) + composition[card:]
+
+    def _total(self, hard_total, has_ace):
+        """Returns the best total of a hand.
+        """
+        if has_ace and hard_total <= 11:
+            return hard_total + 10
+        return hard_total
@@ -0,0 +1,207 @@
+import json
+import os
+import re
+
+import numpy as np
+
+# the columns of a hand log and how each is stored, bets and results in float64 as a 6:5 payout or a spread bet such
+# as 1.2 is not exact in float32, and the log's results must add up to the statistics of the run
+COLUMNS = {'bet': np.float64, 'result': np.float64, 'true_count': np.int16, 'shoe': np.int32}
+# lists the chunks of a finished run, so chunks left by other runs or never merged into its statistics are not read
+MANIFEST = 'manifest.json'
+
+
+class HandLogWriter:
+    """Represents an object that records the hands of one chunk of a simulation and writes them to a hand log
+    directory, one .npy file per column.
+    """
+
+    def __init__(self, directory, chunk_index):
+        """Initializes a HandLogWriter object.
+
+        Args:
+            directory (str): The hand log directory, created if it does not exist
+            chunk_index (Int): The index of the chunk, which orders the chunks of the log
+        """
+        self._directory = directory
+        self._chunk_index = chunk_index
+        self._columns = {column: [] for column in COLUMNS}
+
+    def append(self, bet, result, true_count, shoe):
+        """Records one hand.
+
+        Args:
+            bet (Float): The initial bet of the hand
+            result (Float): The amount won or lost on the hand
+            true_count (Int): The true count before the hand
+            shoe (Int): The number of shuffles in the chunk before the hand
+        """
+        self._columns['bet'].append(bet)
+        self._columns['result'].append(result)
+        self._columns['true_count'].append(true_count)
+        self._columns['shoe'].append(shoe)
+
+    def close(self):
+        """Writes the recorded hands to the hand log. Each column is written to the side and moved into place, so a
+        chunk stopped part way through leaves no half written column.
+        """
+        os.makedirs(self._directory, exist_ok=True)
+        for column, dtype in COLUMNS.items():
+            values = np.array(self._columns[column], dtype=dtype)
+            path = chunk_path(self._directory, self._chunk_index, column)
+            temporary_path = f'{path}.{os.getpid()}.tmp'
+            with open(temporary_path, 'wb') as file:
+                np.save(file, values)
+            os.replace(temporary_path, path)
+
+
+def clear_hand_log(directory):
+    """Removes the chunks and manifest of any earlier run from a hand log directory, creating it if it does not exist.
+    Only files written by HandLogWriter and write_manifest are removed.
+
+    Args:
+        directory (str): The hand log directory
+    """
+    os.makedirs(directory, exist_ok=True)
+    for name in os.listdir(directory):
+        if re.fullmatch(rf'(\d+\.\w+\.npy|{re.escape(MANIFEST)})(\.\d+\.tmp)?', name):
+            os.remove(os.path.join(directory, name))
+
+
+def write_manifest(directory, chunks):
+    """Writes the manifest of a hand log, the chunks a run merged into its statistics.
+
+    Args:
+        directory (str): The hand log directory
+        chunks (List[Int]): The indexes of the merged chunks, in order
+    """
+    path = os.path.join(directory, MANIFEST)
+    temporary_path = f'{path}.{os.getpid()}.tmp'
+    with open(temporary_path, 'w') as file:
+        json.dump({'chunks': list(chunks)}, file)
+    os.replace(temporary_path, path)
+
+
+def chunk_path(directory, chunk_index, column):
+    """Returns the path of one column of one chunk of a hand log.
+
+    Args:
+        directory (str): The hand log directory
+        chunk_index (Int): The index of the chunk
+        column (str): The column
+
+    Returns:
+        str: The path of the file
+    """
+    return os.path.join(directory, f'{chunk_index:06d}.{column}.npy')
+
+
+class HandLog:
+    """Represents a hand log written by HandLogWriter. Only the chunks listed in the log's manifest are read, which are
+    the hands the run's statistics cover. The chunks are memory mapped in order of their index, so reading a column
+    copies nothing until its values are used.
+    """
+
+    def __init__(self, directory):
+        """Initializes a HandLog object.
+
+        Args:
+            directory (str): The hand log directory
+
+        Raises:
+            Exception: If the directory or its manifest cannot be found, as when the run that wrote it did not finish.
+        """
+        if not os.path.isdir(directory):
+            raise Exception(f"Hand log '{directory}' not found.")
+        try:
+            with open(os.path.join(directory, MANIFEST), 'r') as file:
+                chunks = json.load(file)['chunks']
+        except FileNotFoundError:
+            raise Exception(f"Hand log '{directory}' has no manifest, the run that wrote it did not finish.")
+        self._directory = directory
+        self._chunks = sorted(chunks)
+        self._lengths = [len(self.get_chunk(chunk_index, 'result')) for chunk_index in self._chunks]
+
+    def __len__(self):
+        """Returns the number of hands in the log.
+
+        Returns:
+            Int: The number of hands
+        """
+        return sum(self._lengths)
+
+    def get_chunks(self):
+        """Returns the indexes of the chunks in the log.
+
+        Returns:
+            List[Int]: The chunk indexes, in order
+        """
+        return list(self._chunks)
+
+    def get_chunk(self, chunk_index, column):
+        """Memory maps one column of one chunk.
+
+        Args:
+            chunk_index (Int): The index of the chunk
+            column (str): The column, one of COLUMNS
+
+        Returns:
+            ndarray: The column's values for the chunk
+
+        Raises:
+            ValueError: If the column is not a hand log column.
+        """
+        if column not in COLUMNS:
+            raise ValueError(f"Invalid column '{column}', expected one of {list(COLUMNS)}.")
+        return np.load(chunk_path(self._directory, chunk_index, column), mmap_mode='r')
+
+    def get_column(self, column):
+        """Memory maps one column of every chunk.
+
+        Args:
+            column (str): The column, one of COLUMNS
+
+        Returns:
+            List[ndarray]: The column's values for each chunk, in order
+        """
+        return [self.get_chunk(chunk_index, column) for chunk_index in self._chunks]
+
+
+def get_min_max_curve(log, width, hands=None):
+    """Downsamples the cumulative result of a hand log to a fixed number of buckets, keeping the lowest and highest
+    cumulative result in each. The running sums are taken one chunk at a time, so only one chunk is ever in memory, and
+    a line through each bucket's low and high looks the same on screen as a line through every hand.
+
+    Args:
+        log (HandLog): The hand log
+        width (Int): The number of buckets, usually the width of the plot in pixels
+        hands (Int, optional): Only use this many hands from the start of the log. Defaults to every hand.
+
+    Returns:
+        (ndarray[Int], ndarray[Float], ndarray[Float]): The first hand of each bucket followed by the end of the last
+        bucket, and the lowest and highest cumulative result in each bucket
+    """
+    total = len(log) if hands is None else min(hands, len(log))
+    edges = np.unique(np.linspace(0, total, width + 1).astype(np.int64))
+    lows = np.full(len(edges) - 1, np.inf)
+    highs = np.full(len(edges) - 1, -np.inf)
+    offset = 0.0
+    start = 0
+    for results in log.get_column('result'):
+        if start >= total:
+            break
+        results = results[:total - start]
+        if len(results) == 0:
+            continue
+        cumulative = np.cumsum(results, dtype=np.float64)
+        cumulative += offset
+        end = start + len(results)
+        # the buckets overlapping this chunk, the first may have started in an earlier chunk
+        first = np.searchsorted(edges, start, side='right') - 1
+        last = np.searchsorted(edges, end, side='left')
+        bounds = np.maximum(edges[first:last], start) - start
+        lows[first:last] = np.minimum(lows[first:last], np.minimum.reduceat(cumulative, bounds))
+        highs[first:last] = np.maximum(highs[first:last], np.maximum.reduceat(cumulative, bounds))
+        offset = cumulative[-1]
+        start = end
+    return edges, lows, highs
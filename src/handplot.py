@@ -0,0 +1,28 @@
+import numpy as np
+from matplotlib import pyplot as plt
+
+from handlog import get_min_max_curve
+
+
+def plot_bankroll(log, ax=None, bankroll=0, hands=None):
+    """Plots the bankroll over the hands of a hand log. The curve is downsampled to one bucket per pixel of the plot's
+    width before drawing, so the time to draw does not depend on the number of hands.
+
+    Args:
+        log (HandLog): The hand log
+        ax (Axes, optional): The axes to draw on. Defaults to new axes.
+        bankroll (Float, optional): The starting bankroll. Defaults to 0.
+        hands (Int, optional): Only plot this many hands from the start of the log. Defaults to every hand.
+
+    Returns:
+        Axes: The axes drawn on
+    """
+    if ax is None:
+        _, ax = plt.subplots()
+    width = max(int(ax.get_window_extent().width), 1)
+    edges, lows, highs = get_min_max_curve(log, width, hands)
+    # each bucket is drawn as a vertical stroke from its low to its high
+    ax.plot(np.repeat(edges[1:], 2), np.column_stack((lows, highs)).ravel() + bankroll, linewidth=0.8)
+    ax.set_xlabel('Number of Hands')
+    ax.set_ylabel('Bank Value')
+    return ax
@@ -0,0 +1,271 @@
+import time
+
+from blackjack import BlackJackSimulator
+from shoecorpus import CorpusShoe
+from simplifiedshoe import SimplifiedShoe
+
+# the phases of a hand that are timed, settle is whatever time play_hand spends outside the other phases
+PHASES = ['shuffle', 'deal', 'player', 'dealer', 'settle']
+COUNTERS = ['hands', 'splits', 'doubles', 'player_busts', 'dealer_busts', 'reshuffles', 'cards']
+
+
+class Profile:
+    """Represents the timings and event counts collected by an instrumented simulator and shoe. Profiles from separate
+    workers can be merged.
+    """
+
+    def __init__(self, max_traces=100):
+        """Initializes an empty Profile object.
+
+        Args:
+            max_traces (Int, optional): The most sampled hands to keep. Defaults to 100.
+        """
+        self.phase_times = {phase: 0 for phase in PHASES}
+        self.counters = {counter: 0 for counter in COUNTERS}
+        self.hands_per_round = {}
+        self.cards_per_hand = {}
+        self.traces = []
+        self.max_traces = max_traces
+
+    def add_trace(self, trace):
+        """Keeps a sampled hand, unless the profile already has as many as it keeps.
+
+        Args:
+            trace (dict): The hand
+        """
+        if len(self.traces) < self.max_traces:
+            self.traces.append(trace)
+
+    def merge(self, other):
+        """Merges another profile into this one.
+
+        Args:
+            other (Profile): The profile to merge in
+
+        Returns:
+            Profile: This profile
+        """
+        for phase, nanoseconds in other.phase_times.items():
+            self.phase_times[phase] += nanoseconds
+        for counter, count in other.counters.items():
+            self.counters[counter] += count
+        for histogram, other_histogram in ((self.hands_per_round, other.hands_per_round),
+                                           (self.cards_per_hand, other.cards_per_hand)):
+            for key, hands in other_histogram.items():
+                histogram[key] = histogram.get(key, 0) + hands
+        for trace in other.traces:
+            self.add_trace(trace)
+        return self
+
+    def to_dict(self):
+        """Returns the profile as a dict of plain values, so it can be sent as JSON.
+
+        Returns:
+            dict: The profile
+        """
+        data = dict(self.__dict__)
+        data['hands_per_round'] = sorted(self.hands_per_round.items())
+        data['cards_per_hand'] = sorted(self.cards_per_hand.items())
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        """Rebuilds a profile from a dict returned by to_dict.
+
+        Args:
+            data (dict): The profile
+
+        Returns:
+            Profile: The profile
+        """
+        profile = Profile()
+        profile.__dict__.update(data)
+        profile.hands_per_round = dict(data['hands_per_round'])
+        profile.cards_per_hand = dict(data['cards_per_hand'])
+        return profile
+
+    def print_report(self):
+        """Prints the time spent in each phase and the event counts.
+        """
+        hands = max(self.counters['hands'], 1)
+        total = max(sum(self.phase_times.values()), 1)
+        print('%-10s %12s %10s %8s' % ('Phase', 'Seconds', 'ns/hand', 'Share'))
+        for phase, nanoseconds in self.phase_times.items():
+            print('%-10s %12.3f %10.0f %7.1f%%' % (phase, nanoseconds / 1e9, nanoseconds / hands,
+                                                  100 * nanoseconds / total))
+        for counter, count in self.counters.items():
+            print('%-14s %12d %10.4f per hand' % (counter, count, count / hands))
+        print('Hands per round:', dict(sorted(self.hands_per_round.items())))
+        print('Cards per hand:', dict(sorted(self.cards_per_hand.items())))
+
+
+class ShoeInstrumentation:
+    """Mixin for a shoe class that counts the cards it deals and times and counts its shuffles. It is combined with a
+    shoe class in a subclass such as InstrumentedSimplifiedShoe, so the shoe class itself carries no instrumentation.
+    """
+
+    def __init__(self, *args, profile=None, **kwargs):
+        """Initializes the shoe, recording into a profile.
+
+        Args:
+            profile (Profile, optional): The profile to record into. Defaults to a new one.
+        """
+        super().__init__(*args, **kwargs)
+        self.profile = profile if profile is not None else Profile()
+
+    def draw_face_down(self):
+        """Draws a card from the shoe without updating the count, counting the card.
+
+        Returns:
+            Int: The card that was drawn.
+        """
+        self.profile.counters['cards'] += 1
+        return super().draw_face_down()
+
+    def _shuffle(self):
+        """Shuffles the shoe, timing and counting the shuffle.
+        """
+        start = time.perf_counter_ns()
+        super()._shuffle()
+        self.profile.phase_times['shuffle'] += time.perf_counter_ns() - start
+        self.profile.counters['reshuffles'] += 1
+
+
+class InstrumentedSimplifiedShoe(ShoeInstrumentation, SimplifiedShoe):
+    """Represents a SimplifiedShoe that records into a Profile.
+    """
+
+
+class InstrumentedCorpusShoe(ShoeInstrumentation, CorpusShoe):
+    """Represents a CorpusShoe that records into a Profile.
+    """
+
+
+class InstrumentedBlackJackSimulator(BlackJackSimulator):
+    """Represents a BlackJackSimulator that times each phase of every hand and counts what happens in it. The phases
+    are timed by overriding the methods that play them, so choosing this class over BlackJackSimulator when the
+    simulator is built is the only switch, and an uninstrumented simulator runs exactly the code it always did.
+    """
+
+    def __init__(self, num_decks, penetration, bet_spread, strategy_table, bankroll=0, rng=None, shoe=None,
+                 deviations=None, rules=None, insurance_index=None, profile=None, sample_every=0):
+        """Initializes an InstrumentedBlackJackSimulator object.
+
+        Args:
+            num_decks (Int): The number of decks in the shoe
+            penetration (Float): The penetration of the shoe
+            bet_spread (dict(int: int)): The bet spread, see BetSpread
+            strategy_table (dict or CompiledStrategy): The strategy table
+            bankroll (Int, optional): The starting bankroll. Defaults to 0.
+            rng (random.Random, optional): The random number generator for the shuffles. Defaults to the random
+            module.
+            shoe (SimplifiedShoe, optional): The shoe to deal from, which records into the same profile if it is
+            instrumented. Defaults to an InstrumentedSimplifiedShoe.
+            deviations (List or CompiledDeviations, optional): Strategy deviations by true count. Defaults to None.
+            rules (Rules, optional): The rules of the game. Defaults to the default Rules.
+            insurance_index (Int, optional): Take insurance at true counts at or above this, if the rules offer it,
+            or never if None. Defaults to None.
+            profile (Profile, optional): The profile to record into. Defaults to a new one.
+            sample_every (Int, optional): Keep a trace of every this many hands, or none if 0. Defaults to 0.
+        """
+        self.profile = profile if profile is not None else Profile()
+        if shoe is None:
+            shoe = InstrumentedSimplifiedShoe(num_decks, penetration, rng=rng, profile=self.profile)
+        elif isinstance(shoe, ShoeInstrumentation):
+            shoe.profile = self.profile
+        super().__init__(num_decks, penetration, bet_spread, strategy_table, bankroll, rng, shoe, deviations, rules,
+                         insurance_index)
+        self._sample_every = sample_every
+        self._hand_phases = {phase: 0 for phase in PHASES}
+        self._cards = ()
+        self._num_hands = 0
+        self._dealer_total = 0
+
+    def play_hand(self):
+        """Plays a hand, recording its phases and events.
+
+        Returns:
+            Float: The result of the hand
+        """
+        profile = self.profile
+        phases = self._hand_phases
+        for phase in PHASES:
+            phases[phase] = 0
+        self._num_hands = 0
+        self._dealer_total = 0
+        shuffle_time = profile.phase_times['shuffle']
+        cards = profile.counters['cards']
+
+        start = time.perf_counter_ns()
+        result = super().play_hand()
+        elapsed = time.perf_counter_ns() - start
+
+        phases['shuffle'] = profile.phase_times['shuffle'] - shuffle_time
+        phases['settle'] = elapsed - phases['shuffle'] - phases['deal'] - phases['player'] - phases['dealer']
+        for phase in ('deal', 'player', 'dealer', 'settle'):
+            profile.phase_times[phase] += phases[phase]
+
+        counters = profile.counters
+        counters['hands'] += 1
+        num_hands = self._num_hands
+        # every split adds one hand, so a pair resplit into four hands counts as three splits, and a round settled
+        # on blackjacks before any hand is played has none
+        counters['splits'] += max(num_hands - 1, 0)
+        outcomes = list(zip(self._totals[:num_hands], self._multipliers[:num_hands]))
+        counters['doubles'] += sum(1 for _, multiplier in outcomes if multiplier == 2)
+        counters['player_busts'] += sum(1 for total, _ in outcomes if total > 21)
+        if self._dealer_total > 21:
+            counters['dealer_busts'] += 1
+        profile.hands_per_round[num_hands] = profile.hands_per_round.get(num_hands, 0) + 1
+        hand_cards = counters['cards'] - cards
+        profile.cards_per_hand[hand_cards] = profile.cards_per_hand.get(hand_cards, 0) + 1
+
+        if self._sample_every and counters['hands'] % self._sample_every == 0:
+            player_first, dealer_upcard, player_second, dealer_hole = self._cards
+            profile.add_trace({
+                'hand': counters['hands'],
+                'true_count': self._shoe.get_true_count(),
+                'player': [player_first, player_second],
+                'dealer': [dealer_upcard, dealer_hole],
+                'dealer_total': self._dealer_total,
+                'outcomes': [list(outcome) for outcome in outcomes],
+                'result': result,
+                'wager': self._hand_wager,
+                'cards': hand_cards,
+                'phases': dict(phases),
+            })
+        return result
+
+    def _deal(self):
+        """Deals a hand of blackjack, timing the deal.
+
+        Returns:
+            (Int, Int, Int, Int): The player's first card, the dealer's upcard, the player's second card and the
+            dealer's hole card
+        """
+        start = time.perf_counter_ns()
+        self._cards = super()._deal()
+        self._hand_phases['deal'] += time.perf_counter_ns() - start
+        return self._cards
+
+    def _play_player_hands(self, hard, soft, pairs, first, second, shoe):
+        """Plays the player's hands, timing them.
+
+        Returns:
+            Int: The number of hands played
+        """
+        start = time.perf_counter_ns()
+        self._num_hands = super()._play_player_hands(hard, soft, pairs, first, second, shoe)
+        self._hand_phases['player'] += time.perf_counter_ns() - start
+        return self._num_hands
+
+    def _play_dealer_hand(self, upcard, hole, shoe):
+        """Plays the dealer's hand, timing it.
+
+        Returns:
+            Int: The dealer's total
+        """
+        start = time.perf_counter_ns()
+        self._dealer_total = super()._play_dealer_hand(upcard, hole, shoe)
+        self._hand_phases['dealer'] += time.perf_counter_ns() - start
+        return self._dealer_total
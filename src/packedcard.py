@@ -0,0 +1,50 @@
+from cardsuit import CardSuit
+from cardvalue import CardValue
+from simplecard import SimpleCard
+
+# A packed card is a single small int holding the card's face value (1 for an ace up to 13 for a king) shifted left
+# by two bits, and its suit's index in SUIT_ORDER in the low two bits. The tables below are indexed by packed card.
+
+SUIT_ORDER = [CardSuit.HEARTS, CardSuit.DIAMONDS, CardSuit.CLUBS, CardSuit.SPADES]
+NUM_PACKED = 14 << 2
+
+VALUES = [CardValue(card >> 2) if card >> 2 else None for card in range(NUM_PACKED)]
+SUITS = [SUIT_ORDER[card & 3] for card in range(NUM_PACKED)]
+BLACKJACK_VALUES = [min(card >> 2, 10) for card in range(NUM_PACKED)]
+
+
+def pack(value, suit):
+    """Packs a card into a single int.
+
+    Args:
+        value (CardValue): The card's value
+        suit (CardSuit): The card's suit
+
+    Returns:
+        Int: The packed card
+    """
+    return value.value << 2 | SUIT_ORDER.index(suit)
+
+
+def decode(card):
+    """Decodes a packed card into a SimpleCard.
+
+    Args:
+        card (Int): The packed card
+
+    Returns:
+        SimpleCard: The card
+    """
+    return SimpleCard(VALUES[card], SUITS[card])
+
+
+def blackjack_value(card):
+    """Returns the value of a packed card in blackjack, with 1 for an ace and 10 for a face card.
+
+    Args:
+        card (Int): The packed card
+
+    Returns:
+        Int: The card's blackjack value
+    """
+    return BLACKJACK_VALUES[card]
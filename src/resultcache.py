@@ -0,0 +1,187 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+
+from scheduler import SimulationJob
+from simulationstats import SimulationStats
+
+# part of every key, so changing how results are stored or what a job plays invalidates the entries from before
+CACHE_VERSION = 3
+
+
+def get_cache_key(job, chunk_size):
+    """Returns the key of a job's results, a hash of everything that decides the hands the job plays: the strategy
+    table, deviations, rules, counts, bet spread, decks, penetration and seed, and the chunk size that splits the
+    hands into random streams. Tables are sorted first, so the order their entries were parsed in does not matter.
+
+    Args:
+        job (SimulationJob): The job
+        chunk_size (Int): The number of hands in each chunk
+
+    Returns:
+        str: The key, as hex
+    """
+    config = job.to_dict()
+    config['strategy_table'] = {name: sorted(table) for name, table in config['strategy_table'].items()}
+    config['chunk_size'] = chunk_size
+    config['version'] = CACHE_VERSION
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """Represents a directory of simulation results keyed by the job that produced them. An entry holds the merged
+    statistics of a job's whole chunks and, separately, of the partial chunk after them, so a request for more hands
+    than an entry has replays only that partial chunk and plays the chunks after it. As each chunk has its own random
+    stream and chunks are merged in order, the result is the same as playing all the hands in one run. The least
+    recently used entries are removed once the directory is larger than its limit.
+    """
+
+    def __init__(self, directory='cache', max_bytes=100_000_000):
+        """Initializes a ResultCache object.
+
+        Args:
+            directory (str, optional): The cache directory, created if it does not exist. Defaults to 'cache'.
+            max_bytes (Int, optional): The most bytes of entries to keep. Defaults to 100,000,000.
+        """
+        self._directory = directory
+        self._max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def run(self, job, hands, chunk_size=10_000, processes=1):
+        """Returns the statistics of a job, playing only the hands the cache does not already have. An entry with
+        more hands than asked for is returned whole, as more hands only make the statistics more precise.
+
+        Args:
+            job (SimulationJob): The job
+            hands (Int): The number of hands to play
+            chunk_size (Int, optional): The number of hands in each chunk. Defaults to 10,000.
+            processes (Int, optional): The number of worker processes. Defaults to 1.
+
+        Returns:
+            SimulationStats: The statistics of at least hands hands
+
+        Raises:
+            ValueError: If the job writes a hand log, which would be missing the hands found in the cache.
+        """
+        if job.log_directory is not None:
+            raise ValueError("A job that writes a hand log cannot be cached.")
+        key = get_cache_key(job, chunk_size)
+        entry = self._read(key)
+        if entry is None:
+            chunks = 0
+            stats = SimulationStats()
+            tail = None
+        else:
+            chunks = entry['chunks']
+            stats = SimulationStats.from_dict(entry['stats'])
+            tail = entry['tail']
+            if chunks * chunk_size + (0 if tail is None else tail['hands']) >= hands:
+                if tail is not None:
+                    stats.merge(SimulationStats.from_dict(tail['stats']))
+                return stats
+
+        # the partial chunk is played again in full, and every chunk after it is played
+        full_chunks = hands // chunk_size
+        stats = self._play(job, stats, [(index, chunk_size) for index in range(chunks, full_chunks)], processes)
+        tail = None
+        if hands % chunk_size:
+            tail_stats = job.run_chunk(full_chunks, hands % chunk_size)
+            tail = {'hands': hands % chunk_size, 'stats': tail_stats.to_dict()}
+        self._write(key, {'job': job.to_dict(), 'chunk_size': chunk_size, 'chunks': full_chunks,
+                          'stats': stats.to_dict(), 'tail': tail})
+        if tail is not None:
+            stats.merge(tail_stats)
+        return stats
+
+    def get_size(self):
+        """Returns the number of bytes of entries in the cache.
+
+        Returns:
+            Int: The size of the cache
+        """
+        return sum(os.path.getsize(path) for path in self._get_paths())
+
+    def clear(self):
+        """Removes every entry from the cache.
+        """
+        for path in self._get_paths():
+            os.remove(path)
+
+    def _play(self, job, stats, chunks, processes):
+        """Plays chunks of a job, merging them in order into the statistics.
+
+        Returns:
+            SimulationStats: The statistics
+        """
+        if processes == 1 or len(chunks) < 2:
+            for chunk_index, chunk_hands in chunks:
+                stats.merge(job.run_chunk(chunk_index, chunk_hands))
+            return stats
+        with multiprocessing.Pool(processes=processes) as pool:
+            for chunk_stats in pool.starmap(job.run_chunk, chunks):
+                stats.merge(chunk_stats)
+        return stats
+
+    def _read(self, key):
+        """Reads an entry, marking it as the most recently used.
+
+        Returns:
+            dict: The entry, or None if the cache does not have it
+        """
+        path = self._get_path(key)
+        try:
+            with open(path, 'r') as file:
+                entry = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(path)
+        return entry
+
+    def _write(self, key, entry):
+        """Writes an entry, then removes the least recently used others until the cache fits its limit.
+        """
+        path = self._get_path(key)
+        # written to the side and moved into place, so a reader never sees half an entry
+        temporary_path = f'{path}.{os.getpid()}.tmp'
+        with open(temporary_path, 'w') as file:
+            json.dump(entry, file)
+        os.replace(temporary_path, path)
+
+        paths = sorted(self._get_paths(), key=os.path.getmtime)
+        size = sum(os.path.getsize(other) for other in paths)
+        for other in paths:
+            if size <= self._max_bytes:
+                break
+            if other != path:
+                size -= os.path.getsize(other)
+                os.remove(other)
+
+    def _get_path(self, key):
+        """Returns the path of an entry.
+        """
+        return os.path.join(self._directory, key + '.json')
+
+    def _get_paths(self):
+        """Returns the paths of every entry.
+        """
+        return [os.path.join(self._directory, name) for name in os.listdir(self._directory) if name.endswith('.json')]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run a blackjack simulation, reusing cached results.')
+    parser.add_argument('hands', type=int)
+    parser.add_argument('--decks', type=int, default=8)
+    parser.add_argument('--penetration', type=float, default=0.75)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--chunk-size', type=int, default=10_000)
+    parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+    parser.add_argument('--directory', default='cache')
+    args = parser.parse_args()
+
+    job = SimulationJob(args.decks, args.penetration, seed=args.seed)
+    stats = ResultCache(args.directory).run(job, args.hands, args.chunk_size, args.processes)
+    print('Total runs:', stats.count)
+    print('House edge:', stats.get_house_edge())
+    print('95%% confidence interval: (%s, %s)' % stats.get_confidence_interval())
@@ -0,0 +1,32 @@
+import random
+
+import numpy as np
+
+
+def chunk_seed(seed, chunk_index):
+    """Derives the seed of one chunk of a simulation. Every chunk of a run gets an independent random stream that
+    depends only on the run's seed and the chunk's index, so a chunk plays the same cards no matter which worker runs
+    it or how many workers there are.
+
+    Args:
+        seed (Int): The seed of the whole run
+        chunk_index (Int): The index of the chunk within the run
+
+    Returns:
+        Int: A 128 bit seed for the chunk
+    """
+    words = np.random.SeedSequence(seed, spawn_key=(chunk_index,)).generate_state(4, np.uint32)
+    return int.from_bytes(words.tobytes(), 'little')
+
+
+def chunk_random(seed, chunk_index):
+    """Returns a random number generator for one chunk of a simulation, see chunk_seed.
+
+    Args:
+        seed (Int): The seed of the whole run
+        chunk_index (Int): The index of the chunk within the run
+
+    Returns:
+        random.Random: The chunk's random number generator
+    """
+    return random.Random(chunk_seed(seed, chunk_index))
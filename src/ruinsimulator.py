@@ -0,0 +1,272 @@
+import math
+
+import numpy as np
+
+from betspread import BetSpread
+
+
+class RuinSimulator:
+    """Represents an engine that plays bankroll trajectories by resampling the outcomes of hands from a TrueCountTable,
+    so risk of ruin and bankroll questions can be answered without playing any more hands. The true count of each hand
+    is drawn from the table's frequencies and its unit result from that count's histogram, then scaled by the bet the
+    spread places at that count. That makes every hand one draw from a single distribution of results in units of
+    money, which is drawn for every trajectory and hand at once by the alias method: one random 32 bit integer picks a
+    column of the alias table with its low bits and, with its high bits, whether to take the column's own result or
+    its alias, with no search and nothing but array lookups.
+
+    Hands are drawn independently, which keeps the win rate and variance per hand of the spread but drops the
+    correlation between the counts of hands dealt from the same shoe.
+    """
+
+    def __init__(self, table, bet_spread):
+        """Initializes a RuinSimulator object.
+
+        Args:
+            table (TrueCountTable): The outcomes by true count, recorded with histograms
+            bet_spread (dict(int: int)): The bet spread, see BetSpread
+
+        Raises:
+            ValueError: If the table has a true count with hands but no histogram, or no hands at all.
+        """
+        spread = BetSpread(bet_spread)
+        frequencies = table.get_frequencies()
+        results = {}
+        for true_count, frequency, histogram in zip(table.get_true_counts(), frequencies, table.get_histograms()):
+            if frequency == 0:
+                continue
+            if not histogram:
+                raise ValueError(f"The table has no histogram for true count {true_count}.")
+            bet = spread.get_bet(true_count)
+            hands = sum(histogram.values())
+            for result, count in histogram.items():
+                value = bet * result
+                results[value] = results.get(value, 0.0) + frequency * count / hands
+        if not results:
+            raise ValueError("The table has no hands.")
+        self._values = np.array(sorted(results))
+        self._probabilities = np.array([results[value] for value in self._values])
+        self._probabilities /= self._probabilities.sum()
+        self._build_alias_table()
+
+    def get_win_rate(self):
+        """Returns the expected result per hand of the spread.
+
+        Returns:
+            Float: The win rate per hand
+        """
+        return float(self._probabilities @ self._values)
+
+    def get_variance(self):
+        """Returns the variance of the result per hand of the spread.
+
+        Returns:
+            Float: The variance per hand
+        """
+        win_rate = self.get_win_rate()
+        return float(self._probabilities @ (self._values * self._values)) - win_rate * win_rate
+
+    def get_n0(self):
+        """Returns N0, the number of hands after which the expected result is one standard deviation of the result,
+        which is the variance over the square of the win rate.
+
+        Returns:
+            Float: N0 in hands, or infinity if the spread does not win
+        """
+        win_rate = self.get_win_rate()
+        return self.get_variance() / (win_rate * win_rate) if win_rate > 0 else math.inf
+
+    def sample(self, rng, shape):
+        """Draws results of hands.
+
+        Args:
+            rng (numpy.random.Generator): The random number generator
+            shape (Tuple[Int]): The shape of the array of results
+
+        Returns:
+            ndarray[Float]: The results
+        """
+        bits = rng.integers(0, 1 << 32, size=shape, dtype=np.uint32)
+        columns = bits & np.uint32(self._columns - 1)
+        keep = (bits >> np.uint32(self._column_bits)) < self._thresholds[columns]
+        # each column's alias and own result sit side by side, so one lookup picks between them
+        columns <<= np.uint32(1)
+        columns |= keep
+        return self._alias_values[columns]
+
+    def run(self, bankroll, hands, paths=10_000, seed=None, block_size=None):
+        """Plays bankroll trajectories. Every trajectory plays every hand, even after it has been ruined or doubled,
+        so the same trajectories also give the losses and drawdowns that decide the bankroll needed for any risk of
+        ruin. The hands are played a block at a time, the cumulative result of every trajectory carried from block to
+        block, so memory does not grow with the number of hands.
+
+        Args:
+            bankroll (Float): The starting bankroll, in the same units as the bets
+            hands (Int): The number of hands in each trajectory
+            paths (Int, optional): The number of trajectories. Defaults to 10,000.
+            seed (Int, optional): Seed for the draws. Defaults to None.
+            block_size (Int, optional): The number of hands drawn at once. Defaults to about 4,000,000 results per
+            block.
+
+        Returns:
+            TrajectoryStats: The statistics of the trajectories
+
+        Raises:
+            ValueError: If the bankroll is not positive.
+        """
+        if bankroll <= 0:
+            raise ValueError(f"Invalid bankroll {bankroll}, expected a positive bankroll.")
+        rng = np.random.default_rng(seed)
+        if block_size is None:
+            block_size = max(4_000_000 // paths, 1)
+        total = np.zeros(paths)
+        peak = np.zeros(paths)
+        lowest = np.zeros(paths)
+        drawdown = np.zeros(paths)
+        # the hand on which each trajectory was ruined or doubled, hands + 1 if it never was
+        ruined = np.full(paths, hands + 1)
+        doubled = np.full(paths, hands + 1)
+        for start in range(0, hands, block_size):
+            block = np.cumsum(self.sample(rng, (paths, min(block_size, hands - start))), axis=1)
+            block += total[:, np.newaxis]
+            peaks = np.maximum.accumulate(block, axis=1)
+            np.maximum(peaks, peak[:, np.newaxis], out=peaks)
+            drawdown = np.maximum(drawdown, (peaks - block).max(axis=1))
+            lows = block.min(axis=1)
+            lowest = np.minimum(lowest, lows)
+            peak = peaks[:, -1]
+            total = block[:, -1]
+            # only the few trajectories that first pass a bound in this block are searched for the hand they did
+            first = np.flatnonzero((ruined > hands) & (lows <= -bankroll))
+            ruined[first] = start + 1 + (block[first] <= -bankroll).argmax(axis=1)
+            first = np.flatnonzero((doubled > hands) & (peak >= bankroll))
+            doubled[first] = start + 1 + (block[first] >= bankroll).argmax(axis=1)
+        return TrajectoryStats(bankroll, hands, total, -lowest, drawdown, ruined, doubled)
+
+    def _build_alias_table(self):
+        """Builds the alias table of the results by Vose's method. The table has a power of 2 columns, padded with
+        results that are never drawn, so a column is picked by masking bits. Every column keeps its own result with
+        some probability, as a threshold on the remaining bits, and otherwise gives its alias.
+        """
+        self._column_bits = max((len(self._values) - 1).bit_length(), 1)
+        self._columns = 1 << self._column_bits
+        scaled = np.zeros(self._columns)
+        scaled[:len(self._values)] = self._probabilities * self._columns
+        aliases = np.arange(self._columns)
+        small = [column for column in range(self._columns) if scaled[column] < 1]
+        large = [column for column in range(self._columns) if scaled[column] >= 1]
+        while small and large:
+            column = small.pop()
+            alias = large.pop()
+            aliases[column] = alias
+            scaled[alias] -= 1 - scaled[column]
+            (small if scaled[alias] < 1 else large).append(alias)
+        # what is left over is only off 1 by rounding
+        for column in small + large:
+            scaled[column] = 1
+        values = np.zeros(self._columns)
+        values[:len(self._values)] = self._values
+        self._thresholds = np.round(scaled * (1 << (32 - self._column_bits))).astype(np.uint32)
+        self._alias_values = np.empty(2 * self._columns)
+        self._alias_values[0::2] = values[aliases]
+        self._alias_values[1::2] = values
+
+
+class TrajectoryStats:
+    """Represents the outcome of every trajectory played by a RuinSimulator.
+    """
+
+    def __init__(self, bankroll, hands, results, max_losses, drawdowns, ruined, doubled):
+        """Initializes a TrajectoryStats object.
+
+        Args:
+            bankroll (Float): The starting bankroll
+            hands (Int): The number of hands in each trajectory
+            results (ndarray[Float]): The total result of each trajectory
+            max_losses (ndarray[Float]): The most each trajectory was ever down from its start
+            drawdowns (ndarray[Float]): The largest fall of each trajectory from a high
+            ruined (ndarray[Int]): The hand on which each trajectory lost the bankroll, hands + 1 if it never did
+            doubled (ndarray[Int]): The hand on which each trajectory doubled the bankroll, hands + 1 if it never did
+        """
+        self.bankroll = bankroll
+        self.hands = hands
+        self.results = results
+        self.max_losses = max_losses
+        self.drawdowns = drawdowns
+        self.ruined = ruined
+        self.doubled = doubled
+
+    def get_risk_of_ruin(self):
+        """Returns the fraction of trajectories that lost the bankroll within the hands played.
+
+        Returns:
+            Float: The risk of ruin
+        """
+        return float(np.mean(self.ruined <= self.hands))
+
+    def get_doubling_probability(self):
+        """Returns the fraction of trajectories that doubled the bankroll before losing it.
+
+        Returns:
+            Float: The probability of doubling
+        """
+        return float(np.mean(self.doubled < self.ruined))
+
+    def get_time_to_double(self, quantiles=(0.25, 0.5, 0.75)):
+        """Returns quantiles of the number of hands taken to double the bankroll, over all trajectories. A quantile
+        past the fraction of trajectories that doubled is infinite.
+
+        Args:
+            quantiles (List[Float], optional): The quantiles. Defaults to the quartiles.
+
+        Returns:
+            List[Float]: The number of hands at each quantile
+        """
+        times = np.where(self.doubled < self.ruined, self.doubled, math.inf)
+        return [float(time) for time in np.quantile(times, quantiles, method='higher')]
+
+    def get_drawdown_quantiles(self, quantiles=(0.5, 0.9, 0.99)):
+        """Returns quantiles of the largest drawdown of the trajectories.
+
+        Args:
+            quantiles (List[Float], optional): The quantiles. Defaults to (0.5, 0.9, 0.99).
+
+        Returns:
+            List[Float]: The drawdown at each quantile
+        """
+        return [float(drawdown) for drawdown in np.quantile(self.drawdowns, quantiles)]
+
+    def get_required_bankroll(self, risk_of_ruin):
+        """Returns the smallest bankroll that is lost in no more than a fraction of the trajectories within the hands
+        played. A trajectory is ruined by any bankroll no larger than the most it was ever down, so this is just above
+        a quantile of those losses, and holds for any bankroll, not just the one the trajectories were played with.
+        Results come in whole and half bets, so many trajectories are down exactly the quantile, and a bankroll equal
+        to it would be lost in all of them.
+
+        Args:
+            risk_of_ruin (Float): The target risk of ruin, between 0 and 1
+
+        Returns:
+            Float: The bankroll
+
+        Raises:
+            ValueError: If the target is not between 0 and 1.
+        """
+        if not 0 < risk_of_ruin < 1:
+            raise ValueError(f"Invalid risk of ruin {risk_of_ruin}, expected a value between 0 and 1.")
+        return float(np.nextafter(np.quantile(self.max_losses, 1 - risk_of_ruin, method='higher'), math.inf))
+
+    def print_report(self, targets=(0.01, 0.05, 0.135)):
+        """Prints the risk of ruin, doubling, drawdowns and required bankrolls of the trajectories.
+
+        Args:
+            targets (List[Float], optional): The risks of ruin to find bankrolls for. Defaults to (0.01, 0.05, 0.135).
+        """
+        print('Trajectories: %d Hands: %d Bankroll: %s' % (len(self.results), self.hands, self.bankroll))
+        print('Mean result: %.2f' % np.mean(self.results))
+        print('Risk of ruin: %.4f' % self.get_risk_of_ruin())
+        print('Doubled before ruin: %.4f' % self.get_doubling_probability())
+        print('Hands to double (quartiles): %s' % self.get_time_to_double())
+        print('Drawdown (50%%, 90%%, 99%%): %s' % self.get_drawdown_quantiles())
+        for target in targets:
+            bankroll = math.ceil(self.get_required_bankroll(target))
+            print('Bankroll for %.1f%% risk of ruin: %d' % (100 * target, bankroll))
@@ -0,0 +1,60 @@
+class Rules:
+    """Represents the rules of a blackjack game. The defaults are the game the simulator has always played: the dealer
+    hits soft 17 and peeks for blackjack, blackjack pays 3:2, any hand may double including after a split, pairs can
+    be split and resplit without limit, aces included, and split aces can be hit, with no surrender or insurance.
+    """
+
+    def __init__(self, dealer_hits_soft_17=True, blackjack_payout=1.5, double_after_split=True, max_hands=None,
+                 resplit_aces=True, hit_split_aces=True, late_surrender=False, insurance=False, dealer_peeks=True):
+        """Initializes a Rules object.
+
+        Args:
+            dealer_hits_soft_17 (Boolean, optional): The dealer hits soft 17 rather than standing. Defaults to True.
+            blackjack_payout (Float, optional): What a blackjack pays per unit bet. Defaults to 1.5.
+            double_after_split (Boolean, optional): Hands from a split may double. Defaults to True.
+            max_hands (Int, optional): The most hands splitting can make, or no limit if None. Defaults to None.
+            resplit_aces (Boolean, optional): A pair of aces from a split may be split again. Defaults to True.
+            hit_split_aces (Boolean, optional): Hands from split aces may take more than one card. Defaults to True.
+            late_surrender (Boolean, optional): A two card hand that has not split may surrender half its bet once
+            the dealer has checked for blackjack. Defaults to False.
+            insurance (Boolean, optional): Insurance is offered against an ace. Defaults to False.
+            dealer_peeks (Boolean, optional): The dealer checks for blackjack before the player plays, so only the
+            initial bet is lost to it. If not, the player plays first and loses every bet, doubles and splits
+            included, to a dealer blackjack. Defaults to True.
+
+        Raises:
+            ValueError: If a rule has an invalid value.
+        """
+        if blackjack_payout <= 0:
+            raise ValueError(f"Invalid blackjack payout {blackjack_payout}, expected a positive payout.")
+        if max_hands is not None and max_hands < 1:
+            raise ValueError(f"Invalid max hands {max_hands}, expected at least 1.")
+        self.dealer_hits_soft_17 = dealer_hits_soft_17
+        self.blackjack_payout = blackjack_payout
+        self.double_after_split = double_after_split
+        self.max_hands = max_hands
+        self.resplit_aces = resplit_aces
+        self.hit_split_aces = hit_split_aces
+        self.late_surrender = late_surrender
+        self.insurance = insurance
+        self.dealer_peeks = dealer_peeks
+
+    def to_dict(self):
+        """Returns the rules as a dict of plain values, so they can be sent as JSON.
+
+        Returns:
+            dict: The rules
+        """
+        return dict(self.__dict__)
+
+    @staticmethod
+    def from_dict(data):
+        """Rebuilds rules from a dict returned by to_dict.
+
+        Args:
+            data (dict): The rules
+
+        Returns:
+            Rules: The rules
+        """
+        return Rules(**data)
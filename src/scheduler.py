@@ -0,0 +1,292 @@
+import copy
+import multiprocessing
+from collections import deque
+
+import numpy as np
+
+from blackjack import BlackJackSimulator
+from compiledstrategy import CompiledStrategy
+from defaultstrategy import strategy as default_strategy
+from deviations import CompiledDeviations
+from handlog import HandLogWriter, clear_hand_log, write_manifest
+from instrumentation import InstrumentedBlackJackSimulator, InstrumentedSimplifiedShoe
+from rngstreams import chunk_random
+from rules import Rules
+from simplifiedshoe import SimplifiedShoe
+from simulationstats import SimulationStats
+from variancereduction import ControlStats
+
+
+class SimulationJob:
+    """Represents a simulation to run, holding everything needed to play any chunk of its hands.
+    """
+
+    def __init__(self, num_decks=8, penetration=0.75, bet_spread={0: 1}, strategy_table=default_strategy, seed=0,
+                 deviations=None, log_directory=None, instrument=False, sample_every=0, rules=None,
+                 insurance_index=None, counts={2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1, 1: -1},
+                 variance_reduction=False):
+        """Initializes a SimulationJob object. The hands of the job are played in chunks, each with a fresh shoe
+        shuffled from its own random stream, so a chunk's results depend only on the seed and the chunk's index.
+
+        Args:
+            num_decks (Int, optional): The number of decks in the shoe. Defaults to 8.
+            penetration (Float, optional): The penetration of the shoe. Defaults to 0.75.
+            bet_spread (dict(int: int), optional): The bet spread, see BetSpread. Defaults to {0: 1}.
+            strategy_table (dict, optional): The strategy table. Defaults to the default strategy.
+            seed (Int, optional): The seed of the run. Defaults to 0.
+            deviations (List, optional): Strategy deviations by true count, see parse_deviations. Defaults to None.
+            log_directory (str, optional): Write every hand of each chunk to this hand log directory, see HandLog.
+            Defaults to None.
+            instrument (Boolean, optional): Play with InstrumentedBlackJackSimulator, so each chunk's statistics
+            carry a Profile of its hands. Defaults to False.
+            sample_every (Int, optional): When instrumented, keep a trace of every this many hands. Defaults to 0.
+            rules (Rules, optional): The rules of the game. Defaults to the default Rules.
+            insurance_index (Int, optional): Take insurance at true counts at or above this, if the rules offer it,
+            or never if None. Defaults to None.
+            counts (dict(int: int), optional): The count of each card, see SimplifiedShoe. Defaults to Hi-Lo.
+            variance_reduction (Boolean, optional): Record the controls of every hand, so each chunk's statistics
+            carry a ControlStats with estimates of the edge that need fewer hands. Defaults to False.
+        """
+        self.num_decks = num_decks
+        self.penetration = penetration
+        self.bet_spread = bet_spread
+        self.strategy_table = strategy_table
+        self.seed = seed
+        self.deviations = deviations
+        self.log_directory = log_directory
+        self.instrument = instrument
+        self.sample_every = sample_every
+        self.rules = rules
+        self.insurance_index = insurance_index
+        self.counts = counts
+        self.variance_reduction = variance_reduction
+
+    def to_dict(self):
+        """Returns the job as a dict of plain values, so it can be sent as JSON. The strategy table must be a dict in
+        the form produced by parse_strategy_table.
+
+        Returns:
+            dict: The job
+        """
+        return {
+            'num_decks': self.num_decks,
+            'penetration': self.penetration,
+            'bet_spread': sorted(self.bet_spread.items()),
+            'strategy_table': {name: [[dealer_card, player, action] for (dealer_card, player), action in table.items()]
+                               for name, table in self.strategy_table.items()},
+            'seed': self.seed,
+            'deviations': self.deviations,
+            'instrument': self.instrument,
+            'sample_every': self.sample_every,
+            'rules': None if self.rules is None else self.rules.to_dict(),
+            'insurance_index': self.insurance_index,
+            'counts': sorted(self.counts.items()),
+            'variance_reduction': self.variance_reduction,
+        }
+
+    @staticmethod
+    def from_dict(data):
+        """Rebuilds a job from a dict returned by to_dict.
+
+        Args:
+            data (dict): The job
+
+        Returns:
+            SimulationJob: The job
+        """
+        strategy_table = {name: {(dealer_card, player): action for dealer_card, player, action in table}
+                          for name, table in data['strategy_table'].items()}
+        deviations = data['deviations']
+        if deviations is not None:
+            deviations = [tuple(deviation) for deviation in deviations]
+        rules = data['rules']
+        if rules is not None:
+            rules = Rules.from_dict(rules)
+        return SimulationJob(data['num_decks'], data['penetration'], dict(data['bet_spread']), strategy_table,
+                             data['seed'], deviations, instrument=data['instrument'],
+                             sample_every=data['sample_every'], rules=rules, insurance_index=data['insurance_index'],
+                             counts=dict(data['counts']), variance_reduction=data['variance_reduction'])
+
+    def compile(self):
+        """Returns a copy of the job with its strategy table and deviations compiled, so a process that plays many of
+        the job's chunks compiles them once rather than once per chunk. The copy cannot be converted to a dict.
+
+        Returns:
+            SimulationJob: The compiled job
+        """
+        job = copy.copy(self)
+        job.strategy_table = CompiledStrategy(self.strategy_table)
+        if self.deviations is not None:
+            job.deviations = CompiledDeviations(job.strategy_table, self.deviations)
+        return job
+
+    def run_chunk(self, chunk_index, hands):
+        """Plays one chunk of the job.
+
+        Args:
+            chunk_index (Int): The index of the chunk
+            hands (Int): The number of hands in the chunk
+
+        Returns:
+            SimulationStats: The statistics of the chunk
+        """
+        rng = chunk_random(self.seed, chunk_index)
+        stats = SimulationStats()
+        if self.instrument:
+            shoe = InstrumentedSimplifiedShoe(self.num_decks, self.penetration, self.counts, rng=rng)
+            sim = InstrumentedBlackJackSimulator(self.num_decks, self.penetration, self.bet_spread,
+                                                 self.strategy_table, shoe=shoe, deviations=self.deviations,
+                                                 rules=self.rules, insurance_index=self.insurance_index,
+                                                 sample_every=self.sample_every)
+            stats.profile = sim.profile
+        else:
+            shoe = SimplifiedShoe(self.num_decks, self.penetration, self.counts, rng=rng)
+            sim = BlackJackSimulator(self.num_decks, self.penetration, self.bet_spread, self.strategy_table,
+                                     shoe=shoe, deviations=self.deviations, rules=self.rules,
+                                     insurance_index=self.insurance_index)
+        if self.log_directory is None and not self.variance_reduction:
+            for _ in range(hands):
+                value = sim.play_hand()
+                stats.update(value, sim._hand_wager, sim._hand_flags)
+            return stats
+
+        log = None if self.log_directory is None else HandLogWriter(self.log_directory, chunk_index)
+        # the results, wagers, first four cards and cards left in the shoe before each hand, for the controls
+        results = []
+        wagers = []
+        cards = []
+        compositions = []
+        full = [shoe.cards.count(card) for card in range(11)]
+        remaining = [full[card] - shoe.cards[:shoe.get_cards_dealt()].count(card) for card in range(11)]
+        shuffles = 0
+        for _ in range(hands):
+            # shuffle before reading the true count, the simulator will then not shuffle again
+            if shoe.start_hand():
+                shuffles += 1
+                remaining = full[:]
+            true_count = shoe.get_true_count()
+            position = shoe.get_cards_dealt()
+            value = sim.play_hand()
+            stats.update(value, sim._hand_wager, sim._hand_flags)
+            if log is not None:
+                log.append(sim._hand_bet, value, true_count, shuffles)
+            if self.variance_reduction:
+                results.append(value)
+                wagers.append(sim._hand_wager)
+                cards.extend(shoe.cards[position:position + 4])
+                compositions.extend(remaining)
+                for card in shoe.cards[position:shoe.get_cards_dealt()]:
+                    remaining[card] -= 1
+        if log is not None:
+            log.close()
+        if self.variance_reduction:
+            stats.controls = ControlStats()
+            stats.controls.update_many(np.array(results, dtype=np.float64), np.array(wagers, dtype=np.float64),
+                                       np.array(cards, dtype=np.int64).reshape(-1, 4),
+                                       np.array(compositions, dtype=np.int64).reshape(-1, 11))
+        return stats
+
+
+def report_progress(stats):
+    """Prints the progress of a run.
+
+    Args:
+        stats (SimulationStats): The statistics so far
+    """
+    if stats.controls is not None:
+        edge, standard_error = stats.controls.get_control_variate_estimate()
+        print('Hands: %d House edge: %.5f +/- %.5f' % (stats.count, edge, 1.96 * standard_error))
+        return
+    low, high = stats.get_confidence_interval()
+    print('Hands: %d House edge: %.5f +/- %.5f' % (stats.count, stats.get_house_edge(), (high - low) / 2))
+
+
+class ConvergenceScheduler:
+    """Represents an object that runs a SimulationJob in chunks across worker processes until the house edge is known
+    to a target precision.
+    """
+
+    def __init__(self, job, target_half_width=0.001, chunk_size=10_000, min_hands=100_000, max_hands=100_000_000,
+                 processes=None, progress=report_progress):
+        """Initializes a ConvergenceScheduler object. Chunks are merged in index order, and the run stops after the
+        first chunk at which the confidence interval is narrow enough, so for a given seed the result does not depend
+        on the number of processes.
+
+        Args:
+            job (SimulationJob): The job to run
+            target_half_width (Float, optional): Stop once the 95% confidence interval of the house edge is no wider
+            than this on either side. Defaults to 0.001.
+            chunk_size (Int, optional): The number of hands in each chunk. Defaults to 10,000.
+            min_hands (Int, optional): Always play at least this many hands. Defaults to 100,000.
+            max_hands (Int, optional): Never play more than this many hands. Defaults to 100,000,000.
+            processes (Int, optional): The number of worker processes. Defaults to the number of cpus.
+            progress (function, optional): Called with the merged SimulationStats after each chunk, or None.
+            Defaults to report_progress.
+        """
+        self._job = job
+        self._target_half_width = target_half_width
+        self._chunk_size = chunk_size
+        self._min_hands = min_hands
+        self._max_hands = max_hands
+        self._processes = processes or multiprocessing.cpu_count()
+        self._progress = progress
+
+    def run(self):
+        """Runs the job until it converges or reaches the maximum number of hands. A job's hand log is cleared first,
+        and once the run stops its manifest lists the chunks that were merged, so the log holds the same hands as the
+        statistics even when chunks run ahead of convergence.
+
+        Returns:
+            SimulationStats: The statistics of every hand played
+        """
+        if self._job.log_directory is not None:
+            clear_hand_log(self._job.log_directory)
+        stats = self._run()
+        if self._job.log_directory is not None:
+            write_manifest(self._job.log_directory, range(self._merged_chunks))
+        return stats
+
+    def _run(self):
+        """Runs the chunks, in worker processes if there is more than one.
+
+        Returns:
+            SimulationStats: The statistics of every hand played
+        """
+        chunks = [(index, min(self._chunk_size, self._max_hands - start))
+                  for index, start in enumerate(range(0, self._max_hands, self._chunk_size))]
+        stats = SimulationStats()
+        self._merged_chunks = 0
+        if self._processes == 1:
+            for chunk_index, hands in chunks:
+                if self._add_chunk(stats, self._job.run_chunk(chunk_index, hands)):
+                    break
+            return stats
+
+        with multiprocessing.Pool(processes=self._processes) as pool:
+            # keep a couple of chunks queued per worker, and collect them in order
+            pending = deque()
+            next_chunk = 0
+            while pending or next_chunk < len(chunks):
+                while next_chunk < len(chunks) and len(pending) < 2 * self._processes:
+                    pending.append(pool.apply_async(self._job.run_chunk, chunks[next_chunk]))
+                    next_chunk += 1
+                if self._add_chunk(stats, pending.popleft().get()):
+                    break
+        return stats
+
+    def _add_chunk(self, stats, chunk_stats):
+        """Merges a finished chunk and reports progress.
+
+        Returns:
+            Boolean: True if the run has converged
+        """
+        stats.merge(chunk_stats)
+        self._merged_chunks += 1
+        if self._progress is not None:
+            self._progress(stats)
+        # a job with variance reduction converges on the control variate estimate, which needs fewer hands
+        if stats.controls is not None:
+            low, high = stats.controls.get_confidence_interval()
+        else:
+            low, high = stats.get_confidence_interval()
+        return stats.count >= self._min_hands and (high - low) / 2 <= self._target_half_width
@@ -1,81 +1,74 @@
 import random
 from cardsuit import CardSuit
 from cardvalue import CardValue
-from simplecard import SimpleCard
-
-from simplifiedshoe import SimplifiedShoe
+from packedcard import BLACKJACK_VALUES, NUM_PACKED, decode, pack
 
 
 class Shoe:
-    """Represents an object that can be used to simulate a blackjack shoe."""
+    """Represents an object that can be used to simulate a blackjack shoe with suited cards."""
+
+    __slots__ = ('cards', '_rng', '_count_values', '_index', '_count', '_cut_card')
 
-    def __init__(self, num_decks, penetration, counts={2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1, 1: -1}):
+    def __init__(self, num_decks, penetration, counts={2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1, 1: -1},
+                 rng=None):
         """Initializes a Shoe object which can be used to simulate a blackjack shoe. The shoe is represented as a list
-        of integers, where each integer represents a card. The cards are represented as follows:
-        1 = Ace
-        2-9 = 2-9
-        10 = 10, Jack, Queen, King
+        of packed cards, see packedcard, each holding the card's face value and suit in a single small int. Cards are
+        dealt as packed ints, and only decoded to a SimpleCard when decode is called.
 
         Args:
             num_decks (Int): The number of decks in the shoe
             penetration (Float): The penetration of the shoe, represented as a decimal between 0 and 1. For example, a
             penetration of 0.75 means that the shoe will be reshuffled when there are 75% of the cards have been dealt.
-            counts (dict, optional): What count value each card has.
+            counts (dict, optional): What count value each card has, by blackjack value.
+            rng (random.Random, optional): The random number generator used to shuffle. Defaults to the global one in
+            the random module.
         """
-        self._shoe = SimplifiedShoe(num_decks, penetration, counts)
-        self._num_decks = num_decks
+        self._rng = rng if rng is not None else random
+        self.cards = [pack(value, suit) for value in CardValue for suit in CardSuit] * num_decks
+        self._count_values = [counts[BLACKJACK_VALUES[card]] if card >> 2 else 0 for card in range(NUM_PACKED)]
+        self._cut_card = len(self.cards) * penetration
         self._shuffle()
 
-    def _enhance(self, card):
-        """Enhances a given integer card value to a SimpleCard object, providing it with suit and face value
-        consistent with what has been dealt so far.
-
-        Args:
-            card (Int): The card to enhance in integer form
-        """
-        if card == 1:
-            return SimpleCard(CardValue.ACE, self._suit_pools[CardValue.ACE].pop())
-        elif card == 10:
-            ten_card = self._ten_pool.pop()
-            return SimpleCard(ten_card, self._suit_pools[ten_card].pop())
-        else:
-            return SimpleCard(card, self._suit_pools[card].pop())
-
-    def _shuffle(self):
-        """Shuffles the shoe.
-        """
-        self._ten_pool = [CardValue.TEN, CardValue.JACK, CardValue.QUEEN, CardValue.KING] * 4 * self._num_decks
-        self._suit_pools = {value: [CardSuit.CLUBS, CardSuit.DIAMONDS, CardSuit.HEARTS, CardSuit.SPADES] * self._num_decks for value in CardValue}
-        random.shuffle(self._ten_pool)
-        for pool in self._suit_pools.values():
-            random.shuffle(pool)
-
-
     def draw(self):
         """Draws a card from the shoe and updates the count.
 
         Returns:
-            Int: The card that was drawn
+            Int: The packed card that was drawn
         """
-        return self._enhance(self._shoe.draw())
+        card = self.cards[self._index]
+        self._index += 1
+        self._count += self._count_values[card]
+        return card
     
     def draw_face_down(self):
         """Draws a card from the shoe without updating the count. Once the card is revealed, the card_revealed method
         should be called to update the count.
 
         Returns:
-            Int: The card that was drawn.
+            Int: The packed card that was drawn.
         """
-        return self._enhance(self._shoe.draw_face_down())
+        self._index += 1
+        return self.cards[self._index - 1]
     
     def card_revealed(self, card):
         """Updates the count based on the card that was revealed. This is necessary to account for cards that are
         dealt face down, and then revealed later. Thus, the count will only be updated when the card is revealed.
 
         Args:
-            card (SimpleCard): The card that was revealed
+            card (Int): The packed card that was revealed
         """
-        self._shoe.card_revealed(card.int_value())
+        self._count += self._count_values[card]
+
+    def decode(self, card):
+        """Decodes a packed card dealt by this shoe.
+
+        Args:
+            card (Int): The packed card
+
+        Returns:
+            SimpleCard: The card
+        """
+        return decode(card)
 
     def get_count(self):
         """Returns the running count of the shoe.
@@ -83,7 +76,7 @@ class Shoe:
         Returns:
             Int: The running count of the shoe
         """
-        return self._shoe.get_count()
+        return self._count
     
     def get_true_count(self):
         """Returns the true count of the shoe, which is calculated by dividing the running count by the number of
@@ -92,8 +85,15 @@ class Shoe:
         Returns:
             Int: The true count of the shoe
         """
-        return self._shoe.get_true_count()
+        return int(self._count / ((len(self.cards) - self._index) / 52))
     
+    def _shuffle(self):
+        """Shuffles the shoe, resetting the index and count to 0.
+        """
+        self._rng.shuffle(self.cards)
+        self._index = 0
+        self._count = 0
+
     def start_hand(self):
         """Called at the beginning of a new hand. If the cut card has been dealt, the shoe will be shuffled
         and the count will be reset to 0.
@@ -101,7 +101,7 @@ class Shoe:
         Returns:
             Boolean: True if the shoe was shuffled, False otherwise
         """
-        shuffled = self._shoe.start_hand()
-        if shuffled:
+        if self._index > self._cut_card:
             self._shuffle()
-        return shuffled
\ No newline at end of file
+            return True
+        return False
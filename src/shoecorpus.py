@@ -0,0 +1,78 @@
+import numpy as np
+
+from simplifiedshoe import SimplifiedShoe
+
+
+def generate_corpus(filename, num_shoes, num_decks, seed=0, batch_size=100_000):
+    """Generates a corpus of shuffled shoes and writes it to a .npy file, one row of uint8 card values per shoe. The
+    shoes are shuffled in batches with vectorized permutations, and the file can be memory mapped by any number of
+    processes at once.
+
+    Args:
+        filename (str): The file to write
+        num_shoes (Int): The number of shoes to generate
+        num_decks (Int): The number of decks in each shoe
+        seed (Int, optional): The seed for the shuffles. Defaults to 0.
+        batch_size (Int, optional): The number of shoes shuffled at a time. Defaults to 100,000.
+    """
+    rng = np.random.default_rng(seed)
+    single_suit = list(range(1, 11)) + [10, 10, 10]
+    deck = np.array(single_suit * 4 * num_decks, dtype=np.uint8)
+    corpus = np.lib.format.open_memmap(filename, mode='w+', dtype=np.uint8, shape=(num_shoes, len(deck)))
+    for start in range(0, num_shoes, batch_size):
+        end = min(start + batch_size, num_shoes)
+        corpus[start:end] = rng.permuted(np.broadcast_to(deck, (end - start, len(deck))), axis=1)
+    corpus.flush()
+
+
+def load_corpus(filename):
+    """Memory maps a corpus written by generate_corpus, without reading it into memory.
+
+    Args:
+        filename (str): The corpus file
+
+    Returns:
+        ndarray[Int]: The corpus, one row per shoe
+    """
+    return np.load(filename, mmap_mode='r')
+
+
+class CorpusShoe(SimplifiedShoe):
+    """Represents a SimplifiedShoe that deals pre-shuffled shoes from a corpus instead of shuffling its own cards.
+    """
+
+    def __init__(self, corpus, penetration, counts={2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1, 1: -1},
+                 first_shoe=0, shoe_step=1):
+        """Initializes a CorpusShoe object. Each time the cut card comes out, the shoe moves on to the next shoe of the
+        corpus and deals straight from its memory mapped row, so nothing is shuffled or copied. Workers can share one
+        corpus by taking different first shoes with a shoe step of the number of workers, and a run can be replayed
+        exactly by dealing the same shoes again.
+
+        Args:
+            corpus (ndarray[Int]): The corpus, see load_corpus
+            penetration (Float): The penetration of the shoe, represented as a decimal between 0 and 1
+            counts (dict, optional): What count value each card has.
+            first_shoe (Int, optional): The index of the first shoe to deal. Defaults to 0.
+            shoe_step (Int, optional): How far to move through the corpus at each shuffle. Defaults to 1.
+        """
+        self._corpus = corpus
+        self._shoe_index = first_shoe
+        self._shoe_step = shoe_step
+        self.counts = counts
+        self.cards = memoryview(corpus[first_shoe])
+        self._index = 0
+        self._count = 0
+        self._cut_card = len(self.cards) * penetration
+
+    def _shuffle(self):
+        """Moves on to the next shoe of the corpus, resetting the index and count to 0.
+
+        Raises:
+            RuntimeError: If every shoe of the corpus for this shoe has been dealt.
+        """
+        self._shoe_index += self._shoe_step
+        if self._shoe_index >= len(self._corpus):
+            raise RuntimeError(f"The corpus has run out of shoes after {self._shoe_index // self._shoe_step}.")
+        self.cards = memoryview(self._corpus[self._shoe_index])
+        self._index = 0
+        self._count = 0
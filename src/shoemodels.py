@@ -0,0 +1,212 @@
+from collections import deque
+
+from simplifiedshoe import SimplifiedShoe
+
+
+def riffle(cards, rng):
+    """Riffles cards once by the Gilbert-Shannon-Reeds model: the cards are cut binomially in two and the halves
+    dropped together, a card falling from each half with probability proportional to the cards left in it. This is
+    the same as giving each position a random bit and filling the positions with zeros from the top half in order and
+    the positions with ones from the bottom half in order.
+
+    Args:
+        cards (List[Int]): The cards, from the top
+        rng (random.Random): The random number generator
+
+    Returns:
+        List[Int]: The riffled cards
+    """
+    num_cards = len(cards)
+    if num_cards < 2:
+        return list(cards)
+    bits = format(rng.getrandbits(num_cards), f'0{num_cards}b')
+    top = iter(cards[:bits.count('0')])
+    bottom = iter(cards[bits.count('0'):])
+    return [next(top) if bit == '0' else next(bottom) for bit in bits]
+
+
+def strip_cut(cards, rng, packets=4):
+    """Strips cards: packets of random size are pulled off the top one at a time and each is dropped on the last, which
+    reverses the order of the packets but not of the cards within them.
+
+    Args:
+        cards (List[Int]): The cards, from the top
+        rng (random.Random): The random number generator
+        packets (Int, optional): The number of packets. Defaults to 4.
+
+    Returns:
+        List[Int]: The stripped cards
+    """
+    bounds = sorted(rng.randrange(len(cards) + 1) for _ in range(packets - 1))
+    bounds = [0] + bounds + [len(cards)]
+    stripped = []
+    for start, end in reversed(list(zip(bounds, bounds[1:]))):
+        stripped.extend(cards[start:end])
+    return stripped
+
+
+def cut(cards, rng):
+    """Cuts cards at a random point near the middle, the middle half of the cards.
+
+    Args:
+        cards (List[Int]): The cards, from the top
+        rng (random.Random): The random number generator
+
+    Returns:
+        List[Int]: The cut cards
+    """
+    position = len(cards) // 4 + rng.randrange(len(cards) // 2 + 1)
+    return cards[position:] + cards[:position]
+
+
+class ImperfectShuffleShoe(SimplifiedShoe):
+    """Represents a SimplifiedShoe shuffled the way a dealer shuffles by hand, so the order of a shoe depends on the
+    order of the last one. At the cut card the discards, in the order they were dealt, go back together with the cards
+    behind the cut card. The pile is split in two, a grab from each half is riffled together and the grabs are stacked
+    back up, a fixed number of times with strip cuts after some of the riffles, then the shoe is cut. A shuffle is a
+    handful of passes over the cards, so it costs the same per card as a perfect shuffle, and cards are drawn exactly
+    as from a SimplifiedShoe.
+    """
+
+    def __init__(self, num_decks, penetration, counts={2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1, 1: -1},
+                 rng=None, riffles=3, strips=1, grab_size=104):
+        """Initializes an ImperfectShuffleShoe object. The first shoe is shuffled perfectly.
+
+        Args:
+            num_decks (Int): The number of decks in the shoe
+            penetration (Float): The penetration of the shoe
+            counts (dict, optional): What count value each card has.
+            rng (random.Random, optional): The random number generator used to shuffle. Defaults to the global one in
+            the random module.
+            riffles (Int, optional): The number of riffles in a shuffle. Defaults to 3.
+            strips (Int, optional): The number of riffles, from the first, followed by a strip cut. Defaults to 1.
+            grab_size (Int, optional): The number of cards riffled at once, half from each half of the pile, as a
+            dealer cannot riffle a whole shoe at once. Defaults to 104, two decks.
+        """
+        super().__init__(num_decks, penetration, counts, rng)
+        self._riffles = riffles
+        self._strips = strips
+        self._grab_size = grab_size
+
+    def _shuffle(self):
+        """Shuffles the discards and the cards behind the cut card together, resetting the index and count to 0.
+        """
+        rng = self._rng
+        cards = self.cards[self._index:] + self.cards[:self._index]
+        half = len(cards) // 2
+        step = max(self._grab_size // 2, 1)
+        for riffle_index in range(self._riffles):
+            left = cards[:half]
+            right = cards[half:]
+            shuffled = []
+            for start in range(0, len(right), step):
+                grab = riffle(left[start:start + step] + right[start:start + step], rng)
+                if riffle_index < self._strips:
+                    grab = strip_cut(grab, rng)
+                shuffled.extend(grab)
+            cards = shuffled
+        self.cards = cut(cards, rng)
+        self._index = 0
+        self._count = 0
+
+
+class ContinuousShuffleShoe(SimplifiedShoe):
+    """Represents a continuous shuffling machine. The cards in the machine are kept in a list in no particular order, a
+    card is drawn by taking a uniformly random position and moving the last card into its place, and a returned card is
+    appended, so both cost the same however many cards the machine holds. The cards of a round wait in the discard
+    tray and go back into the machine at the start of a later hand, when their count is taken back out of the running
+    count, so the count only ever covers the cards outside the machine.
+    """
+
+    def __init__(self, num_decks, counts={2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1, 1: -1}, rng=None,
+                 rounds_held=0, buffer_size=0):
+        """Initializes a ContinuousShuffleShoe object.
+
+        Args:
+            num_decks (Int): The number of decks in the machine
+            counts (dict, optional): What count value each card has.
+            rng (random.Random, optional): The random number generator used to shuffle. Defaults to the global one in
+            the random module.
+            rounds_held (Int, optional): The number of later rounds the discards of a round wait in the tray before
+            they go back into the machine, 0 returning them before the next hand. Defaults to 0.
+            buffer_size (Int, optional): The number of cards the machine has already released and deals in order, so
+            returned cards cannot come straight back out. Defaults to 0.
+        """
+        super().__init__(num_decks, 1.0, counts, rng)
+        self._rounds_held = rounds_held
+        self._round = []
+        self._tray = deque()
+        self._buffer = None
+        self._buffer_size = buffer_size
+        if buffer_size:
+            self._buffer = deque(self._draw_from_machine() for _ in range(buffer_size))
+
+    def draw_face_down(self):
+        """Draws a card from the machine without updating the count. Once the card is revealed, the card_revealed
+        method should be called to update the count.
+
+        Returns:
+            Int: The card that was drawn.
+        """
+        card = self._draw_from_machine()
+        if self._buffer is not None:
+            self._buffer.append(card)
+            card = self._buffer.popleft()
+        self._round.append(card)
+        self._index += 1
+        return card
+
+    def get_true_count(self):
+        """Returns the true count of the cards outside the machine, dividing the running count by the number of decks
+        in the machine and its buffer.
+
+        Returns:
+            Int: The true count
+        """
+        return int(self._count / ((len(self.cards) + self._buffer_size) / 52))
+
+    def start_hand(self):
+        """Called at the beginning of a new hand. The last round's cards go into the discard tray, and the cards that
+        have waited in it long enough go back into the machine.
+
+        Returns:
+            Boolean: True if cards went back into the machine, False otherwise
+        """
+        if self._round:
+            self._tray.append(self._round)
+            self._round = []
+        if len(self._tray) <= self._rounds_held:
+            return False
+        counts = self.counts
+        while len(self._tray) > self._rounds_held:
+            discards = self._tray.popleft()
+            self.cards.extend(discards)
+            self._index -= len(discards)
+            self._count -= sum(counts[card] for card in discards)
+        return True
+
+    def _draw_from_machine(self):
+        """Takes a uniformly random card out of the machine.
+
+        Returns:
+            Int: The card
+        """
+        cards = self.cards
+        position = int(self._rng.random() * len(cards))
+        card = cards[position]
+        cards[position] = cards[-1]
+        cards.pop()
+        return card
+
+    def _shuffle(self):
+        """Returns every card outside the machine, resetting the index and count to 0.
+        """
+        self.cards.extend(card for discards in self._tray for card in discards)
+        self.cards.extend(self._round)
+        if self._buffer is not None:
+            self.cards.extend(self._buffer)
+            self._buffer = deque(self._draw_from_machine() for _ in range(len(self._buffer)))
+        self._tray.clear()
+        self._round = []
+        self._index = 0
+        self._count = 0
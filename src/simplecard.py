@@ -2,13 +2,14 @@ from cardvalue import CardValue
 
 
 class SimpleCard:
+    __slots__ = ('value', 'suit')
 
     def __init__(self, value, suit):
         """Initializes a SimpleCard object.
 
         Args:
-            value (int): The card's value
-            suit (str): The card's suit
+            value (CardValue): The card's value
+            suit (CardSuit): The card's suit
         """
         self.value = value
         self.suit = suit
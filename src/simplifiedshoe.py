@@ -6,7 +6,8 @@ class SimplifiedShoe:
     of simply an integer value corresponding to their value in the game of blackjack. There are no suits or face cards.
     """
 
-    def __init__(self, num_decks, penetration, counts={2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1, 1: -1}):
+    def __init__(self, num_decks, penetration, counts={2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1, 1: -1},
+                 rng=None):
         """Initializes a Shoe object which can be used to simulate a blackjack shoe. The shoe is represented as a list
         of integers, where each integer represents a card. The cards are represented as follows:
         1 = Ace
@@ -20,7 +21,10 @@ class SimplifiedShoe:
             penetration (Float): The penetration of the shoe, represented as a decimal between 0 and 1. For example, a
             penetration of 0.75 means that the shoe will be reshuffled when there are 75% of the cards have been dealt.
             counts (dict, optional): . Defaults to {2: 1, 3: 1, 4: 1, 5: 1, 6: 1, 7: 0, 8: 0, 9: 0, 10: -1, 1: -1}.
+            rng (random.Random, optional): The random number generator used to shuffle. Defaults to the global one in
+            the random module.
         """
+        self._rng = rng if rng is not None else random
         self.cards = self._get_decks(num_decks)
         self.counts = counts
         self._index = 0
@@ -64,6 +68,14 @@ class SimplifiedShoe:
         """
         return self._count
     
+    def get_cards_dealt(self):
+        """Returns the number of cards dealt since the shoe was last shuffled.
+
+        Returns:
+            Int: The number of cards dealt
+        """
+        return self._index
+
     def get_true_count(self):
         """Returns the true count of the shoe, which is calculated by dividing the running count by the number of
         decks remaining in the shoe.
@@ -76,7 +88,7 @@ class SimplifiedShoe:
     def _shuffle(self):
         """Shuffles the shoe, resetting the index and count to 0.
         """
-        random.shuffle(self.cards)
+        self._rng.shuffle(self.cards)
         self._index = 0
         self._count = 0
     
@@ -111,5 +123,5 @@ class SimplifiedShoe:
         for i in range(0, num_decks * 4):
             deck.extend(single_suit)
 
-        random.shuffle(deck)
+        self._rng.shuffle(deck)
         return deck
\ No newline at end of file
@@ -0,0 +1,444 @@
+import argparse
+import asyncio
+import http.client
+import itertools
+import json
+import math
+import multiprocessing
+from collections import deque
+
+from resultcache import get_cache_key
+from scheduler import SimulationJob
+from simulationstats import SimulationStats
+
+# the compiled jobs a worker process keeps by key, so a worker only builds a job the first time it plays one of its
+# chunks
+MAX_PREPARED_JOBS = 32
+_prepared_jobs = {}
+
+REASONS = {200: 'OK', 201: 'Created', 400: 'Bad Request', 404: 'Not Found'}
+
+
+def play_chunk(key, job_data, chunk_index, hands):
+    """Plays one chunk of a job in a worker process, compiling the job the first time the worker sees it.
+
+    Args:
+        key (str): The job's cache key, see get_cache_key
+        job_data (dict): The job, as returned by SimulationJob.to_dict
+        chunk_index (Int): The index of the chunk
+        hands (Int): The number of hands in the chunk
+
+    Returns:
+        SimulationStats: The statistics of the chunk
+    """
+    job = _prepared_jobs.get(key)
+    if job is None:
+        if len(_prepared_jobs) >= MAX_PREPARED_JOBS:
+            _prepared_jobs.clear()
+        job = SimulationJob.from_dict(job_data).compile()
+        _prepared_jobs[key] = job
+    return job.run_chunk(chunk_index, hands)
+
+
+class ServerJob:
+    """Represents a job submitted to a SimulationServer, with its chunks still to be handed out and the statistics of
+    the chunks played so far, merged in chunk order.
+    """
+
+    def __init__(self, job_id, job, hands, chunk_size):
+        """Initializes a ServerJob object.
+
+        Args:
+            job_id (Int): The id of the job on the server
+            job (SimulationJob): The job
+            hands (Int): The number of hands to play
+            chunk_size (Int): The number of hands in each chunk
+        """
+        self.id = job_id
+        self.hands = hands
+        self.state = 'running'
+        self.error = None
+        self.stats = SimulationStats()
+        self.key = get_cache_key(job, chunk_size)
+        self.data = job.to_dict()
+        self.chunks = deque((index, min(chunk_size, hands - start))
+                            for index, start in enumerate(range(0, hands, chunk_size)))
+        self._num_chunks = len(self.chunks)
+        self._results = {}
+        self._next_index = 0
+        self._changed = asyncio.Event()
+        if not self.chunks:
+            self.state = 'done'
+
+    def add_result(self, chunk_index, stats):
+        """Records the statistics of a chunk, merging every chunk that is now next in order.
+
+        Args:
+            chunk_index (Int): The index of the chunk
+            stats (SimulationStats): The statistics of the chunk
+        """
+        if self.state != 'running':
+            return
+        self._results[chunk_index] = stats
+        while self._next_index in self._results:
+            self.stats.merge(self._results.pop(self._next_index))
+            self._next_index += 1
+        if self._next_index == self._num_chunks:
+            self.state = 'done'
+        self._notify()
+
+    def finish(self, state, error=None):
+        """Stops the job, dropping the chunks not yet handed out. Chunks already being played are ignored when they
+        finish.
+
+        Args:
+            state (str): 'cancelled' or 'failed'
+            error (str, optional): What went wrong. Defaults to None.
+        """
+        if self.state != 'running':
+            return
+        self.state = state
+        self.error = error
+        self.chunks.clear()
+        self._notify()
+
+    def get_changed(self):
+        """Returns an event that is set the next time the job changes.
+
+        Returns:
+            asyncio.Event: The event
+        """
+        return self._changed
+
+    def get_status(self, include_stats=False):
+        """Returns the progress of the job as a dict of plain values.
+
+        Args:
+            include_stats (Boolean, optional): Include every statistic, see SimulationStats.to_dict. Defaults to
+            False.
+
+        Returns:
+            dict: The status
+        """
+        standard_error = self.stats.get_standard_error()
+        status = {
+            'id': self.id,
+            'state': self.state,
+            'error': self.error,
+            'hands': self.hands,
+            'played': self.stats.count,
+            'house_edge': self.stats.get_house_edge(),
+            'standard_error': standard_error if math.isfinite(standard_error) else None,
+        }
+        if include_stats:
+            status['stats'] = self.stats.to_dict()
+        return status
+
+    def _notify(self):
+        """Wakes everything waiting for the job to change.
+        """
+        changed = self._changed
+        self._changed = asyncio.Event()
+        changed.set()
+
+
+class SimulationServer:
+    """Represents a long lived local server that plays simulation jobs on a pool of worker processes started once, so
+    a short job pays for neither starting processes nor compiling its strategy more than once per worker. Jobs are
+    submitted and followed over HTTP with JSON bodies, on a TCP port or a Unix socket. Running jobs take turns handing
+    a chunk to the pool, so a long job does not hold up a short one, and a job can be cancelled or streamed as its
+    statistics build up.
+
+    Routes:
+        POST /jobs: Submits {"job": {...}, "hands": Int, "chunk_size": Int}, where the job holds any of the fields of
+        SimulationJob.to_dict and the rest take their defaults
+        GET /jobs: The status of every job
+        GET /jobs/<id>: The status of a job with its statistics
+        GET /jobs/<id>/progress: A line of JSON with the job's status each time a chunk is merged, ending with its
+        statistics once it stops
+        DELETE /jobs/<id>: Cancels a running job, or forgets a stopped one
+    """
+
+    def __init__(self, processes=None, chunk_size=10_000):
+        """Initializes a SimulationServer object and starts its worker processes.
+
+        Args:
+            processes (Int, optional): The number of worker processes. Defaults to the number of cpus.
+            chunk_size (Int, optional): The number of hands in each chunk, unless a job asks otherwise. Defaults to
+            10,000.
+        """
+        self._processes = processes or multiprocessing.cpu_count()
+        self._chunk_size = chunk_size
+        self._pool = multiprocessing.Pool(processes=self._processes)
+        self._jobs = {}
+        self._ids = itertools.count(1)
+        # the running jobs with chunks left to hand out, in the order they take their turns
+        self._rotation = deque()
+        self._work = asyncio.Event()
+        # enough chunks in flight to keep every worker busy while finished chunks travel back
+        self._slots = asyncio.Semaphore(2 * self._processes)
+        self._tasks = set()
+
+    def submit(self, job, hands, chunk_size=None):
+        """Submits a job.
+
+        Args:
+            job (SimulationJob): The job
+            hands (Int): The number of hands to play
+            chunk_size (Int, optional): The number of hands in each chunk. Defaults to the server's chunk size.
+
+        Returns:
+            ServerJob: The submitted job
+
+        Raises:
+            ValueError: If the job, the number of hands or the chunk size is invalid.
+        """
+        chunk_size = chunk_size or self._chunk_size
+        if hands < 0 or chunk_size < 1:
+            raise ValueError(f"Invalid job of {hands} hands in chunks of {chunk_size}.")
+        # compiled here too, so an invalid strategy or deviation is turned away rather than failing in a worker
+        job.compile()
+        server_job = ServerJob(next(self._ids), job, hands, chunk_size)
+        self._jobs[server_job.id] = server_job
+        if server_job.chunks:
+            self._rotation.append(server_job)
+            self._work.set()
+        return server_job
+
+    def cancel(self, job_id):
+        """Cancels a running job, or forgets a job that has stopped.
+
+        Args:
+            job_id (Int): The id of the job
+
+        Returns:
+            ServerJob: The job
+
+        Raises:
+            KeyError: If there is no such job.
+        """
+        server_job = self._jobs[job_id]
+        if server_job.state == 'running':
+            server_job.finish('cancelled')
+            self._remove(server_job)
+        else:
+            del self._jobs[job_id]
+        return server_job
+
+    async def serve(self, host='localhost', port=8765, path=None):
+        """Serves requests until cancelled.
+
+        Args:
+            host (str, optional): The address to listen on. Defaults to 'localhost'.
+            port (Int, optional): The port to listen on. Defaults to 8765.
+            path (str, optional): Listen on this Unix socket instead of a TCP port. Defaults to None.
+        """
+        if path is None:
+            server = await asyncio.start_server(self._handle, host, port)
+        else:
+            server = await asyncio.start_unix_server(self._handle, path)
+        dispatcher = asyncio.ensure_future(self._dispatch())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            dispatcher.cancel()
+
+    def close(self):
+        """Stops the worker processes.
+        """
+        self._pool.terminate()
+        self._pool.join()
+
+    async def _dispatch(self):
+        """Hands out chunks to the worker pool, one from each running job in turn, whenever a worker has room.
+        """
+        while True:
+            await self._slots.acquire()
+            while not self._rotation:
+                self._work.clear()
+                await self._work.wait()
+            server_job = self._rotation.popleft()
+            chunk_index, hands = server_job.chunks.popleft()
+            if server_job.chunks:
+                self._rotation.append(server_job)
+            task = asyncio.ensure_future(self._run_chunk(server_job, chunk_index, hands))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run_chunk(self, server_job, chunk_index, hands):
+        """Plays one chunk on the worker pool and records its result.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        try:
+            self._pool.apply_async(
+                play_chunk, (server_job.key, server_job.data, chunk_index, hands),
+                callback=lambda stats: loop.call_soon_threadsafe(future.set_result, stats),
+                error_callback=lambda error: loop.call_soon_threadsafe(future.set_exception, error))
+            stats = await future
+        except Exception as error:
+            server_job.finish('failed', repr(error))
+            self._remove(server_job)
+        else:
+            server_job.add_result(chunk_index, stats)
+        finally:
+            self._slots.release()
+
+    def _remove(self, server_job):
+        """Takes a job out of the rotation.
+        """
+        if server_job in self._rotation:
+            self._rotation.remove(server_job)
+
+    async def _handle(self, reader, writer):
+        """Reads one HTTP request and answers it.
+        """
+        try:
+            method, target, _ = (await reader.readline()).decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            await self._route(method, target.split('?')[0].strip('/').split('/'), body, writer)
+        except (ValueError, KeyError, TypeError, AttributeError, asyncio.IncompleteReadError) as error:
+            await self._respond(writer, 400, {'error': repr(error)})
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method, parts, body, writer):
+        """Answers a request.
+
+        Raises:
+            ValueError: If the request is invalid.
+        """
+        if parts[0] != 'jobs' or len(parts) > 3:
+            return await self._respond(writer, 404, {'error': 'Not found.'})
+        if len(parts) == 1:
+            if method == 'POST':
+                request = json.loads(body or b'{}')
+                data = SimulationJob().to_dict()
+                data.update(request.get('job', {}))
+                server_job = self.submit(SimulationJob.from_dict(data), int(request['hands']),
+                                         request.get('chunk_size'))
+                return await self._respond(writer, 201, server_job.get_status())
+            if method == 'GET':
+                return await self._respond(writer, 200, [job.get_status() for job in self._jobs.values()])
+            raise ValueError(f"Invalid method '{method}'.")
+
+        server_job = self._jobs.get(int(parts[1]))
+        if server_job is None:
+            return await self._respond(writer, 404, {'error': f"Job '{parts[1]}' not found."})
+        if len(parts) == 3:
+            if parts[2] != 'progress' or method != 'GET':
+                return await self._respond(writer, 404, {'error': 'Not found.'})
+            return await self._stream(server_job, writer)
+        if method == 'GET':
+            return await self._respond(writer, 200, server_job.get_status(include_stats=True))
+        if method == 'DELETE':
+            return await self._respond(writer, 200, self.cancel(server_job.id).get_status())
+        raise ValueError(f"Invalid method '{method}'.")
+
+    async def _respond(self, writer, status, body):
+        """Writes a JSON response.
+        """
+        data = json.dumps(body).encode('utf-8')
+        writer.write(f'HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n'
+                     f'Content-Length: {len(data)}\r\nConnection: close\r\n\r\n'.encode('latin-1') + data)
+        await writer.drain()
+
+    async def _stream(self, server_job, writer):
+        """Writes a line of JSON with a job's status each time it changes, until the job stops or the client goes.
+        """
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\nConnection: close\r\n\r\n')
+        while True:
+            changed = server_job.get_changed()
+            running = server_job.state == 'running'
+            writer.write(json.dumps(server_job.get_status(include_stats=not running)).encode('utf-8') + b'\n')
+            await writer.drain()
+            if not running:
+                return
+            await changed.wait()
+
+
+def submit_job(host, port, job, hands, chunk_size=None):
+    """Submits a job to a SimulationServer.
+
+    Args:
+        host (str): The server's address
+        port (Int): The server's port
+        job (dict): Any of the fields of SimulationJob.to_dict, the rest take their defaults
+        hands (Int): The number of hands to play
+        chunk_size (Int, optional): The number of hands in each chunk. Defaults to the server's chunk size.
+
+    Returns:
+        dict: The status of the submitted job
+    """
+    connection = http.client.HTTPConnection(host, port)
+    try:
+        connection.request('POST', '/jobs', json.dumps({'job': job, 'hands': hands, 'chunk_size': chunk_size}),
+                           {'Content-Type': 'application/json'})
+        return json.loads(connection.getresponse().read())
+    finally:
+        connection.close()
+
+
+def stream_progress(host, port, job_id):
+    """Follows a job on a SimulationServer.
+
+    Args:
+        host (str): The server's address
+        port (Int): The server's port
+        job_id (Int): The id of the job
+
+    Yields:
+        dict: The status of the job each time it changes, the last with its statistics
+    """
+    connection = http.client.HTTPConnection(host, port)
+    try:
+        connection.request('GET', f'/jobs/{job_id}/progress')
+        response = connection.getresponse()
+        for line in response:
+            yield json.loads(line)
+    finally:
+        connection.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Run simulations on a long lived local server.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve_parser = subparsers.add_parser('serve', help='start the server')
+    serve_parser.add_argument('--host', default='localhost')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--unix', help='listen on this Unix socket instead of a TCP port')
+    serve_parser.add_argument('--processes', type=int, default=multiprocessing.cpu_count())
+    serve_parser.add_argument('--chunk-size', type=int, default=10_000)
+    run_parser = subparsers.add_parser('run', help='submit a job to the server and follow it')
+    run_parser.add_argument('hands', type=int)
+    run_parser.add_argument('--host', default='localhost')
+    run_parser.add_argument('--port', type=int, default=8765)
+    run_parser.add_argument('--decks', type=int, default=8)
+    run_parser.add_argument('--penetration', type=float, default=0.75)
+    run_parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        simulation_server = SimulationServer(args.processes, args.chunk_size)
+        try:
+            asyncio.run(simulation_server.serve(args.host, args.port, args.unix))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            simulation_server.close()
+    else:
+        status = submit_job(args.host, args.port, {'num_decks': args.decks, 'penetration': args.penetration,
+                                                   'seed': args.seed}, args.hands)
+        for status in stream_progress(args.host, args.port, status['id']):
+            print('Hands: %d/%d House edge: %.5f (%s)' % (status['played'], status['hands'], status['house_edge'],
+                                                          status['state']))
@@ -0,0 +1,287 @@
+import copy
+import math
+
+import numpy as np
+
+# flags describing how a hand was played, combined with bitwise or
+BLACKJACK = 1
+DOUBLED = 2
+SPLIT_HAND = 4
+SURRENDERED = 8
+INSURED = 16
+
+
+class SimulationStats:
+    """Represents running statistics over the hands of a simulation. Each hand is folded in as it is played, so the
+    memory used does not grow with the number of hands, and the statistics of separate runs can be merged.
+    """
+
+    def __init__(self):
+        """Initializes an empty SimulationStats object.
+        """
+        self.count = 0
+        self.total_result = 0
+        self.total_wagered = 0
+        self._mean_result = 0.0
+        self._mean_wager = 0.0
+        self._m2_result = 0.0
+        self._m2_wager = 0.0
+        self._co_moment = 0.0
+
+        self.wins = 0
+        self.pushes = 0
+        self.losses = 0
+        self.blackjacks = 0
+        self.doubles = 0
+        self.splits = 0
+        self.surrenders = 0
+        self.insurances = 0
+        self.histogram = {}
+
+        self._cumulative = 0
+        self._peak = 0
+        self._low = 0
+        self.max_drawdown = 0
+
+        # the Profile of an instrumented run, see InstrumentedBlackJackSimulator
+        self.profile = None
+        # the ControlStats of a run with variance reduction, see SimulationJob
+        self.controls = None
+
+    def update(self, result, wager, flags=0):
+        """Folds the result of one hand into the statistics.
+
+        Args:
+            result (Float): The amount won or lost on the hand
+            wager (Float): The total amount wagered on the hand, including doubles and splits
+            flags (Int, optional): BLACKJACK, DOUBLED, SPLIT_HAND, SURRENDERED and INSURED combined for how the hand
+            was played. Defaults to 0.
+        """
+        self.count += 1
+        self.total_result += result
+        self.total_wagered += wager
+        delta_result = result - self._mean_result
+        delta_wager = wager - self._mean_wager
+        self._mean_result += delta_result / self.count
+        self._mean_wager += delta_wager / self.count
+        self._m2_result += delta_result * (result - self._mean_result)
+        self._m2_wager += delta_wager * (wager - self._mean_wager)
+        self._co_moment += delta_result * (wager - self._mean_wager)
+
+        if result > 0:
+            self.wins += 1
+        elif result < 0:
+            self.losses += 1
+        else:
+            self.pushes += 1
+        if flags:
+            if flags & BLACKJACK:
+                self.blackjacks += 1
+            if flags & DOUBLED:
+                self.doubles += 1
+            if flags & SPLIT_HAND:
+                self.splits += 1
+            if flags & SURRENDERED:
+                self.surrenders += 1
+            if flags & INSURED:
+                self.insurances += 1
+        half_units = round(result * 2)
+        self.histogram[half_units] = self.histogram.get(half_units, 0) + 1
+
+        self._cumulative += result
+        if self._cumulative > self._peak:
+            self._peak = self._cumulative
+        elif self._cumulative < self._low:
+            self._low = self._cumulative
+        if self._peak - self._cumulative > self.max_drawdown:
+            self.max_drawdown = self._peak - self._cumulative
+
+    def update_many(self, results, wagers, flags):
+        """Folds the results of many hands, given as NumPy arrays in the order they were played, into the statistics.
+
+        Args:
+            results (ndarray[Float]): The amount won or lost on each hand
+            wagers (ndarray[Float]): The total amount wagered on each hand
+            flags (ndarray[Int]): How each hand was played
+        """
+        batch = SimulationStats()
+        batch.count = len(results)
+        if batch.count == 0:
+            return
+        batch.total_result = float(results.sum())
+        batch.total_wagered = float(wagers.sum())
+        batch._mean_result = batch.total_result / batch.count
+        batch._mean_wager = batch.total_wagered / batch.count
+        result_deviation = results - batch._mean_result
+        wager_deviation = wagers - batch._mean_wager
+        batch._m2_result = float(result_deviation @ result_deviation)
+        batch._m2_wager = float(wager_deviation @ wager_deviation)
+        batch._co_moment = float(result_deviation @ wager_deviation)
+
+        batch.wins = int((results > 0).sum())
+        batch.losses = int((results < 0).sum())
+        batch.pushes = batch.count - batch.wins - batch.losses
+        batch.blackjacks = int(((flags & BLACKJACK) != 0).sum())
+        batch.doubles = int(((flags & DOUBLED) != 0).sum())
+        batch.splits = int(((flags & SPLIT_HAND) != 0).sum())
+        batch.surrenders = int(((flags & SURRENDERED) != 0).sum())
+        batch.insurances = int(((flags & INSURED) != 0).sum())
+        half_units, counts = np.unique(np.rint(results * 2).astype(np.int64), return_counts=True)
+        batch.histogram = dict(zip(half_units.tolist(), counts.tolist()))
+
+        cumulative = np.cumsum(results)
+        peak = np.maximum.accumulate(np.maximum(cumulative, 0))
+        batch._cumulative = float(cumulative[-1])
+        batch._peak = float(peak[-1])
+        batch._low = float(min(cumulative.min(), 0))
+        batch.max_drawdown = float((peak - cumulative).max())
+        self.merge(batch)
+
+    def merge(self, other):
+        """Merges the statistics of another run into these statistics, as if its hands were played after these.
+
+        Args:
+            other (SimulationStats): The statistics to merge in
+
+        Returns:
+            SimulationStats: These statistics
+        """
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta_result = other._mean_result - self._mean_result
+        delta_wager = other._mean_wager - self._mean_wager
+        weight = self.count * other.count / count
+        self._m2_result += other._m2_result + delta_result * delta_result * weight
+        self._m2_wager += other._m2_wager + delta_wager * delta_wager * weight
+        self._co_moment += other._co_moment + delta_result * delta_wager * weight
+        self._mean_result += delta_result * other.count / count
+        self._mean_wager += delta_wager * other.count / count
+        self.count = count
+        self.total_result += other.total_result
+        self.total_wagered += other.total_wagered
+
+        self.wins += other.wins
+        self.pushes += other.pushes
+        self.losses += other.losses
+        self.blackjacks += other.blackjacks
+        self.doubles += other.doubles
+        self.splits += other.splits
+        self.surrenders += other.surrenders
+        self.insurances += other.insurances
+        for half_units, hands in other.histogram.items():
+            self.histogram[half_units] = self.histogram.get(half_units, 0) + hands
+
+        self.max_drawdown = max(self.max_drawdown, other.max_drawdown, self._peak - self._cumulative - other._low)
+        self._peak = max(self._peak, self._cumulative + other._peak)
+        self._low = min(self._low, self._cumulative + other._low)
+        self._cumulative += other._cumulative
+
+        if other.profile is not None:
+            if self.profile is None:
+                self.profile = type(other.profile)()
+            self.profile.merge(other.profile)
+        if other.controls is not None:
+            if self.controls is None:
+                self.controls = copy.deepcopy(other.controls)
+            else:
+                self.controls.merge(other.controls)
+        return self
+
+    def to_dict(self):
+        """Returns the statistics as a dict of plain values, so they can be sent as JSON.
+
+        Returns:
+            dict: The statistics
+        """
+        data = dict(self.__dict__)
+        data['histogram'] = sorted(self.histogram.items())
+        if self.profile is not None:
+            data['profile'] = self.profile.to_dict()
+        if self.controls is not None:
+            data['controls'] = self.controls.to_dict()
+        return data
+
+    @staticmethod
+    def from_dict(data):
+        """Rebuilds statistics from a dict returned by to_dict.
+
+        Args:
+            data (dict): The statistics
+
+        Returns:
+            SimulationStats: The statistics
+        """
+        stats = SimulationStats()
+        stats.__dict__.update(data)
+        stats.histogram = {half_units: hands for half_units, hands in data['histogram']}
+        if data.get('profile') is not None:
+            # imported here as the instrumentation module builds on the simulator, which imports this module
+            from instrumentation import Profile
+            stats.profile = Profile.from_dict(data['profile'])
+        if data.get('controls') is not None:
+            from variancereduction import ControlStats
+            stats.controls = ControlStats.from_dict(data['controls'])
+        return stats
+
+    def get_mean(self):
+        """Returns the mean result per hand.
+
+        Returns:
+            Float: The mean result per hand
+        """
+        return self._mean_result
+
+    def get_variance(self):
+        """Returns the sample variance of the result per hand.
+
+        Returns:
+            Float: The variance of the result per hand
+        """
+        if self.count < 2:
+            return 0.0
+        return self._m2_result / (self.count - 1)
+
+    def get_house_edge(self):
+        """Returns the player's result as a fraction of the total amount wagered, which is negative when the house has
+        the edge.
+
+        Returns:
+            Float: The edge
+        """
+        if self.total_wagered == 0:
+            return 0.0
+        return self.total_result / self.total_wagered
+
+    def get_confidence_interval(self, z=1.96):
+        """Returns a confidence interval for the edge. The edge is a ratio of the total result to the total wagered, so
+        its standard error is estimated from the variance of result - edge * wager.
+
+        Args:
+            z (Float, optional): The number of standard errors on either side. Defaults to 1.96, for 95%.
+
+        Returns:
+            (Float, Float): The lower and upper bounds of the interval
+        """
+        edge = self.get_house_edge()
+        return edge - z * self.get_standard_error(), edge + z * self.get_standard_error()
+
+    def get_standard_error(self):
+        """Returns the standard error of the edge.
+
+        Returns:
+            Float: The standard error of the edge
+        """
+        if self.count < 2 or self._mean_wager == 0:
+            return math.inf
+        edge = self.get_house_edge()
+        variance = (self._m2_result - 2 * edge * self._co_moment + edge * edge * self._m2_wager) / (self.count - 1)
+        return math.sqrt(max(variance, 0.0) / self.count) / self._mean_wager
+
+    def get_histogram(self):
+        """Returns the number of hands with each result, binned to the nearest half bet.
+
+        Returns:
+            dict(float: int): The number of hands for each result
+        """
+        return {half_units / 2: hands for half_units, hands in sorted(self.histogram.items())}
@@ -0,0 +1,141 @@
+import numpy as np
+
+from betspread import BetSpread
+
+
+class SpreadOptimizer:
+    """Represents an optimizer that chooses bet spreads from a TrueCountTable without playing any more hands. The bet
+    at each true count scales that count's unit outcomes, so the win rate and variance of any spread follow directly
+    from the table, and many spreads can be evaluated at once as the rows of an array.
+    """
+
+    def __init__(self, table):
+        """Initializes a SpreadOptimizer object.
+
+        Args:
+            table (TrueCountTable): The outcomes by true count to optimize against
+        """
+        self._true_counts = table.get_true_counts()
+        frequencies = np.array(table.get_frequencies())
+        self._means = np.array(table.get_means())
+        second_moments = np.array(table.get_variances()) + self._means * self._means
+        self._weighted_means = frequencies * self._means
+        self._weighted_second_moments = frequencies * second_moments
+        self._weighted_wagers = frequencies * np.array(table.get_mean_wagers())
+
+    def evaluate(self, bets):
+        """Evaluates spreads, given as arrays of the bet at each true count of the table.
+
+        Args:
+            bets (ndarray[Float]): The bets, with the table's true counts along the last axis
+
+        Returns:
+            (ndarray[Float], ndarray[Float], ndarray[Float]): The win rate per hand, the variance per hand and the edge
+            of each spread
+        """
+        bets = np.asarray(bets, dtype=np.float64)
+        win_rate = bets @ self._weighted_means
+        variance = (bets * bets) @ self._weighted_second_moments - win_rate * win_rate
+        edge = win_rate / (bets @ self._weighted_wagers)
+        return win_rate, variance, edge
+
+    def get_risk_of_ruin(self, bets, bankroll):
+        """Returns the risk of ruin of spreads, using the diffusion approximation exp(-2 * win rate * bankroll /
+        variance). A spread without a positive win rate is always ruined.
+
+        Args:
+            bets (ndarray[Float]): The bets, with the table's true counts along the last axis
+            bankroll (Float): The bankroll, in the same units as the bets
+
+        Returns:
+            ndarray[Float]: The risk of ruin of each spread
+        """
+        win_rate, variance, _ = self.evaluate(bets)
+        positive = win_rate > 0
+        exponent = -2 * np.where(positive, win_rate, 0) * bankroll / np.where(variance > 0, variance, 1)
+        return np.where(positive, np.exp(exponent), 1.0)
+
+    def maximize_win_rate(self, max_bet, spread_ratio, min_bet=1):
+        """Finds the spread with the highest win rate. Spreads only ever raise the bet as the count rises, so the
+        candidates jump from the smallest bet to the largest allowed at each true count in turn, or never raise it,
+        which is best when no true count has a positive mean. Rarely seen true counts carry little weight, so a noisy
+        mean at one of them cannot move the result far.
+
+        Args:
+            max_bet (Int): The largest bet allowed
+            spread_ratio (Float): The largest ratio allowed between the highest and lowest bets
+            min_bet (Int, optional): The smallest bet allowed. Defaults to 1.
+
+        Returns:
+            dict(int: int): The bet spread, see BetSpread
+        """
+        high_bet = self._get_high_bet(max_bet, spread_ratio, min_bet)
+        thresholds = np.arange(len(self._true_counts))
+        bets = np.where(thresholds[None, :] >= thresholds[:, None], high_bet, min_bet)
+        bets = np.vstack([bets, np.full(len(thresholds), min_bet)])
+        win_rate, _, _ = self.evaluate(bets)
+        return self.to_bet_spread(bets[np.argmax(win_rate)])
+
+    def minimize_risk_of_ruin(self, bankroll, max_bet, spread_ratio, min_bet=1, steps=200):
+        """Finds the spread with the lowest risk of ruin. The candidates are ramps that start raising the bet at one
+        true count and add the same amount at each count above it, rounded to whole bets and capped at the largest bet
+        allowed, for every starting count and a range of slopes, and are evaluated together.
+
+        Args:
+            bankroll (Float): The bankroll, in the same units as the bets
+            max_bet (Int): The largest bet allowed
+            spread_ratio (Float): The largest ratio allowed between the highest and lowest bets
+            min_bet (Int, optional): The smallest bet allowed. Defaults to 1.
+            steps (Int, optional): The number of slopes to try from each starting count. Defaults to 200.
+
+        Returns:
+            dict(int: int): The bet spread, see BetSpread
+        """
+        high_bet = self._get_high_bet(max_bet, spread_ratio, min_bet)
+        positions = np.arange(len(self._true_counts))
+        slopes = np.geomspace(min_bet / 4, high_bet - min_bet + 1, steps)
+        # candidates indexed by starting count, slope and true count
+        above = np.maximum(positions[None, :] - positions[:, None] + 1, 0)
+        bets = np.clip(np.rint(min_bet + slopes[None, :, None] * above[:, None, :]), min_bet, high_bet)
+        bets = bets.reshape(-1, len(positions))
+        return self.to_bet_spread(bets[np.argmin(self.get_risk_of_ruin(bets, bankroll))])
+
+    def to_bet_spread(self, bets):
+        """Converts an array of the bet at each true count of the table into a bet spread, keeping only the true counts
+        at which the bet changes.
+
+        Args:
+            bets (ndarray[Float]): The bet at each true count
+
+        Returns:
+            dict(int: int): The bet spread, see BetSpread
+        """
+        spread = {}
+        previous = None
+        for true_count, bet in zip(self._true_counts, bets):
+            if bet != previous:
+                spread[true_count] = int(bet)
+                previous = bet
+        return spread
+
+    def to_bets(self, bet_spread):
+        """Converts a bet spread into an array of the bet at each true count of the table, so it can be evaluated.
+
+        Args:
+            bet_spread (dict(int: int)): The bet spread, see BetSpread
+
+        Returns:
+            ndarray[Float]: The bet at each true count
+        """
+        spread = BetSpread(bet_spread)
+        return np.array([spread.get_bet(true_count) for true_count in self._true_counts], dtype=np.float64)
+
+    def _get_high_bet(self, max_bet, spread_ratio, min_bet):
+        """Returns the highest bet allowed by both the max bet and the spread ratio.
+
+        Raises:
+            ValueError: If the min bet is above the max bet.
+        """
+        if min_bet > max_bet:
+            raise ValueError(f"The min bet {min_bet} is above the max bet {max_bet}.")
+        return min(max_bet, int(min_bet * spread_ratio))
@@ -0,0 +1,296 @@
+import argparse
+
+from rules import Rules
+
+# the dealer upcards in the order of the columns of a strategy file, and the label of each card
+UPCARDS = [2, 3, 4, 5, 6, 7, 8, 9, 10, 1]
+LABELS = {1: 'A', 2: '2', 3: '3', 4: '4', 5: '5', 6: '6', 7: '7', 8: '8', 9: '9', 10: 'T'}
+
+# the rows of each table, hard 4 and soft 12 included for pairs that cannot be split again
+HARD_ROWS = range(20, 3, -1)
+SOFT_ROWS = range(20, 11, -1)
+PAIR_ROWS = [1, 10, 9, 8, 7, 6, 5, 4, 3, 2]
+
+# hand states as (total, soft), in an order where hitting only ever moves to a later state
+STATES = [(total, False) for total in range(4, 12)] + [(total, True) for total in range(12, 22)] + \
+    [(total, False) for total in range(12, 22)]
+
+# dealer outcomes are kept as probabilities of finishing on 17, 18, 19, 20, 21, busting and blackjack, in that order
+_BUST = 5
+_BLACKJACK = 6
+# stands in for an unlimited number of resplits, as the chance of needing more is negligible
+_MAX_RESPLITS = 40
+
+
+class StrategyGenerator:
+    """Represents a generator of basic strategy tables for a number of decks and a set of rules. A table gives one
+    action for each total against each upcard, so the expected values are worked out per total: every card the player
+    or dealer draws is drawn from the shoe with the upcard removed, and the expected value of each hand state is found
+    by recursion over the states hitting can reach, memoized as each state is only reached from lower ones.
+
+    The simulator hits when a table says to double or surrender a hand that no longer can, so a cell's action is the
+    one with the best expected value over every hand that reaches it, weighing two card hands against hands that got
+    there by hitting by how likely each is to be dealt. Hands from splits are played as well as the rules allow but
+    are not counted in those weights.
+    """
+
+    def __init__(self, num_decks, rules=None):
+        """Initializes a StrategyGenerator object.
+
+        Args:
+            num_decks (Int): The number of decks in the shoe
+            rules (Rules, optional): The rules of the game. Defaults to the simulator's default rules.
+        """
+        self._num_decks = num_decks
+        self._rules = Rules() if rules is None else rules
+
+    def generate(self):
+        """Generates the basic strategy table.
+
+        Returns:
+            dict: The strategy table, with 'hard', 'soft' and 'pairs' tables keyed by (dealer card, player hand)
+            strings, the form produced by parse_strategy_table
+        """
+        strategy_table = {'hard': {}, 'soft': {}, 'pairs': {}}
+        for upcard in UPCARDS:
+            label = LABELS[upcard]
+            hard, soft, pairs = self._generate_upcard(upcard)
+            for total in HARD_ROWS:
+                strategy_table['hard'][(label, str(total))] = hard[total]
+            for total in SOFT_ROWS:
+                strategy_table['soft'][(label, str(total))] = soft[total]
+            for card in PAIR_ROWS:
+                strategy_table['pairs'][(label, LABELS[card] * 2)] = pairs[card]
+        return strategy_table
+
+    def _generate_upcard(self, upcard):
+        """Chooses the actions of the hard, soft and pairs tables against one upcard.
+
+        Returns:
+            (dict(int: str), dict(int: str), dict(int: str)): The action for each hard total, soft total and pair card
+        """
+        probabilities = self._get_probabilities(upcard)
+        outcomes = self._get_dealer_outcomes(upcard, probabilities)
+        stand = self._get_stand_values(outcomes)
+        surrender = -0.5 * (1 - outcomes[_BLACKJACK]) - outcomes[_BLACKJACK]
+
+        # the value of standing, hitting and doubling each state, then playing on as well as possible after a hit
+        hit = {}
+        double = {}
+        best = {}
+        for state in reversed(STATES):
+            total, soft = state
+            if total == 21:
+                best[state] = stand[21]
+                continue
+            hit[state] = 0.0
+            double[state] = 0.0
+            for card in range(1, 11):
+                next_total, next_soft = _hit(total, soft, card)
+                if next_total > 21:
+                    hit[state] -= probabilities[card]
+                    double[state] -= 2 * probabilities[card]
+                else:
+                    hit[state] += probabilities[card] * best[(next_total, next_soft)]
+                    double[state] += 2 * probabilities[card] * stand[next_total]
+            best[state] = max(stand[total], hit[state])
+
+        def get_two_card_values(state):
+            values = {'S': stand[state[0]], 'H': hit[state], 'D': double[state]}
+            if self._rules.late_surrender:
+                values['R'] = surrender
+            return values
+
+        # the chance of being dealt each two card state, and each pair
+        dealt = dict.fromkeys(STATES, 0.0)
+        dealt_pairs = dict.fromkeys(range(1, 11), 0.0)
+        for first in range(1, 11):
+            for second in range(1, 11):
+                probability = probabilities[first] * probabilities[second]
+                if first == second:
+                    dealt_pairs[first] += probability
+                elif first + second != 11 or (first != 1 and second != 1):
+                    dealt[_two_card_state(first, second)] += probability
+
+        pairs = {}
+        # the chance of reaching each state after hitting, starting with pairs that are hit rather than split
+        reached = dict.fromkeys(STATES, 0.0)
+        leaving = dict.fromkeys(STATES, 0.0)
+        for card in range(1, 11):
+            state = _two_card_state(card, card)
+            values = get_two_card_values(state)
+            split = self._get_split_value(card, probabilities, stand, hit, double)
+            if split is not None:
+                values['P'] = split
+            pairs[card] = _best_action(values)
+            if pairs[card] == 'H':
+                leaving[state] += dealt_pairs[card]
+
+        hard = {}
+        soft = {}
+        for state in STATES:
+            total, is_soft = state
+            if total == 21:
+                continue
+            values = get_two_card_values(state)
+            if dealt[state] + reached[state] > 0:
+                # a hand with more than two cards hits when the table says to double or surrender
+                more_cards = {action: stand[total] if action == 'S' else hit[state] for action in values}
+                values = {action: dealt[state] * value + reached[state] * more_cards[action]
+                          for action, value in values.items()}
+            action = _best_action(values)
+            (soft if is_soft else hard)[total] = action
+            leaving[state] += (dealt[state] if action == 'H' else 0.0) + (reached[state] if action != 'S' else 0.0)
+            for card in range(1, 11):
+                next_state = _hit(total, is_soft, card)
+                if next_state[0] <= 21:
+                    reached[next_state] += leaving[state] * probabilities[card]
+        return hard, soft, pairs
+
+    def _get_split_value(self, card, probabilities, stand, hit, double):
+        """Returns the value of splitting a pair, resplitting whenever it is worth it and the rules allow. Each resplit
+        is allowed as many further hands as the one it came from, rather than sharing them with the other hands of the
+        split.
+
+        Returns:
+            Float: The value of splitting, or None if the rules do not allow it
+        """
+        max_hands = self._rules.max_hands
+        if max_hands is not None and max_hands < 2:
+            return None
+        resplits = _MAX_RESPLITS if max_hands is None else max_hands - 2
+        if card == 1 and not self._rules.resplit_aces:
+            resplits = 0
+
+        # the value of each two card hand made by drawing to one of the split cards
+        hands = {}
+        for drawn in range(1, 11):
+            state = _two_card_state(card, drawn)
+            if state[0] == 21 or (card == 1 and not self._rules.hit_split_aces):
+                hands[drawn] = stand[state[0]]
+            elif self._rules.double_after_split:
+                hands[drawn] = max(stand[state[0]], hit[state], double[state])
+            else:
+                hands[drawn] = max(stand[state[0]], hit[state])
+        other = sum(probabilities[drawn] * hands[drawn] for drawn in range(1, 11) if drawn != card)
+        value = other + probabilities[card] * hands[card]
+        for _ in range(resplits):
+            value = other + probabilities[card] * max(hands[card], 2 * value)
+        return 2 * value
+
+    def _get_probabilities(self, upcard):
+        """Returns the probability of drawing each card from the shoe once the upcard has been dealt.
+
+        Returns:
+            List[Float]: The probability of each card, indexed by card with 1 for an ace and index 0 unused
+        """
+        composition = [0] + [4 * self._num_decks] * 9 + [16 * self._num_decks]
+        composition[upcard] -= 1
+        total = sum(composition)
+        return [count / total for count in composition]
+
+    def _get_dealer_outcomes(self, upcard, probabilities):
+        """Returns the probabilities of the dealer's outcomes for an upcard. When the dealer peeks, the player only
+        plays on when the dealer does not have blackjack, so the outcomes are given no dealer blackjack.
+
+        Returns:
+            List[Float]: The probabilities of 17 to 21, busting and blackjack
+        """
+        outcomes = [0.0] * 7
+        stack = [(11, True, 1.0, True) if upcard == 1 else (upcard, False, 1.0, True)]
+        while stack:
+            total, soft, probability, hole = stack.pop()
+            for card in range(1, 11):
+                next_total, next_soft = _hit(total, soft, card)
+                next_probability = probability * probabilities[card]
+                if hole and next_total == 21:
+                    outcomes[_BLACKJACK] += next_probability
+                elif next_total > 21:
+                    outcomes[_BUST] += next_probability
+                elif next_total > 17 or (next_total == 17 and not (next_soft and self._rules.dealer_hits_soft_17)):
+                    outcomes[next_total - 17] += next_probability
+                else:
+                    stack.append((next_total, next_soft, next_probability, False))
+        if self._rules.dealer_peeks:
+            no_blackjack = 1 - outcomes[_BLACKJACK]
+            outcomes = [outcome / no_blackjack for outcome in outcomes[:_BLACKJACK]] + [0.0]
+        return outcomes
+
+    def _get_stand_values(self, outcomes):
+        """Returns the value of standing on each total from 0 to 21.
+
+        Returns:
+            List[Float]: The value of standing on each total
+        """
+        value = outcomes[_BUST] - sum(outcomes[:_BUST]) - outcomes[_BLACKJACK]
+        values = [value] * 17
+        for dealer_total in range(17, 22):
+            # moving up past a dealer total turns its losses into pushes, then its pushes into wins
+            value += outcomes[dealer_total - 17]
+            values.append(value)
+            value += outcomes[dealer_total - 17]
+        return values
+
+
+def write_strategy_table(strategy_table, filename):
+    """Writes a strategy table to a csv file in the files directory, in the format parse_strategy_table reads.
+
+    Args:
+        strategy_table (dict): The strategy table, with 'hard', 'soft' and 'pairs' tables keyed by (dealer card, player
+        hand) strings
+        filename (str): The name of the file to write
+    """
+    header = ','.join(['_'] + [LABELS[upcard] for upcard in UPCARDS])
+    with open('files/' + filename, 'w') as file:
+        for name, rows in (('hard', [str(total) for total in HARD_ROWS]), ('soft', [str(total) for total in SOFT_ROWS]),
+                           ('pairs', [LABELS[card] * 2 for card in PAIR_ROWS])):
+            file.write(f'---{name.upper()}\n{header}\n')
+            for row in rows:
+                file.write(','.join([row] + [strategy_table[name][(LABELS[upcard], row)] for upcard in UPCARDS]) + '\n')
+        file.write('---')
+
+
+def _hit(total, soft, card):
+    """Returns the state after drawing a card.
+    """
+    total += card
+    if soft and total > 21:
+        return total - 10, False
+    if not soft and card == 1 and total <= 11:
+        return total + 10, True
+    return total, soft
+
+
+def _two_card_state(first, second):
+    """Returns the state of a two card hand.
+    """
+    if first == 1 or second == 1:
+        return first + second + 10, True
+    return first + second, False
+
+
+def _best_action(values):
+    """Returns the action with the highest value, the first listed on a tie.
+    """
+    return max(values, key=values.get)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Generate a basic strategy table for a set of rules.')
+    parser.add_argument('filename', help='the file to write in the files directory')
+    parser.add_argument('--decks', type=int, default=8)
+    parser.add_argument('--s17', action='store_true', help='the dealer stands on soft 17')
+    parser.add_argument('--blackjack-payout', type=float, default=1.5)
+    parser.add_argument('--no-das', action='store_true', help='no doubling after a split')
+    parser.add_argument('--max-hands', type=int, default=None)
+    parser.add_argument('--no-resplit-aces', action='store_true')
+    parser.add_argument('--no-hit-split-aces', action='store_true')
+    parser.add_argument('--surrender', action='store_true', help='late surrender')
+    parser.add_argument('--no-peek', action='store_true', help='the dealer does not check for blackjack')
+    args = parser.parse_args()
+
+    rules = Rules(dealer_hits_soft_17=not args.s17, blackjack_payout=args.blackjack_payout,
+                  double_after_split=not args.no_das, max_hands=args.max_hands, resplit_aces=not args.no_resplit_aces,
+                  hit_split_aces=not args.no_hit_split_aces, late_surrender=args.surrender,
+                  dealer_peeks=not args.no_peek)
+    write_strategy_table(StrategyGenerator(args.decks, rules).generate(), args.filename)
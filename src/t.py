@@ -1,12 +1,12 @@
 import matplotlib.pyplot as plt
 
-def simulate_blackjack(num_hands):
+def simulate_blackjack(num_hands, redraw_every=10):
     bank_values = [100]  # Starting bank value
     plt.ion()  # Enable interactive mode for live updates
 
     # Create the initial plot
     fig, ax = plt.subplots()
-    line, = ax.plot(bank_values, marker='o')
+    line, = ax.plot(bank_values)
     ax.set_xlabel('Number of Hands')
     ax.set_ylabel('Bank Value')
 
@@ -19,14 +19,15 @@ def simulate_blackjack(num_hands):
         bank_value = bank_values[-1] + bank_value_change
         bank_values.append(bank_value)
 
-        # Update the plot with the new data
-        line.set_data(range(hand + 1), bank_values)
-        ax.relim()
-        ax.autoscale_view()
-        fig.canvas.draw()
+        # Update the plot with the new data, redrawing the canvas only every few hands
+        if hand % redraw_every == 0 or hand == num_hands:
+            line.set_data(range(hand + 1), bank_values)
+            ax.relim()
+            ax.autoscale_view()
+            fig.canvas.draw_idle()
 
-        # Pause to allow for live updates
-        plt.pause(0.0001)
+            # Pause to allow for live updates
+            plt.pause(0.0001)
 
     # Keep the plot displayed after the simulation is complete
     plt.ioff()
@@ -0,0 +1,153 @@
+from blackjack import BlackJackSimulator
+from simplifiedshoe import SimplifiedShoe
+from rules import Rules
+from simulationstats import SimulationStats
+
+MAX_SEATS = 7
+
+
+class Seat:
+    """Represents one player's seat at a BlackJackTable, with their own strategy, bet spread and bankroll.
+    """
+
+    def __init__(self, bet_spread, strategy_table, bankroll=0, deviations=None, insurance_index=None):
+        """Initializes a Seat object.
+
+        Args:
+            bet_spread (dict(int: int)): The bet spread, see BetSpread
+            strategy_table (dict or CompiledStrategy): The strategy table
+            bankroll (Int, optional): The starting bankroll. Defaults to 0.
+            deviations (List or CompiledDeviations, optional): Strategy deviations by true count. Defaults to None.
+            insurance_index (Int, optional): Take insurance at true counts at or above this, if the rules offer it,
+            or never if None. Defaults to None.
+        """
+        self.bet_spread = bet_spread
+        self.strategy_table = strategy_table
+        self.bankroll = bankroll
+        self.deviations = deviations
+        self.insurance_index = insurance_index
+
+
+class BlackJackTable:
+    """Represents a blackjack table of one to seven seats playing from one shoe. Each round the shoe is checked for a
+    shuffle and the true count taken once, the cards are dealt one to each seat in turn, then the dealer's upcard, a
+    second card to each seat and the hole card, the seats play their hands in order and the dealer plays once for all
+    of them. Each seat's hands are played and settled by a BlackJackSimulator of its own sharing the table's shoe, so a
+    seat plays exactly as a simulator on its own would.
+    """
+
+    def __init__(self, num_decks, penetration, seats, rng=None, shoe=None, rules=None):
+        """Initializes a BlackJackTable object.
+
+        Args:
+            num_decks (Int): The number of decks in the shoe
+            penetration (Float): The penetration of the shoe
+            seats (List[Seat]): The seats, in the order they are dealt to
+            rng (random.Random, optional): The random number generator for the shuffles. Defaults to the random
+            module.
+            shoe (SimplifiedShoe, optional): The shoe to deal from. Defaults to a new SimplifiedShoe.
+            rules (Rules, optional): The rules of the game. Defaults to the default Rules.
+
+        Raises:
+            ValueError: If there are not between one and seven seats.
+        """
+        if not 1 <= len(seats) <= MAX_SEATS:
+            raise ValueError(f"Invalid number of seats {len(seats)}, expected between 1 and {MAX_SEATS}.")
+        if shoe is None:
+            shoe = SimplifiedShoe(num_decks, penetration, rng=rng)
+        if rules is None:
+            rules = Rules()
+        self._shoe = shoe
+        self._rules = rules
+        self._players = [BlackJackSimulator(num_decks, penetration, seat.bet_spread, seat.strategy_table,
+                                            seat.bankroll, shoe=shoe, deviations=seat.deviations, rules=rules,
+                                            insurance_index=seat.insurance_index)
+                         for seat in seats]
+        self._results = [0] * len(seats)
+        self.stats = [SimulationStats() for _ in seats]
+
+    def play_round(self):
+        """Plays one round, every seat playing one hand against the same dealer hand.
+
+        Returns:
+            List[Float]: The amount won or lost by each seat
+        """
+        shoe = self._shoe
+        players = self._players
+        results = self._results
+        shoe.start_hand()
+        true_count = shoe.get_true_count()
+        firsts = [shoe.draw() for _ in players]
+        dealer_upcard = shoe.draw()
+        seconds = [shoe.draw() for _ in players]
+        dealer_hole = shoe.draw_face_down()
+
+        dealer_total = dealer_upcard + dealer_hole
+        if (dealer_upcard == 1 or dealer_hole == 1) and dealer_total < 12:
+            dealer_total += 10
+        dealer_blackjack = dealer_total == 21
+        settle_blackjack = dealer_blackjack and self._rules.dealer_peeks
+        # every seat decides on insurance at the count before anyone plays
+        insurance_count = shoe.get_true_count() if dealer_upcard == 1 and self._rules.insurance else None
+
+        # the hands of each seat still waiting on the dealer, as the seat, its bet and its number of hands
+        waiting = []
+        for seat, player in enumerate(players):
+            player_bet = player._bet_spread.get_bet(true_count)
+            player._hand_bet = player_bet
+            player_first = firsts[seat]
+            player_second = seconds[seat]
+            player_total = player_first + player_second
+            if (player_first == 1 or player_second == 1) and player_total < 12:
+                player_total += 10
+
+            if player_total == 21 or settle_blackjack:
+                results[seat] = player._settle_blackjack(player_bet, player_total, dealer_total)
+            else:
+                hard, soft, pairs = player._get_rows(dealer_upcard)
+                waiting.append((seat, player_bet, player._play_player_hands(hard, soft, pairs, player_first,
+                                                                            player_second, shoe)))
+
+        if waiting:
+            dealer_total = players[0]._play_dealer_hand(dealer_upcard, dealer_hole, shoe)
+        shoe.card_revealed(dealer_hole)
+        for seat, player_bet, num_hands in waiting:
+            results[seat] = players[seat]._settle(player_bet, num_hands, dealer_total, dealer_blackjack)
+        if insurance_count is not None:
+            for seat, player in enumerate(players):
+                if player._insurance_index is not None and insurance_count >= player._insurance_index:
+                    results[seat] += player._insure(player._hand_bet, dealer_blackjack)
+        return results
+
+    def run(self, rounds):
+        """Plays a number of rounds, recording each seat's hands in its statistics.
+
+        Args:
+            rounds (Int): The number of rounds to play
+
+        Returns:
+            List[SimulationStats]: The statistics of each seat
+        """
+        players = self._players
+        stats = self.stats
+        for _ in range(rounds):
+            results = self.play_round()
+            for seat, player in enumerate(players):
+                stats[seat].update(results[seat], player._hand_wager, player._hand_flags)
+        return stats
+
+    def get_bankrolls(self):
+        """Returns the bankroll of each seat.
+
+        Returns:
+            List[Float]: The bankrolls
+        """
+        return [player._player_cash for player in self._players]
+
+    def get_spending(self):
+        """Returns the total amount wagered by each seat.
+
+        Returns:
+            List[Float]: The amounts wagered
+        """
+        return [player._player_spending for player in self._players]
@@ -0,0 +1,199 @@
+from blackjack import BlackJackSimulator
+from simplifiedshoe import SimplifiedShoe
+
+
+class TrueCountTable:
+    """Represents the outcomes of hands played at a flat bet of 1, grouped by the true count before the hand. True
+    counts outside the table's range are grouped with the nearest end, the same way BetSpread treats them.
+    """
+
+    def __init__(self, min_count=-10, max_count=10):
+        """Initializes an empty TrueCountTable object.
+
+        Args:
+            min_count (Int, optional): The lowest true count with its own bucket. Defaults to -10.
+            max_count (Int, optional): The highest true count with its own bucket. Defaults to 10.
+        """
+        self.min_count = min_count
+        self.max_count = max_count
+        buckets = max_count - min_count + 1
+        self._hands = [0] * buckets
+        self._total_result = [0.0] * buckets
+        self._total_squared = [0.0] * buckets
+        self._total_wagered = [0.0] * buckets
+        # the number of hands with each unit result, so whole distributions can be resampled, not just their moments
+        self._histograms = [{} for _ in range(buckets)]
+
+    def update(self, true_count, result, wager):
+        """Adds the outcome of one hand to its true count's bucket.
+
+        Args:
+            true_count (Int): The true count before the hand
+            result (Float): The unit result of the hand
+            wager (Float): The total amount wagered on the hand, including doubles and splits
+        """
+        bucket = min(max(true_count, self.min_count), self.max_count) - self.min_count
+        self._hands[bucket] += 1
+        self._total_result[bucket] += result
+        self._total_squared[bucket] += result * result
+        self._total_wagered[bucket] += wager
+        histogram = self._histograms[bucket]
+        histogram[result] = histogram.get(result, 0) + 1
+
+    def merge(self, other):
+        """Adds the outcomes of another table with the same range to this table.
+
+        Args:
+            other (TrueCountTable): The table to merge in
+
+        Returns:
+            TrueCountTable: This table
+
+        Raises:
+            ValueError: If the tables cover different true counts.
+        """
+        if (other.min_count, other.max_count) != (self.min_count, self.max_count):
+            raise ValueError(f"Cannot merge a table of true counts {other.min_count} to {other.max_count} into one of "
+                             f"{self.min_count} to {self.max_count}.")
+        for bucket in range(len(self._hands)):
+            self._hands[bucket] += other._hands[bucket]
+            self._total_result[bucket] += other._total_result[bucket]
+            self._total_squared[bucket] += other._total_squared[bucket]
+            self._total_wagered[bucket] += other._total_wagered[bucket]
+            histogram = self._histograms[bucket]
+            for result, hands in other._histograms[bucket].items():
+                histogram[result] = histogram.get(result, 0) + hands
+        return self
+
+    def get_true_counts(self):
+        """Returns the true count of each bucket.
+
+        Returns:
+            List[Int]: The true counts, from lowest to highest
+        """
+        return list(range(self.min_count, self.max_count + 1))
+
+    def get_frequencies(self):
+        """Returns the fraction of hands played at each true count.
+
+        Returns:
+            List[Float]: The frequency of each true count
+        """
+        total = sum(self._hands)
+        return [hands / total if total else 0.0 for hands in self._hands]
+
+    def get_means(self):
+        """Returns the mean unit result at each true count.
+
+        Returns:
+            List[Float]: The mean result of each true count
+        """
+        return [result / hands if hands else 0.0 for result, hands in zip(self._total_result, self._hands)]
+
+    def get_variances(self):
+        """Returns the sample variance of the unit result at each true count.
+
+        Returns:
+            List[Float]: The variance of each true count
+        """
+        variances = []
+        for hands, result, squared in zip(self._hands, self._total_result, self._total_squared):
+            variances.append((squared - result * result / hands) / (hands - 1) if hands > 1 else 0.0)
+        return variances
+
+    def get_mean_wagers(self):
+        """Returns the mean total wagered per unit bet at each true count, which is more than 1 because of doubles and
+        splits.
+
+        Returns:
+            List[Float]: The mean wager of each true count
+        """
+        return [wagered / hands if hands else 0.0 for wagered, hands in zip(self._total_wagered, self._hands)]
+
+    def get_histograms(self):
+        """Returns the number of hands with each unit result at each true count.
+
+        Returns:
+            List[dict(float: int)]: The histogram of each true count
+        """
+        return [dict(histogram) for histogram in self._histograms]
+
+    def save(self, filename):
+        """Writes the table to a csv file, one line per true count, with the histogram of each true count as
+        result:hands pairs separated by spaces.
+
+        Args:
+            filename (str): The file to write
+        """
+        with open(filename, 'w') as file:
+            file.write('true_count,hands,mean,variance,mean_wager,histogram\n')
+            rows = zip(self.get_true_counts(), self._hands, self.get_means(), self.get_variances(),
+                       self.get_mean_wagers(), self._histograms)
+            for true_count, hands, mean, variance, mean_wager, histogram in rows:
+                outcomes = ' '.join(f'{result!r}:{count}' for result, count in sorted(histogram.items()))
+                file.write(f'{true_count},{hands},{mean!r},{variance!r},{mean_wager!r},{outcomes}\n')
+
+    @staticmethod
+    def load(filename):
+        """Reads a table written by save. A file written before histograms were saved loads without them.
+
+        Args:
+            filename (str): The file to read
+
+        Returns:
+            TrueCountTable: The table
+
+        Raises:
+            Exception: If the file cannot be found.
+            ValueError: If the true counts in the file are not consecutive.
+        """
+        try:
+            with open(filename, 'r') as file:
+                rows = [line.strip().split(',') for line in file][1:]
+        except FileNotFoundError:
+            raise Exception(f"File '{filename}' not found.")
+        true_counts = [int(row[0]) for row in rows]
+        if true_counts != list(range(true_counts[0], true_counts[-1] + 1)):
+            raise ValueError(f"The true counts in '{filename}' are not consecutive.")
+
+        table = TrueCountTable(true_counts[0], true_counts[-1])
+        for bucket, row in enumerate(rows):
+            hands = int(row[1])
+            mean = float(row[2])
+            variance = float(row[3])
+            table._hands[bucket] = hands
+            table._total_result[bucket] = mean * hands
+            table._total_squared[bucket] = variance * (hands - 1) + mean * mean * hands if hands else 0.0
+            table._total_wagered[bucket] = float(row[4]) * hands
+            if len(row) > 5 and row[5]:
+                table._histograms[bucket] = {float(result): int(count)
+                                             for result, count in (pair.split(':') for pair in row[5].split())}
+        return table
+
+
+def collect_true_count_table(num_decks, penetration, strategy_table, hands, rng=None, min_count=-10, max_count=10):
+    """Plays hands at a flat bet of 1 and records their outcomes by true count.
+
+    Args:
+        num_decks (Int): The number of decks in the shoe
+        penetration (Float): The penetration of the shoe, represented as a decimal between 0 and 1
+        strategy_table (dict or CompiledStrategy): The strategy table
+        hands (Int): The number of hands to play
+        rng (random.Random, optional): The random number generator for the shuffles. Defaults to the random module.
+        min_count (Int, optional): The lowest true count with its own bucket. Defaults to -10.
+        max_count (Int, optional): The highest true count with its own bucket. Defaults to 10.
+
+    Returns:
+        TrueCountTable: The outcomes by true count
+    """
+    shoe = SimplifiedShoe(num_decks, penetration, rng=rng)
+    sim = BlackJackSimulator(num_decks, penetration, {0: 1}, strategy_table, shoe=shoe)
+    table = TrueCountTable(min_count, max_count)
+    for _ in range(hands):
+        # shuffle before reading the true count, the simulator will then not shuffle again
+        shoe.start_hand()
+        true_count = shoe.get_true_count()
+        result = sim.play_hand()
+        table.update(true_count, result, sim._hand_wager)
+    return table
+
@@ -0,0 +1,283 @@
+import math
+
+import numpy as np
+
+from simulationstats import SimulationStats
+
+# the controls of each hand: whether the dealer's upcard is each of ace to 9 (a ten follows from the others) and
+# whether the player and dealer have blackjack, each less its probability given the cards left in the shoe when the
+# hand is dealt. That probability is exact however the cut card decides which hands get dealt, so every control has
+# an expectation of exactly 0, where the plain indicators do not average their full shoe probabilities. A control
+# with the wrong expectation biases the estimate however many hands are played.
+CONTROLS = ['upcard_%d' % upcard for upcard in range(1, 10)] + ['player_blackjack', 'dealer_blackjack']
+
+
+def get_controls(cards, remaining):
+    """Returns the controls of many hands.
+
+    Args:
+        cards (ndarray[Int]): The first four cards of each hand in the order they were dealt, the player's first
+        card, the dealer's upcard, the player's second card and the dealer's hole card
+        remaining (ndarray[Int]): The number of each card left in the shoe before each hand, indexed by card with 1
+        for an ace and column 0 unused
+
+    Returns:
+        ndarray[Float]: The controls of each hand, in the order of CONTROLS
+    """
+    player_first, upcards, player_second, dealer_hole = cards.T
+    upcard_indicators = upcards[:, np.newaxis] == np.arange(1, 10)
+    player_blackjack = (player_first + player_second == 11) & ((player_first == 1) | (player_second == 1))
+    dealer_blackjack = (upcards + dealer_hole == 11) & ((upcards == 1) | (dealer_hole == 1))
+    indicators = np.column_stack([upcard_indicators, player_blackjack, dealer_blackjack]).astype(np.float64)
+
+    # any two of the cards still to be dealt are an ace and a ten with the same probability
+    total = remaining.sum(axis=1).astype(np.float64)
+    blackjack = 2 * remaining[:, 1] * remaining[:, 10] / (total * (total - 1))
+    probabilities = np.column_stack([remaining[:, 1:10] / total[:, np.newaxis], blackjack, blackjack])
+    return indicators - probabilities
+
+
+class ControlStats:
+    """Represents the sums needed to estimate the edge of a simulation with less variance than its plain average, kept
+    alongside its SimulationStats. The edge is a ratio of the total result to the total wagered, so each estimator
+    works on result - edge * wager, whose variance gives the standard error of the edge.
+
+    The control variate estimate regresses that on the controls, which have an expectation of 0, and takes out the part
+    explained by the controls differing from 0. The stratified estimate weights the average of each dealer upcard by
+    the upcard's probability, averaged over the cards left in the shoe when each hand was dealt, as the cut card
+    changes how often each upcard is dealt from its full shoe probability. Both need the moments summed here, which
+    merge across chunks by addition.
+
+    How much either helps is reported as its speedup. For flat bets it is small, about 1.14 times for the control
+    variates, as the upcard and the blackjacks explain little of the variance of a hand.
+    """
+
+    def __init__(self):
+        """Initializes an empty ControlStats object.
+        """
+        size = len(CONTROLS)
+        self.count = 0
+        self._x = np.zeros(size)
+        self._xx = np.zeros((size, size))
+        self._xy = np.zeros(size)
+        self._xw = np.zeros(size)
+        # the number of hands and the sums of result, wager, result squared, wager squared and result times wager,
+        # for every hand in row 0 and for the hands of each upcard in the others
+        self._moments = np.zeros((11, 6))
+        # the sum over hands of the probability of each upcard given the cards left in the shoe
+        self._upcard_probabilities = np.zeros(11)
+
+    def update_many(self, results, wagers, cards, remaining):
+        """Folds many hands into the sums.
+
+        Args:
+            results (ndarray[Float]): The amount won or lost on each hand
+            wagers (ndarray[Float]): The total amount wagered on each hand
+            cards (ndarray[Int]): The first four cards of each hand in the order they were dealt, the player's first
+            card, the dealer's upcard, the player's second card and the dealer's hole card
+            remaining (ndarray[Int]): The number of each card left in the shoe before each hand, indexed by card with
+            1 for an ace and column 0 unused
+        """
+        if len(results) == 0:
+            return
+        x = get_controls(cards, remaining)
+        upcards = cards[:, 1]
+
+        self.count += len(results)
+        self._x += x.sum(axis=0)
+        self._xx += x.T @ x
+        self._xy += x.T @ results
+        self._xw += x.T @ wagers
+        moments = np.column_stack([np.ones(len(results)), results, wagers, results * results, wagers * wagers,
+                                   results * wagers])
+        self._moments[0] += moments.sum(axis=0)
+        np.add.at(self._moments, upcards, moments)
+        self._upcard_probabilities += (remaining / remaining.sum(axis=1)[:, np.newaxis]).sum(axis=0)
+
+    def merge(self, other):
+        """Merges the sums of another run into these.
+
+        Args:
+            other (ControlStats): The sums to merge in
+
+        Returns:
+            ControlStats: These sums
+        """
+        self.count += other.count
+        self._x += other._x
+        self._xx += other._xx
+        self._xy += other._xy
+        self._xw += other._xw
+        self._moments += other._moments
+        self._upcard_probabilities += other._upcard_probabilities
+        return self
+
+    def to_dict(self):
+        """Returns the sums as a dict of plain values, so they can be sent as JSON.
+
+        Returns:
+            dict: The sums
+        """
+        return {name: value.tolist() if isinstance(value, np.ndarray) else value
+                for name, value in self.__dict__.items()}
+
+    @staticmethod
+    def from_dict(data):
+        """Rebuilds the sums from a dict returned by to_dict.
+
+        Args:
+            data (dict): The sums
+
+        Returns:
+            ControlStats: The sums
+        """
+        stats = ControlStats()
+        for name, value in data.items():
+            setattr(stats, name, np.array(value) if isinstance(value, list) else value)
+        return stats
+
+    def get_naive_estimate(self):
+        """Returns the plain estimate of the edge, the same as SimulationStats gives.
+
+        Returns:
+            (Float, Float): The edge and its standard error
+        """
+        count, total_result, total_wagered = self._moments[0, :3]
+        if count < 2 or total_wagered == 0:
+            return 0.0, math.inf
+        edge = total_result / total_wagered
+        return edge, math.sqrt(_get_variance(self._moments[0], edge) / count) / (total_wagered / count)
+
+    def get_control_means(self):
+        """Returns the sample mean of each control, which should be close to 0.
+
+        Returns:
+            ndarray[Float]: The mean of each control over the hands so far
+        """
+        return self._x / max(self.count, 1)
+
+    def get_control_variate_estimate(self):
+        """Returns the control variate estimate of the edge.
+
+        Returns:
+            (Float, Float): The edge and its standard error
+        """
+        count, total_result, total_wagered = self._moments[0, :3]
+        if count <= len(CONTROLS) + 1:
+            return self.get_naive_estimate()
+        edge = total_result / total_wagered
+        mean_x = self._x / count
+        covariance_x = (self._xx - count * np.outer(mean_x, mean_x)) / (count - 1)
+        covariance_xy = (self._xy - mean_x * total_result) / (count - 1)
+        covariance_xw = (self._xw - mean_x * total_wagered) / (count - 1)
+        # the pseudo inverse copes with a control that has not varied yet, such as an upcard not yet dealt
+        inverse = np.linalg.pinv(covariance_x)
+        mean_result = total_result / count - (inverse @ covariance_xy) @ mean_x
+        mean_wager = total_wagered / count - (inverse @ covariance_xw) @ mean_x
+        covariance_xz = covariance_xy - edge * covariance_xw
+        variance = _get_variance(self._moments[0], edge) - covariance_xz @ inverse @ covariance_xz
+        return mean_result / mean_wager, math.sqrt(max(variance, 0.0) / count) / mean_wager
+
+    def get_stratified_estimate(self):
+        """Returns the estimate of the edge stratified by the dealer's upcard.
+
+        Returns:
+            (Float, Float): The edge and its standard error
+        """
+        strata = self._moments[1:]
+        counts = strata[:, 0]
+        if (counts < 2).any():
+            return self.get_naive_estimate()
+        probabilities = self._upcard_probabilities[1:] / self.count
+        mean_result = probabilities @ (strata[:, 1] / counts)
+        mean_wager = probabilities @ (strata[:, 2] / counts)
+        edge = mean_result / mean_wager
+        variances = np.array([_get_variance(stratum, edge) for stratum in strata])
+        return edge, math.sqrt(probabilities ** 2 @ (variances / counts)) / mean_wager
+
+    def get_estimates(self):
+        """Returns every estimate of the edge with its speedup, the number of times more hands the plain estimate needs
+        for the same standard error.
+
+        Returns:
+            dict(str: (float, float, float)): The edge, its standard error and the speedup of each estimate
+        """
+        naive = self.get_naive_estimate()
+        estimates = {}
+        for name, (edge, standard_error) in (('naive', naive),
+                                             ('control_variates', self.get_control_variate_estimate()),
+                                             ('stratified', self.get_stratified_estimate())):
+            speedup = (naive[1] / standard_error) ** 2 if 0 < standard_error < math.inf else 1.0
+            estimates[name] = (edge, standard_error, speedup)
+        return estimates
+
+    def get_confidence_interval(self, z=1.96):
+        """Returns a confidence interval for the edge from the control variate estimate.
+
+        Args:
+            z (Float, optional): The number of standard errors on either side. Defaults to 1.96, for 95%.
+
+        Returns:
+            (Float, Float): The lower and upper bounds of the interval
+        """
+        edge, standard_error = self.get_control_variate_estimate()
+        return edge - z * standard_error, edge + z * standard_error
+
+    def print_report(self):
+        """Prints every estimate of the edge with its speedup, and the share of the hands the plain estimate needs that
+        each estimate needs for the same standard error.
+        """
+        print('%-18s %10s %10s %8s %8s' % ('Estimate', 'Edge', 'Std err', 'Speedup', 'Hands'))
+        for name, (edge, standard_error, speedup) in self.get_estimates().items():
+            print('%-18s %10.5f %10.5f %7.2fx %7.0f%%' % (name, edge, standard_error, speedup, 100 / speedup))
+
+
+def _get_variance(moments, edge):
+    """Returns the sample variance of result - edge * wager over hands whose moments are summed in the form kept by
+    ControlStats.
+    """
+    count, total_result, total_wagered, result_squares, wager_squares, products = moments
+    total = total_result - edge * total_wagered
+    squares = result_squares - 2 * edge * products + edge * edge * wager_squares
+    return max(squares - total * total / count, 0.0) / (count - 1)
+
+
+def compare_jobs(job_a, job_b, hands, chunk_size=1_000):
+    """Estimates the difference between the edges of two jobs with common random numbers. Both jobs play the same
+    chunks of the same seed, so they deal the same sequence of shoes, and the part of each edge that comes from the
+    luck of the cards mostly cancels in the difference. The difference is estimated from the paired chunks.
+
+    Args:
+        job_a (SimulationJob): The first job
+        job_b (SimulationJob): The second job, with the same seed, decks and penetration
+        hands (Int): The number of hands each job plays
+        chunk_size (Int, optional): The number of hands in each chunk. Defaults to 1,000.
+
+    Returns:
+        (Float, Float, Float): The first job's edge minus the second's, its standard error and the speedup over
+        playing the jobs with independent cards
+
+    Raises:
+        ValueError: If the jobs do not deal the same shoes, or there are fewer than two chunks.
+    """
+    if (job_a.seed, job_a.num_decks, job_a.penetration) != (job_b.seed, job_b.num_decks, job_b.penetration):
+        raise ValueError("Jobs compared with common random numbers need the same seed, decks and penetration.")
+    chunks = [(index, min(chunk_size, hands - start)) for index, start in enumerate(range(0, hands, chunk_size))]
+    if len(chunks) < 2:
+        raise ValueError(f"Comparing jobs needs at least two chunks, not {len(chunks)}.")
+    totals = np.zeros((2, len(chunks), 2))
+    stats = [SimulationStats(), SimulationStats()]
+    for job_index, job in enumerate((job_a, job_b)):
+        for chunk, (chunk_index, chunk_hands) in enumerate(chunks):
+            chunk_stats = job.run_chunk(chunk_index, chunk_hands)
+            totals[job_index, chunk] = chunk_stats.total_result, chunk_stats.total_wagered
+            stats[job_index].merge(chunk_stats)
+
+    # the deviation of each chunk from each job's edge, scaled so their variance gives the variance of the edge
+    edges = np.array([job_stats.get_house_edge() for job_stats in stats])
+    mean_wagers = totals[:, :, 1].sum(axis=1) / hands
+    deviations = (totals[:, :, 0] - edges[:, np.newaxis] * totals[:, :, 1]) / mean_wagers[:, np.newaxis]
+    paired = np.var(deviations[0] - deviations[1], ddof=1)
+    independent = np.var(deviations[0], ddof=1) + np.var(deviations[1], ddof=1)
+    standard_error = math.sqrt(paired * len(chunks)) / hands
+    return edges[0] - edges[1], standard_error, independent / paired if paired > 0 else math.inf
@@ -0,0 +1,85 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from distributed import Coordinator
+from parsestrategy import parse_strategy_table
+from scheduler import SimulationJob
+from simulationstats import SimulationStats
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'src', 'distributed.py')
+
+
+def _start_worker(port):
+    """Starts a worker process for a coordinator on localhost.
+    """
+    return subprocess.Popen([sys.executable, '-u', SCRIPT, 'worker', 'localhost', '--port', str(port)], cwd=ROOT,
+                            stdout=subprocess.PIPE, text=True)
+
+
+def _get_played(worker):
+    """Waits for a worker process to finish and returns the number of chunks it played.
+    """
+    output, _ = worker.communicate(timeout=120)
+    assert worker.returncode == 0
+    return int(output.split()[1])
+
+
+def _run_serially(job, hands, chunk_size):
+    """Returns the statistics of a job's chunks played in this process and merged in chunk order.
+    """
+    stats = SimulationStats()
+    for index, start in enumerate(range(0, hands, chunk_size)):
+        stats.merge(job.run_chunk(index, min(chunk_size, hands - start)))
+    return stats
+
+
+def test_workers_match_a_serial_run_after_one_is_killed():
+    job = SimulationJob(6, 0.75, {0: 1, 2: 4, 4: 8}, seed=5)
+    coordinator = Coordinator(job, 205_000, chunk_size=20_000)
+    port = coordinator.address[1]
+    result = {}
+    thread = threading.Thread(target=lambda: result.update(stats=coordinator.run()), daemon=True)
+    thread.start()
+
+    # kill the first worker as soon as it has taken a chunk, long before it can play it
+    killed = _start_worker(port)
+    deadline = time.time() + 60
+    while coordinator._pending.qsize() == len(coordinator._chunks):
+        assert time.time() < deadline
+        time.sleep(0.01)
+    killed.kill()
+    killed.wait()
+    workers = [_start_worker(port) for _ in range(3)]
+
+    # the killed worker's chunk goes back on the queue, so the others play every chunk between them
+    assert sum(_get_played(worker) for worker in workers) == len(coordinator._chunks)
+    thread.join(timeout=60)
+    assert result['stats'].to_dict() == _run_serially(job, 205_000, 20_000).to_dict()
+
+
+def test_coordinator_command_line_sets_the_spread_and_strategy(monkeypatch):
+    # a free port for the coordinator to listen on
+    with socket.socket() as probe:
+        probe.bind(('localhost', 0))
+        port = probe.getsockname()[1]
+    arguments = ['30000', '--host', 'localhost', '--port', str(port), '--decks', '6', '--seed', '3',
+                 '--spread', '0:1', '2:4', '4:8', '--strategy', 'basicstrategy.csv']
+    coordinator = subprocess.Popen([sys.executable, '-u', SCRIPT, 'coordinator'] + arguments, cwd=ROOT,
+                                   stdout=subprocess.PIPE, text=True)
+    # the coordinator has started listening once it says so
+    assert coordinator.stdout.readline().startswith('Waiting for workers')
+    workers = [_start_worker(port) for _ in range(2)]
+    assert sum(_get_played(worker) for worker in workers) == 3
+    output, _ = coordinator.communicate(timeout=60)
+
+    # strategy files are read from files/ under the working directory
+    monkeypatch.chdir(ROOT)
+    strategy_table = {}
+    parse_strategy_table('basicstrategy.csv', strategy_table)
+    job = SimulationJob(6, 0.75, {0: 1, 2: 4, 4: 8}, strategy_table, seed=3)
+    assert 'House edge: %s' % _run_serially(job, 30_000, 10_000).get_house_edge() in output
@@ -0,0 +1,21 @@
+import random
+
+import numpy as np
+
+from defaultstrategy import strategy
+from ruinsimulator import RuinSimulator
+from truecounttable import collect_true_count_table
+
+
+def test_required_bankroll_meets_its_risk_of_ruin():
+    """Results come in whole and half bets, so many trajectories are down exactly the same amount, and the required
+    bankroll must be lost in no more than the target fraction of them with those ties counted as ruined.
+    """
+    table = collect_true_count_table(6, 0.75, strategy, 20_000, rng=random.Random(1))
+    stats = RuinSimulator(table, {0: 1, 2: 4, 4: 8}).run(100, 2_000, paths=20_000, seed=2)
+    assert stats.get_risk_of_ruin() == np.mean(stats.max_losses >= stats.bankroll)
+    for target in (0.01, 0.05, 0.135, 0.5):
+        bankroll = stats.get_required_bankroll(target)
+        assert np.mean(stats.max_losses >= bankroll) <= target
+        # any smaller bankroll that was lost at least once is lost more often than the target
+        assert np.mean(stats.max_losses >= np.max(stats.max_losses[stats.max_losses < bankroll])) > target
@@ -0,0 +1,71 @@
+import numpy as np
+
+from scheduler import SimulationJob
+from simulationstats import SimulationStats
+from variancereduction import CONTROLS, ControlStats
+
+# the 99.9% quantile of the chi squared distribution with one degree of freedom for each control
+CHI_SQUARED_LIMIT = 31.26
+
+
+def _get_chi_squared(controls):
+    """Returns the chi squared statistic of the sample means of the controls against their expectation of 0, which
+    tests every control at once with the correlations between them taken into account.
+    """
+    count = controls.count
+    means = controls.get_control_means()
+    covariance = (controls._xx - count * np.outer(means, means)) / (count - 1)
+    return count * means @ np.linalg.solve(covariance, means)
+
+
+def test_controls_average_zero_when_the_cut_depends_on_the_cards():
+    """Deals one deck shoes that are cut as soon as the dealer shows a ten, which makes the dealt upcards far from their
+    full shoe probabilities. The controls must still average 0, or they would bias the control variate estimate by an
+    amount that does not shrink with more hands.
+    """
+    rng = np.random.default_rng(5)
+    deck = np.array([card for card in range(1, 11) for _ in range(4)] + [10] * 12)
+    cards = []
+    compositions = []
+    while len(cards) < 100_000:
+        shoe = rng.permutation(deck)
+        remaining = np.bincount(shoe, minlength=11)
+        for position in range(0, 40, 4):
+            hand = shoe[position:position + 4]
+            cards.append(hand)
+            compositions.append(remaining.copy())
+            remaining -= np.bincount(hand, minlength=11)
+            if hand[1] == 10:
+                break
+    cards = np.array(cards)
+    controls = ControlStats()
+    controls.update_many(np.zeros(len(cards)), np.ones(len(cards)), cards, np.array(compositions))
+
+    # the plain indicator of a ten upcard is many standard errors from its full shoe probability
+    tens = np.mean(cards[:, 1] == 10)
+    assert (tens - 16 / 52) / np.sqrt(16 / 52 * 36 / 52 / len(cards)) > 5
+    assert _get_chi_squared(controls) < CHI_SQUARED_LIMIT
+
+
+def test_simulated_controls_average_zero():
+    job = SimulationJob(6, 0.75, seed=7, variance_reduction=True)
+    stats = SimulationStats()
+    for chunk_index in range(20):
+        stats.merge(job.run_chunk(chunk_index, 10_000))
+
+    assert stats.controls.count == stats.count
+    assert len(stats.controls.get_control_means()) == len(CONTROLS)
+    assert _get_chi_squared(stats.controls) < CHI_SQUARED_LIMIT
+
+
+def test_control_variate_estimate_agrees_with_naive_estimate():
+    job = SimulationJob(8, 0.75, seed=3, variance_reduction=True)
+    stats = SimulationStats()
+    for chunk_index in range(10):
+        stats.merge(job.run_chunk(chunk_index, 10_000))
+
+    naive_edge, naive_error = stats.controls.get_naive_estimate()
+    assert np.isclose(naive_edge, stats.get_house_edge())
+    edge, standard_error = stats.controls.get_control_variate_estimate()
+    assert 0 < standard_error <= naive_error
+    assert abs(edge - naive_edge) < 4 * naive_error